@@ -0,0 +1,274 @@
+"""
+Подбор бэкенда захвата и формата камеры
+
+Перебирает бэкенды (V4L2/DSHOW/MSMF/AVFoundation), форматы пикселей (MJPG/YUYV),
+разрешения и частоты, замеряет реально отдаваемый FPS и затраты CPU на получение
+и декодирование кадра. Лучший профиль кэшируется для каждой камеры, поэтому
+последующие запуски открывают камеру сразу.
+
+Пример:
+    python camera_probe.py --camera 0 --force
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from dataclasses import dataclass, asdict
+from typing import List, Optional, Tuple
+
+import cv2
+
+
+CAMERA_PROFILES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "camera_profiles.json")
+
+# Кадры, с которыми работает трекер
+TARGET_WIDTH = 640
+TARGET_HEIGHT = 480
+TARGET_FPS = 30
+
+CANDIDATE_FOURCCS = ['MJPG', 'YUYV', None]  # None — формат по умолчанию драйвера
+CANDIDATE_MODES = [(640, 480, 30), (1280, 720, 30)]
+
+PROBE_WARMUP_FRAMES = 5
+PROBE_FRAMES = 30
+
+
+@dataclass
+class CameraProfile:
+    """Параметры захвата камеры и результаты замера"""
+    backend: int
+    backend_name: str
+    fourcc: Optional[str]
+    width: int
+    height: int
+    fps: float
+    measured_fps: float = 0.0
+    cpu_ms_per_frame: float = 0.0
+
+
+def candidate_backends() -> List[Tuple[int, str]]:
+    """Бэкенды захвата для текущей платформы в порядке предпочтения"""
+    if sys.platform.startswith('win'):
+        backends = [(cv2.CAP_DSHOW, 'DSHOW'), (cv2.CAP_MSMF, 'MSMF')]
+    elif sys.platform == 'darwin':
+        backends = [(cv2.CAP_AVFOUNDATION, 'AVFOUNDATION')]
+    else:
+        backends = [(cv2.CAP_V4L2, 'V4L2')]
+    return backends + [(cv2.CAP_ANY, 'ANY')]
+
+
+def camera_key(index: int) -> str:
+    """Ключ камеры в кэше профилей: платформа, индекс и имя устройства, если известно"""
+    name = ""
+    sysfs_name = f"/sys/class/video4linux/video{index}/name"
+    if os.path.exists(sysfs_name):
+        try:
+            with open(sysfs_name, 'r', encoding='utf-8') as f:
+                name = f.read().strip()
+        except OSError:
+            pass
+    return f"{sys.platform}:{index}:{name}"
+
+
+def load_profiles() -> dict:
+    if not os.path.exists(CAMERA_PROFILES_FILE):
+        return {}
+    try:
+        with open(CAMERA_PROFILES_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except:
+        return {}
+
+
+# Трекеры нескольких камер сохраняют профили из своих потоков
+_profiles_lock = threading.Lock()
+
+
+def save_profile(key: str, profile: Optional[CameraProfile]):
+    """Сохранить (или удалить, передав None) профиль камеры в кэше
+
+    Файл пишется во временный и заменяется целиком: при сбое посреди записи
+    остаётся прежний кэш, а не обрезанный JSON.
+    """
+    with _profiles_lock:
+        profiles = load_profiles()
+        if profile is None:
+            profiles.pop(key, None)
+        else:
+            profiles[key] = asdict(profile)
+        tmp_path = CAMERA_PROFILES_FILE + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(profiles, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, CAMERA_PROFILES_FILE)
+        except Exception as e:
+            print(f"Ошибка сохранения профиля камеры: {e}")
+
+
+def _fourcc_to_str(value: float) -> str:
+    code = int(value)
+    return "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4)).strip('\x00 ')
+
+
+def open_with_profile(index: int, profile: CameraProfile):
+    """Открыть камеру с параметрами профиля. None, если бэкенд недоступен"""
+    capture = cv2.VideoCapture(index, profile.backend)
+    if not capture.isOpened():
+        capture.release()
+        return None
+    # Формат нужно задавать до разрешения: иначе часть драйверов V4L2 его игнорирует
+    if profile.fourcc:
+        capture.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*profile.fourcc))
+    capture.set(cv2.CAP_PROP_FRAME_WIDTH, profile.width)
+    capture.set(cv2.CAP_PROP_FRAME_HEIGHT, profile.height)
+    capture.set(cv2.CAP_PROP_FPS, profile.fps)
+    return capture
+
+
+def measure_capture(capture, frames: int = PROBE_FRAMES,
+                    warmup: int = PROBE_WARMUP_FRAMES) -> Tuple[float, float]:
+    """Реальный FPS и CPU на кадр (мс) при чтении с камеры"""
+    for _ in range(warmup):
+        if not capture.read()[0]:
+            return 0.0, 0.0
+
+    cpu = 0.0
+    count = 0
+    started = time.perf_counter()
+    for _ in range(frames):
+        cpu_start = time.thread_time()
+        ret, _ = capture.read()
+        cpu += time.thread_time() - cpu_start
+        if not ret:
+            break
+        count += 1
+    elapsed = time.perf_counter() - started
+    if count == 0 or elapsed <= 0:
+        return 0.0, 0.0
+    return count / elapsed, cpu * 1000 / count
+
+
+def probe_camera(index: int, verbose: bool = False) -> List[CameraProfile]:
+    """Перебрать варианты захвата и вернуть замеренные рабочие профили"""
+    results = []
+    seen = set()
+    for backend, backend_name in candidate_backends():
+        backend_opened = False
+        for fourcc in CANDIDATE_FOURCCS:
+            for width, height, fps in CANDIDATE_MODES:
+                profile = CameraProfile(backend, backend_name, fourcc, width, height, fps)
+                capture = open_with_profile(index, profile)
+                if capture is None:
+                    break
+                backend_opened = True
+                try:
+                    # Драйвер мог выбрать другой режим: записываем фактический
+                    profile.width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+                    profile.height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                    actual_fourcc = _fourcc_to_str(capture.get(cv2.CAP_PROP_FOURCC))
+                    negotiated = (backend_name, actual_fourcc, profile.width, profile.height)
+                    if negotiated in seen:
+                        continue
+                    seen.add(negotiated)
+                    profile.measured_fps, profile.cpu_ms_per_frame = measure_capture(capture)
+                finally:
+                    capture.release()
+
+                if profile.measured_fps > 0:
+                    results.append(profile)
+                if verbose:
+                    mode = f"{profile.width}x{profile.height}"
+                    print(f"{backend_name:<13}{actual_fourcc or '-':<8}{mode:<11}"
+                          f"{profile.measured_fps:>7.1f} fps{profile.cpu_ms_per_frame:>8.2f} мс")
+            if not backend_opened:
+                break
+        # Если основной бэкенд платформы работает, резервный CAP_ANY не нужен
+        if results and backend_opened:
+            break
+    return results
+
+
+def choose_profile(profiles: List[CameraProfile]) -> Optional[CameraProfile]:
+    """Лучший профиль: достаточный FPS, затем меньше пикселей, затем меньше CPU"""
+    if not profiles:
+        return None
+
+    def score(p: CameraProfile):
+        fps_ok = round(min(p.measured_fps, TARGET_FPS) / TARGET_FPS, 1)
+        return (-fps_ok, p.width * p.height, p.cpu_ms_per_frame)
+
+    return min(profiles, key=score)
+
+
+def _open_default(index: int):
+    """Открытие без профиля, как раньше: DSHOW, затем бэкенд по умолчанию"""
+    capture = cv2.VideoCapture(index, cv2.CAP_DSHOW)
+    if not capture.isOpened():
+        capture = cv2.VideoCapture(index)
+    if capture.isOpened():
+        capture.set(cv2.CAP_PROP_FRAME_WIDTH, TARGET_WIDTH)
+        capture.set(cv2.CAP_PROP_FRAME_HEIGHT, TARGET_HEIGHT)
+        capture.set(cv2.CAP_PROP_FPS, TARGET_FPS)
+    return capture
+
+
+def open_camera(index, force_probe: bool = False):
+    """Открыть камеру с кэшированным профилем, при необходимости подобрав его
+
+    Возвращает (capture, profile). Для видеофайлов и строковых источников
+    профиль не подбирается.
+    """
+    if not isinstance(index, int):
+        return cv2.VideoCapture(index), None
+
+    key = camera_key(index)
+    cached = None if force_probe else load_profiles().get(key)
+    if cached:
+        profile = CameraProfile(**cached)
+        capture = open_with_profile(index, profile)
+        if capture is not None and capture.read()[0]:
+            return capture, profile
+        if capture is not None:
+            capture.release()
+        # Камера или драйвер изменились — подбираем заново
+        save_profile(key, None)
+
+    profile = choose_profile(probe_camera(index))
+    if profile is not None:
+        capture = open_with_profile(index, profile)
+        if capture is not None:
+            save_profile(key, profile)
+            return capture, profile
+
+    return _open_default(index), None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Подбор формата и бэкенда камеры")
+    parser.add_argument('--camera', type=int, default=0, help="Индекс камеры")
+    parser.add_argument('--force', action='store_true', help="Игнорировать кэш и подобрать заново")
+    args = parser.parse_args(argv)
+
+    key = camera_key(args.camera)
+    cached = load_profiles().get(key)
+    if cached and not args.force:
+        print(f"Профиль из кэша ({key}): {cached}")
+        return 0
+
+    print(f"{'Бэкенд':<13}{'FOURCC':<8}{'Режим':<11}{'FPS':>11}{'CPU':>11}")
+    profiles = probe_camera(args.camera, verbose=True)
+    best = choose_profile(profiles)
+    if best is None:
+        print("Камера не отдаёт кадры ни в одном режиме", file=sys.stderr)
+        return 1
+
+    save_profile(key, best)
+    print(f"\nВыбран: {best.backend_name} {best.fourcc or 'default'} {best.width}x{best.height} "
+          f"({best.measured_fps:.1f} fps, {best.cpu_ms_per_frame:.2f} мс CPU на кадр)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,461 @@
+"""
+Бенчмарк трекера взгляда по этапам обработки кадра
+
+Вместо cv2.VideoCapture(0) кадры берутся из видеофайла или генерируются,
+поэтому замеры воспроизводимы и работают без камеры и дисплея (headless Linux).
+Результат — время каждого этапа (flip, cvtColor, поиск лица и глаз, _find_pupil,
+калибровка, конвертация в QImage), итоговый FPS и JSON для отслеживания регрессий.
+
+Режим --cameras N запускает N трекеров одновременно (каждый в своём потоке, как
+несколько камер) по видеофайлу и показывает FPS и долю CPU каждого.
+
+Режим --compare прогоняет один и тот же клип через все детекторы лица и глаз и
+выбирает самый быстрый из тех, что совпадают с эталонным не хуже заданной точности.
+
+Пример:
+    python eye_benchmark.py --video clip.mp4 --frames 300 --json bench.json
+    python eye_benchmark.py --synthetic --frames 500
+    python eye_benchmark.py --video clip.mp4 --cameras 3 --duration 10
+    python eye_benchmark.py --video clip.mp4 --compare --reference yunet --min-accuracy 0.95
+"""
+import sys
+import json
+import time
+import platform
+import argparse
+from datetime import datetime
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from eye_tracker import (EyeTracker, EyeTrackerManager, StageProfiler, DETECTORS, YuNetDetector,
+                         create_detector)
+
+
+# Этапы, которые выполняются, только если на кадре нашлось лицо или глаза
+DETECTION_STAGES = ('eye_detect', 'find_pupil')
+
+
+class FileCamera:
+    """Камера, читающая кадры из видеофайла (интерфейс как у cv2.VideoCapture)"""
+
+    def __init__(self, path: str, loop: bool = True):
+        self.path = path
+        self.loop = loop
+        self._capture = cv2.VideoCapture(path)
+
+    def isOpened(self) -> bool:
+        return self._capture.isOpened()
+
+    def read(self):
+        ret, frame = self._capture.read()
+        if not ret and self.loop:
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self._capture.read()
+        return ret, frame
+
+    def set(self, prop, value) -> bool:
+        return False
+
+    def get(self, prop) -> float:
+        return self._capture.get(prop)
+
+    def release(self):
+        self._capture.release()
+
+    def describe(self) -> str:
+        return f"file:{self.path}"
+
+
+class SyntheticCamera:
+    """Камера с генерируемыми кадрами: схематичное лицо с движущимися зрачками
+
+    Брови, радужка и лёгкое размытие нужны, чтобы каскад глаз находил оба глаза:
+    без них работают только поиск лица и глаз, а поиск зрачка не запускается.
+    """
+
+    def __init__(self, width: int = 640, height: int = 480, seed: int = 0):
+        self.width = width
+        self.height = height
+        self._index = 0
+        rng = np.random.default_rng(seed)
+        self._background = rng.integers(60, 120, (height, width, 3), dtype=np.uint8)
+
+    def isOpened(self) -> bool:
+        return True
+
+    def read(self):
+        frame = self._background.copy()
+        w, h = self.width, self.height
+        cx, cy = w // 2, h // 2
+        cv2.ellipse(frame, (cx, cy), (w // 7, h // 4), 0, 0, 360, (150, 180, 215), -1)
+
+        # Зрачки медленно ходят по кругу, имитируя перемещение взгляда
+        phase = self._index / 30.0
+        dx = int(6 * np.cos(phase))
+        dy = int(3 * np.sin(phase))
+        for ex in (cx - w // 18, cx + w // 18):
+            ey = cy - h // 14
+            cv2.ellipse(frame, (ex, ey - h // 28), (w // 28, h // 120), 0, 180, 360, (60, 70, 90), -1)
+            cv2.ellipse(frame, (ex, ey), (w // 30, h // 40), 0, 0, 360, (235, 235, 235), -1)
+            cv2.circle(frame, (ex + dx, ey + dy), h // 50, (60, 80, 110), -1)
+            cv2.circle(frame, (ex + dx, ey + dy), h // 80, (20, 20, 20), -1)
+        cv2.ellipse(frame, (cx, cy + h // 8), (w // 20, h // 60), 0, 0, 360, (80, 80, 160), -1)
+
+        self._index += 1
+        return True, cv2.GaussianBlur(frame, (5, 5), 0)
+
+    def set(self, prop, value) -> bool:
+        return False
+
+    def get(self, prop) -> float:
+        return 0.0
+
+    def release(self):
+        pass
+
+    def describe(self) -> str:
+        return f"synthetic:{self.width}x{self.height}"
+
+
+def _environment() -> dict:
+    return {
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'platform': platform.platform(),
+        'cpu_threads': cv2.getNumThreads()
+    }
+
+
+def run_benchmark(camera, frames: int = 300, warmup: int = 10, calibration=None,
+                  governor: bool = False, detector_name: str = 'cascade') -> dict:
+    """Прогнать кадры камеры через EyeTracker и вернуть машиночитаемый отчёт
+
+    governor=True оставляет регулятор нагрузки (редкий поиск лица при стабильной
+    позе), иначе каждый кадр обрабатывается полностью.
+    """
+    tracker = EyeTracker()
+    tracker.set_calibration(calibration)
+    if not governor:
+        tracker.set_governor(None)
+    detector = create_detector(detector_name)
+    if not detector.load():
+        raise RuntimeError(f"Не удалось загрузить детектор: {detector_name}")
+
+    profiler = StageProfiler()
+    tracker.set_profiler(profiler)
+
+    # Прогрев: первые кадры включают инициализацию OpenCV и не показательны
+    for _ in range(warmup):
+        ret, frame = camera.read()
+        if not ret:
+            break
+        tracker._process_frame(frame, detector)
+    profiler.reset()
+
+    frame_times = []
+    read_time = 0.0
+    detected = 0
+    started = time.perf_counter()
+    for _ in range(frames):
+        t0 = time.perf_counter()
+        ret, frame = camera.read()
+        t1 = time.perf_counter()
+        if not ret:
+            break
+        if tracker._process_frame(frame, detector) is not None:
+            detected += 1
+        t2 = time.perf_counter()
+        read_time += t1 - t0
+        frame_times.append(t2 - t1)
+    total = time.perf_counter() - started
+
+    processed = len(frame_times)
+    times_ms = np.array(frame_times) * 1000 if frame_times else np.zeros(1)
+    stages = profiler.summary(processed)
+    return {
+        'created_at': datetime.now().strftime('%Y-%m-%dT%H:%M:%S.%f'),
+        'source': camera.describe(),
+        'governor': governor,
+        'detector': detector_name,
+        'environment': _environment(),
+        'frames': processed,
+        'face_detected_ratio': round(detected / processed, 4) if processed else 0.0,
+        'fps': round(processed / total, 2) if total > 0 else 0.0,
+        'processing_fps': round(processed / times_ms.sum() * 1000, 2) if processed else 0.0,
+        'read_ms_per_frame': round(read_time * 1000 / processed, 4) if processed else 0.0,
+        'frame_ms': {
+            'mean': round(float(times_ms.mean()), 4),
+            'p50': round(float(np.percentile(times_ms, 50)), 4),
+            'p95': round(float(np.percentile(times_ms, 95)), 4),
+            'max': round(float(times_ms.max()), 4)
+        },
+        'stages': stages,
+        # Этапы, до которых кадры не дошли (нет лица или глаз), — их время в замер не вошло
+        'skipped_stages': [name for name in DETECTION_STAGES if name not in stages]
+    }
+
+
+def run_multi_camera(video: str, cameras: int, duration: float = 10.0,
+                     detector_name: str = 'cascade') -> dict:
+    """Запустить несколько трекеров одновременно и замерить нагрузку каждого
+
+    Все трекеры читают один видеофайл (каждый — свою копию потока) в темпе его
+    FPS, поэтому видео должно быть не короче duration: иначе — ValueError. Если
+    какой-то трекер не обработал ни одного кадра — RuntimeError.
+    """
+    clip = cv2.VideoCapture(video)
+    clip_fps = clip.get(cv2.CAP_PROP_FPS)
+    clip_frames = clip.get(cv2.CAP_PROP_FRAME_COUNT)
+    opened = clip.isOpened()
+    clip.release()
+    if not opened:
+        raise ValueError(f"Не удалось открыть видео: {video}")
+    if clip_fps > 0 and clip_frames > 0 and clip_frames / clip_fps < duration:
+        raise ValueError(f"Видео короче замера: {clip_frames / clip_fps:.1f} с < {duration:.1f} с")
+    
+    manager = EyeTrackerManager()
+    # Профилировщик у каждой камеры свой: по нему считаются кадры, обработанные именно ею
+    profilers = {}
+    for index in range(cameras):
+        manager.tracker(index).set_detector(create_detector(detector_name))
+        profilers[index] = StageProfiler()
+        manager.tracker(index).set_profiler(profilers[index])
+
+    cpu_start = time.process_time()
+    started = time.perf_counter()
+    for index in manager.cameras:
+        manager.tracker(index).start(source=video)
+
+    # Событийного цикла Qt здесь нет, поэтому статистика читается у регуляторов напрямую
+    samples = {index: [] for index in manager.cameras}
+    while time.perf_counter() - started < duration:
+        time.sleep(1.0)
+        for index in manager.cameras:
+            stats = manager.tracker(index)._governor.stats
+            if stats.fps > 0:
+                samples[index].append(stats)
+    elapsed = time.perf_counter() - started
+    process_cpu = time.process_time() - cpu_start
+    manager.stop_all()
+
+    stalled = [index for index, stats in samples.items() if not stats]
+    if stalled:
+        raise RuntimeError(f"Камеры без обработанных кадров: {stalled}")
+    
+    per_camera = {}
+    for index, stats in samples.items():
+        per_camera[index] = {
+            'frames': profilers[index].counts['cvtColor'],
+            'fps': round(float(np.mean([s.fps for s in stats])), 1) if stats else 0.0,
+            'cpu_share': round(float(np.mean([s.cpu_share for s in stats])), 3) if stats else 0.0,
+            'fps_limit': stats[-1].fps_limit if stats else 0.0
+        }
+    return {
+        'created_at': datetime.now().strftime('%Y-%m-%dT%H:%M:%S.%f'),
+        'source': f"file:{video}",
+        'detector': detector_name,
+        'cameras': cameras,
+        'duration': round(elapsed, 2),
+        'environment': _environment(),
+        'process_cpu_share': round(process_cpu / elapsed, 3) if elapsed > 0 else 0.0,
+        'per_camera': per_camera
+    }
+
+
+def _print_multi_camera(report: dict):
+    print(f"Источник: {report['source']}, камер: {report['cameras']}, детектор: {report['detector']}")
+    print(f"{'Камера':<8}{'FPS':>8}{'CPU':>8}{'лимит':>8}")
+    for index, cam in report['per_camera'].items():
+        print(f"{index:<8}{cam['fps']:>8.1f}{cam['cpu_share'] * 100:>7.0f}%{cam['fps_limit']:>8.1f}")
+    print(f"Процесс целиком: {report['process_cpu_share'] * 100:.0f}% CPU (в долях одного ядра)")
+
+
+def _iou(a, b) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = min(ax + aw, bx + bw) - max(ax, bx)
+    h = min(ay + ah, by + bh) - max(ay, by)
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    return inter / (aw * ah + bw * bh - inter)
+
+
+def _run_detector(detector, frames) -> Tuple[list, list, np.ndarray]:
+    """Самое крупное лицо, число глаз и время (мс) на каждом кадре"""
+    detector.reset()
+    faces, eye_counts, times = [], [], []
+    for frame in frames:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        t0 = time.perf_counter()
+        found = detector.detect_faces(frame, gray)
+        face = max(found, key=lambda f: f[2] * f[3]) if found else None
+        eyes = detector.detect_eyes(frame, gray, face) if face is not None else []
+        times.append(time.perf_counter() - t0)
+        faces.append(face)
+        eye_counts.append(len(eyes))
+    return faces, eye_counts, np.array(times) * 1000
+
+
+def compare_detectors(camera, frames: int = 300, names=None, reference: Optional[str] = None,
+                      min_accuracy: float = 0.95, iou_threshold: float = 0.5) -> dict:
+    """Сравнить детекторы на одних и тех же кадрах
+
+    Точность — доля кадров, где детектор согласен с эталонным: оба не нашли лицо
+    или рамки пересекаются с IoU не ниже iou_threshold. Эталон по умолчанию —
+    YuNet, если модель доступна, иначе каскады.
+    """
+    # Кадры читаются заранее, чтобы чтение видео не влияло на замеры
+    clip = []
+    for _ in range(frames):
+        ret, frame = camera.read()
+        if not ret:
+            break
+        clip.append(cv2.flip(frame, 1))
+
+    detectors = {name: create_detector(name) for name in (names or list(DETECTORS))}
+    available = {name: d for name, d in detectors.items() if d.load()}
+    if reference is None:
+        reference = YuNetDetector.name if YuNetDetector.name in available else 'cascade'
+    if reference not in available:
+        ref_detector = create_detector(reference)
+        if not ref_detector.load():
+            raise RuntimeError(f"Эталонный детектор недоступен: {reference}")
+        available[reference] = ref_detector
+
+    runs = {name: _run_detector(d, clip) for name, d in available.items()}
+    ref_faces = runs[reference][0]
+
+    backends = {}
+    for name in detectors:
+        if name not in runs:
+            backends[name] = {'available': False}
+            continue
+        faces, eye_counts, times_ms = runs[name]
+        agree = sum(1 for f, r in zip(faces, ref_faces)
+                    if (f is None and r is None) or
+                    (f is not None and r is not None and _iou(f, r) >= iou_threshold))
+        count = len(clip) or 1
+        backends[name] = {
+            'available': True,
+            'ms_per_frame': round(float(times_ms.mean()), 3) if len(times_ms) else 0.0,
+            'p95_ms': round(float(np.percentile(times_ms, 95)), 3) if len(times_ms) else 0.0,
+            'face_ratio': round(sum(f is not None for f in faces) / count, 4),
+            'both_eyes_ratio': round(sum(c >= 2 for c in eye_counts) / count, 4),
+            'accuracy': round(agree / count, 4)
+        }
+
+    passing = [name for name, b in backends.items()
+               if b['available'] and b['accuracy'] >= min_accuracy]
+    recommended = min(passing, key=lambda name: backends[name]['ms_per_frame']) if passing else None
+    return {
+        'created_at': datetime.now().strftime('%Y-%m-%dT%H:%M:%S.%f'),
+        'source': camera.describe(),
+        'frames': len(clip),
+        'reference': reference,
+        'min_accuracy': min_accuracy,
+        'environment': _environment(),
+        'backends': backends,
+        'recommended': recommended
+    }
+
+
+def _print_comparison(report: dict):
+    print(f"Источник: {report['source']}, кадров: {report['frames']}")
+    print(f"Эталон: {report['reference']}, требуемая точность: {report['min_accuracy']:.2f}")
+    print()
+    print(f"{'Детектор':<10}{'мс/кадр':>10}{'p95':>9}{'лицо':>8}{'2 глаза':>9}{'точность':>10}")
+    for name, b in report['backends'].items():
+        if not b['available']:
+            print(f"{name:<10}{'недоступен':>10}")
+            continue
+        print(f"{name:<10}{b['ms_per_frame']:>10.2f}{b['p95_ms']:>9.2f}{b['face_ratio']:>8.2f}"
+              f"{b['both_eyes_ratio']:>9.2f}{b['accuracy']:>10.2f}")
+    print()
+    if report['recommended']:
+        print(f"Рекомендуется: {report['recommended']}")
+    else:
+        print("Ни один детектор не достиг требуемой точности")
+
+
+def _print_report(report: dict):
+    print(f"Источник: {report['source']}, детектор: {report['detector']}")
+    print(f"Кадров: {report['frames']}, лицо найдено: {report['face_detected_ratio'] * 100:.1f}%")
+    print(f"FPS: {report['fps']} (только обработка: {report['processing_fps']})")
+    print(f"Кадр, мс: mean {report['frame_ms']['mean']:.2f}  p95 {report['frame_ms']['p95']:.2f}")
+    print()
+    print(f"{'Этап':<14}{'вызовов':>10}{'мс/вызов':>12}{'мс/кадр':>12}")
+    for name, stage in sorted(report['stages'].items(), key=lambda item: -item[1]['total_ms']):
+        print(f"{name:<14}{stage['calls']:>10}{stage['per_call_ms']:>12.3f}{stage['per_frame_ms']:>12.3f}")
+    if report['skipped_stages']:
+        print(f"Не выполнялись (лицо или глаза не найдены): {', '.join(report['skipped_stages'])}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк трекера взгляда по этапам")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--video', help="Видеофайл в качестве камеры")
+    source.add_argument('--synthetic', action='store_true', help="Сгенерированные кадры")
+    parser.add_argument('--frames', type=int, default=300, help="Количество кадров")
+    parser.add_argument('--warmup', type=int, default=10, help="Кадров на прогрев")
+    parser.add_argument('--governor', action='store_true',
+                        help="Включить регулятор нагрузки (реже искать лицо при стабильной позе)")
+    parser.add_argument('--detector', default='cascade', choices=list(DETECTORS),
+                        help="Детектор лица и глаз")
+    parser.add_argument('--cameras', type=int,
+                        help="Запустить N трекеров одновременно по --video и замерить CPU каждого")
+    parser.add_argument('--duration', type=float, default=10.0,
+                        help="Длительность замера для --cameras, сек")
+    parser.add_argument('--compare', nargs='*', choices=list(DETECTORS), metavar='DETECTOR',
+                        help="Сравнить детекторы (по умолчанию все) и выбрать самый быстрый")
+    parser.add_argument('--reference', choices=list(DETECTORS),
+                        help="Эталонный детектор для оценки точности")
+    parser.add_argument('--min-accuracy', type=float, default=0.95,
+                        help="Требуемая доля кадров, совпадающих с эталоном")
+    parser.add_argument('--json', help="Сохранить отчёт в JSON")
+    args = parser.parse_args(argv)
+
+    if args.cameras:
+        if not args.video:
+            print("--cameras требует --video", file=sys.stderr)
+            return 1
+        try:
+            report = run_multi_camera(args.video, args.cameras, args.duration, args.detector)
+        except (ValueError, RuntimeError) as e:
+            print(f"Ошибка: {e}", file=sys.stderr)
+            return 1
+        _print_multi_camera(report)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        return 0
+
+    camera = FileCamera(args.video) if args.video else SyntheticCamera()
+    if not camera.isOpened():
+        print(f"Не удалось открыть источник: {camera.describe()}", file=sys.stderr)
+        return 1
+
+    try:
+        if args.compare is not None:
+            report = compare_detectors(camera, args.frames, args.compare or None,
+                                       args.reference, args.min_accuracy)
+        else:
+            report = run_benchmark(camera, args.frames, args.warmup, governor=args.governor,
+                                   detector_name=args.detector)
+    finally:
+        camera.release()
+
+    if args.compare is not None:
+        _print_comparison(report)
+    else:
+        _print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
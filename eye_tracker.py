@@ -1,15 +1,27 @@
 """
 Модуль трекинга взгляда с калибровкой
 """
+import os
 import cv2
+import time
 import numpy as np
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
 from dataclasses import dataclass
-from typing import Optional, Tuple, List
+from typing import Dict, Optional, Tuple, List
 from threading import Thread, Event
 from PyQt6.QtCore import QObject, pyqtSignal, QTimer, Qt, QPoint
 from PyQt6.QtGui import QImage, QPainter, QColor, QFont, QBrush, QPen
 from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLabel, QWidget, QApplication
 
+from camera_probe import CameraProfile, open_camera
+from gaze_filters import GazeFilter, GazePredictor, OneEuroFilter
+
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+YUNET_MODEL_PATH = os.path.join(MODELS_DIR, "face_detection_yunet_2023mar.onnx")
+
 
 @dataclass
 class GazeData:
@@ -25,6 +37,468 @@ class GazeData:
     face_x: float
     face_y: float
     confidence: float
+    timestamp: float = 0.0  # Момент, к которому относится взгляд (time.monotonic()), с
+    camera_index: int = 0
+    # Сглаженные координаты до предсказания (None — предсказание выключено, совпадают с gaze_x/gaze_y)
+    observed_x: Optional[float] = None
+    observed_y: Optional[float] = None
+
+
+# Границы центральной зоны экрана для направления взгляда
+DIRECTION_LOW = 0.35
+DIRECTION_HIGH = 0.65
+
+
+def gaze_directions(screen_x: float, screen_y: float) -> Tuple[str, str]:
+    """Горизонтальное и вертикальное направление по калиброванным координатам"""
+    if screen_x < DIRECTION_LOW:
+        h_dir = "left"
+    elif screen_x > DIRECTION_HIGH:
+        h_dir = "right"
+    else:
+        h_dir = "center"
+    
+    if screen_y < DIRECTION_LOW:
+        v_dir = "up"
+    elif screen_y > DIRECTION_HIGH:
+        v_dir = "down"
+    else:
+        v_dir = "center"
+    
+    return h_dir, v_dir
+
+
+def gaze_directions_array(screen_x: np.ndarray, screen_y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """gaze_directions для массивов координат"""
+    h_dir = np.where(screen_x < DIRECTION_LOW, "left", np.where(screen_x > DIRECTION_HIGH, "right", "center"))
+    v_dir = np.where(screen_y < DIRECTION_LOW, "up", np.where(screen_y > DIRECTION_HIGH, "down", "center"))
+    return h_dir, v_dir
+
+
+def apply_calibration_array(calibration, raw_x: np.ndarray, raw_y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Калибровка (гомография 3x3 или аффинная 2x3) сразу для массивов сырых координат"""
+    raw_x = np.asarray(raw_x, dtype=np.float64)
+    raw_y = np.asarray(raw_y, dtype=np.float64)
+    # Без матрицы (findHomography не сошёлся) — как в живом трекинге, без калибровки
+    if calibration is None or calibration.get('matrix') is None:
+        return raw_x, raw_y
+    
+    points = np.column_stack([raw_x, raw_y, np.ones_like(raw_x)])
+    transformed = points @ np.asarray(calibration['matrix'], dtype=np.float64).T
+    if calibration['type'] == 'homography':
+        transformed = transformed[:, :2] / transformed[:, 2:3]
+    return np.clip(transformed[:, 0], 0, 1), np.clip(transformed[:, 1], 0, 1)
+
+
+def calibration_to_json(calibration) -> Optional[dict]:
+    """Калибровка в JSON-совместимом виде"""
+    if calibration is None:
+        return None
+    return {'type': calibration['type'], 'matrix': np.asarray(calibration['matrix']).tolist()}
+
+
+def calibration_from_json(data) -> Optional[dict]:
+    """Калибровка из JSON-представления"""
+    if not data:
+        return None
+    return {'type': data['type'], 'matrix': np.array(data['matrix'], dtype=np.float64)}
+
+
+class StageProfiler:
+    """Накопление времени по этапам обработки кадра"""
+    
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self.counts = defaultdict(int)
+    
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.totals[name] += time.perf_counter() - start
+            self.counts[name] += 1
+    
+    def reset(self):
+        self.totals.clear()
+        self.counts.clear()
+    
+    def summary(self, frames: int) -> dict:
+        """Время этапов: всего, на вызов и в среднем на кадр (мс)"""
+        return {
+            name: {
+                'calls': self.counts[name],
+                'total_ms': round(total * 1000, 3),
+                'per_call_ms': round(total * 1000 / self.counts[name], 4),
+                'per_frame_ms': round(total * 1000 / frames, 4) if frames else 0.0
+            }
+            for name, total in self.totals.items()
+        }
+
+
+# Заглушка этапа, когда профилирование выключено
+_NO_STAGE = nullcontext()
+
+
+@dataclass
+class TrackerStats:
+    """Статистика цикла трекинга за последнее окно"""
+    fps: float
+    cpu_share: float  # Доля одного ядра, занятая потоком трекинга
+    fps_limit: float
+    detect_interval: int  # Поиск лица раз в N кадров
+    detect_scale: float  # Масштаб кадра для поиска лица
+
+
+class GazeGovernor:
+    """Регулятор частоты кадров и нагрузки CPU в цикле трекинга
+    
+    Частота обработки ограничивается fps_limit, который снижается при превышении
+    бюджета CPU и восстанавливается до target_fps при запасе. Пока лицо стабильно,
+    поиск лица выполняется реже и на уменьшенном кадре.
+    """
+    
+    STATS_WINDOW = 1.0  # Окно усреднения статистики, сек
+    STABLE_DETECTIONS = 5  # Сколько стабильных детекций подряд до упрощения поиска
+    
+    def __init__(self, target_fps: float = 30.0, cpu_budget: float = 0.5,
+                 min_fps: float = 10.0, max_detect_interval: int = 6,
+                 min_detect_scale: float = 0.5):
+        self.target_fps = target_fps
+        self.cpu_budget = cpu_budget
+        self.min_fps = min_fps
+        self.max_detect_interval = max_detect_interval
+        self.min_detect_scale = min_detect_scale
+        self.reset()
+    
+    def reset(self):
+        self.fps_limit = self.target_fps
+        self.detect_interval = 1
+        self.detect_scale = 1.0
+        self._frames_since_detect = 0
+        self._stable_count = 0
+        self._prev_face = None
+        self._next_frame_time = 0.0
+        self._window_start = None
+        self._window_cpu = 0.0
+        self._window_frames = 0
+        self.stats = TrackerStats(0.0, 0.0, self.fps_limit, 1, 1.0)
+    
+    def should_process(self, now: float) -> bool:
+        """Пора ли обрабатывать следующий кадр (с допуском на джиттер камеры)"""
+        period = 1.0 / self.fps_limit
+        return now + period * 0.25 >= self._next_frame_time
+    
+    def frame_processed(self, now: float, thread_cpu: float) -> bool:
+        """Учесть обработанный кадр. Возвращает True, когда обновилась статистика"""
+        period = 1.0 / self.fps_limit
+        self._next_frame_time = max(self._next_frame_time + period, now - period)
+        
+        if self._window_start is None:
+            self._window_start = now
+            self._window_cpu = thread_cpu
+            return False
+        
+        self._window_frames += 1
+        elapsed = now - self._window_start
+        if elapsed < self.STATS_WINDOW:
+            return False
+        
+        fps = self._window_frames / elapsed
+        cpu_share = (thread_cpu - self._window_cpu) / elapsed
+        self._adapt_rate(cpu_share)
+        self.stats = TrackerStats(round(fps, 1), round(cpu_share, 3), round(self.fps_limit, 1),
+                                  self.detect_interval, round(self.detect_scale, 2))
+        self._window_start = now
+        self._window_cpu = thread_cpu
+        self._window_frames = 0
+        return True
+    
+    def _adapt_rate(self, cpu_share: float):
+        if cpu_share > self.cpu_budget:
+            self.fps_limit = max(self.min_fps, self.fps_limit * 0.85)
+        elif cpu_share < self.cpu_budget * 0.7:
+            self.fps_limit = min(self.target_fps, self.fps_limit * 1.1)
+    
+    def should_detect(self) -> bool:
+        """Нужно ли искать лицо на этом кадре или можно взять прошлое"""
+        if self._frames_since_detect + 1 >= self.detect_interval:
+            self._frames_since_detect = 0
+            return True
+        self._frames_since_detect += 1
+        return False
+    
+    def invalidate(self):
+        """Принудительно искать лицо на следующем кадре"""
+        self._frames_since_detect = self.detect_interval
+    
+    def face_observed(self, face):
+        """Результат поиска лица: оценка стабильности и настройка частоты поиска"""
+        if face is None:
+            self._prev_face = None
+            self._stable_count = 0
+            self.detect_interval = 1
+            self.detect_scale = 1.0
+            return
+        
+        fx, fy, fw, fh = (float(v) for v in face)
+        stable = False
+        if self._prev_face is not None:
+            px, py, pw, ph = self._prev_face
+            shift = np.hypot((fx + fw / 2) - (px + pw / 2), (fy + fh / 2) - (py + ph / 2))
+            stable = shift < 0.1 * pw and abs(fw - pw) < 0.1 * pw
+        self._prev_face = (fx, fy, fw, fh)
+        
+        if not stable:
+            self._stable_count = 0
+            self.detect_interval = 1
+            self.detect_scale = 1.0
+            return
+        
+        self._stable_count += 1
+        if self._stable_count >= self.STABLE_DETECTIONS:
+            self._stable_count = 0
+            self.detect_interval = min(self.max_detect_interval, self.detect_interval + 1)
+            # Не уменьшаем кадр так, чтобы лицо стало меньше минимального размера каскада
+            min_scale = min(1.0, max(self.min_detect_scale, 100.0 / fw))
+            self.detect_scale = max(min_scale, self.detect_scale - 0.1)
+
+
+class FaceEyeDetector(ABC):
+    """Детектор лица и глаз
+    
+    detect_faces возвращает рамки лиц (x, y, w, h) в координатах кадра,
+    detect_eyes — рамки глаз относительно левого верхнего угла лица.
+    scale < 1 — поиск на уменьшенном кадре (регулятор нагрузки).
+    """
+    
+    name = ""
+    
+    def load(self) -> bool:
+        """Загрузить модели (вызывается в потоке трекинга). False — детектор недоступен"""
+        return True
+    
+    def reset(self):
+        pass
+    
+    @abstractmethod
+    def detect_faces(self, frame, gray, scale: float = 1.0) -> list:
+        ...
+    
+    @abstractmethod
+    def detect_eyes(self, frame, gray, face) -> list:
+        ...
+
+
+class CascadeDetector(FaceEyeDetector):
+    """Каскады Хаара для лица и глаз
+    
+    Рамки двух глаз запоминаются относительно лица. На следующих кадрах каждый
+    глаз ищется только в небольшом окне вокруг прошлой рамки; верхние 60% лица
+    просматриваются целиком, только если в окнах нашлись не оба глаза.
+    """
+    
+    name = "cascade"
+    
+    EYE_WINDOW_MARGIN = 0.5  # Расширение окна поиска глаза относительно прошлой рамки
+    
+    def __init__(self):
+        cv2_data = cv2.data.haarcascades
+        self.face_cascade_path = cv2_data + 'haarcascade_frontalface_default.xml'
+        self.eye_cascade_path = cv2_data + 'haarcascade_eye.xml'
+        self._face_cascade = None
+        self._eye_cascade = None
+        self._eye_cache = []  # Рамки глаз в долях размера лица
+    
+    def load(self) -> bool:
+        if self._face_cascade is None:
+            self._face_cascade = cv2.CascadeClassifier(self.face_cascade_path)
+            self._eye_cascade = cv2.CascadeClassifier(self.eye_cascade_path)
+        return not (self._face_cascade.empty() or self._eye_cascade.empty())
+    
+    def detect_faces(self, frame, gray, scale: float = 1.0) -> list:
+        if scale < 1.0:
+            small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            min_side = max(24, int(80 * scale))
+            faces = self._face_cascade.detectMultiScale(small, 1.1, 5, minSize=(min_side, min_side))
+            return [tuple(int(v / scale) for v in f) for f in faces]
+        return [tuple(int(v) for v in f) for f in
+                self._face_cascade.detectMultiScale(gray, 1.1, 5, minSize=(80, 80))]
+    
+    def reset(self):
+        self._eye_cache = []
+    
+    def detect_eyes(self, frame, gray, face) -> list:
+        if self._eye_cache:
+            eyes = self._search_eye_windows(gray, face)
+            # Оба окна могут найти один и тот же глаз — тогда ищем по всему лицу
+            if len(eyes) == 2 and self._distinct_eyes(eyes):
+                self._remember_eyes(eyes, face)
+                return eyes
+        
+        fx, fy, fw, fh = face
+        roi_gray = gray[fy:fy + int(fh * 0.6), fx:fx + fw]
+        eyes = list(self._eye_cascade.detectMultiScale(roi_gray, 1.1, 5, minSize=(20, 20)))
+        pair = sorted(eyes, key=lambda e: e[0])[:2]
+        if len(pair) == 2 and self._distinct_eyes(pair):
+            self._remember_eyes(pair, face)
+        else:
+            self._eye_cache = []
+        return eyes
+    
+    @staticmethod
+    def _distinct_eyes(eyes) -> bool:
+        """Два глаза не пересекаются, и первый (левый в кадре) левее второго"""
+        (ax, ay, aw, ah), (bx, by, bw, bh) = eyes
+        overlap = min(ax + aw, bx + bw) > max(ax, bx) and min(ay + ah, by + bh) > max(ay, by)
+        return not overlap and ax + aw / 2 < bx + bw / 2
+    
+    def _remember_eyes(self, eyes, face):
+        _, _, fw, fh = face
+        self._eye_cache = [(ex / fw, ey / fh, ew / fw, eh / fh) for ex, ey, ew, eh in eyes]
+    
+    def _search_eye_windows(self, gray, face) -> list:
+        """Поиск каждого глаза в окне вокруг его прошлого положения"""
+        fx, fy, fw, fh = face
+        eyes = []
+        for rx, ry, rw, rh in self._eye_cache:
+            ew, eh = rw * fw, rh * fh
+            mx, my = ew * self.EYE_WINDOW_MARGIN, eh * self.EYE_WINDOW_MARGIN
+            x0 = max(0, int(fx + rx * fw - mx))
+            y0 = max(0, int(fy + ry * fh - my))
+            x1 = min(gray.shape[1], int(fx + rx * fw + ew + mx))
+            y1 = min(gray.shape[0], int(fy + ry * fh + eh + my))
+            min_side = max(20, int(min(ew, eh) * 0.7))
+            max_side = int(max(ew, eh) * 1.4)
+            if x1 - x0 < min_side or y1 - y0 < min_side:
+                continue
+            found = self._eye_cascade.detectMultiScale(gray[y0:y1, x0:x1], 1.1, 5,
+                                                       minSize=(min_side, min_side),
+                                                       maxSize=(max_side, max_side))
+            if len(found) == 0:
+                continue
+            ex, ey, w, h = max(found, key=lambda e: e[2] * e[3])
+            eyes.append((int(ex) + x0 - fx, int(ey) + y0 - fy, int(w), int(h)))
+        return eyes
+
+
+class RoiTrackingDetector(CascadeDetector):
+    """Каскады с поиском лица в окрестности прошлой рамки
+    
+    Лицо ищется в рамке, расширенной на SEARCH_MARGIN, и только близких к прошлому
+    размеров; весь кадр просматривается, только если лицо там не нашлось.
+    """
+    
+    name = "roi"
+    
+    SEARCH_MARGIN = 0.5
+    
+    def __init__(self):
+        super().__init__()
+        self._last_face = None
+    
+    def reset(self):
+        super().reset()
+        self._last_face = None
+    
+    def detect_faces(self, frame, gray, scale: float = 1.0) -> list:
+        faces = []
+        if self._last_face is not None:
+            fx, fy, fw, fh = self._last_face
+            mx, my = int(fw * self.SEARCH_MARGIN), int(fh * self.SEARCH_MARGIN)
+            x0, y0 = max(0, fx - mx), max(0, fy - my)
+            x1, y1 = min(gray.shape[1], fx + fw + mx), min(gray.shape[0], fy + fh + my)
+            min_side = max(24, int(fw * 0.7))
+            max_side = int(fw * 1.4)
+            found = self._face_cascade.detectMultiScale(gray[y0:y1, x0:x1], 1.1, 5,
+                                                        minSize=(min_side, min_side),
+                                                        maxSize=(max_side, max_side))
+            faces = [(int(x) + x0, int(y) + y0, int(w), int(h)) for x, y, w, h in found]
+        
+        if not faces:
+            faces = super().detect_faces(frame, gray, scale)
+        self._last_face = max(faces, key=lambda f: f[2] * f[3]) if faces else None
+        return faces
+
+
+class YuNetDetector(FaceEyeDetector):
+    """Нейросетевой детектор лица OpenCV FaceDetectorYN (YuNet) с ключевыми точками
+    
+    Рамки глаз строятся вокруг найденных центров глаз, каскад глаз не нужен.
+    """
+    
+    name = "yunet"
+    
+    SCORE_THRESHOLD = 0.7
+    NMS_THRESHOLD = 0.3
+    
+    def __init__(self, model_path: str = YUNET_MODEL_PATH):
+        self.model_path = model_path
+        self._net = None
+        self._input_size = None
+        self._landmarks = []  # (рамка лица, центры глаз 2x2)
+    
+    def load(self) -> bool:
+        if self._net is None:
+            if not hasattr(cv2, 'FaceDetectorYN') or not os.path.exists(self.model_path):
+                return False
+            self._net = cv2.FaceDetectorYN.create(self.model_path, "", (320, 320),
+                                                  self.SCORE_THRESHOLD, self.NMS_THRESHOLD)
+        return True
+    
+    def reset(self):
+        self._landmarks = []
+    
+    def detect_faces(self, frame, gray, scale: float = 1.0) -> list:
+        image = frame
+        if scale < 1.0:
+            image = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        h, w = image.shape[:2]
+        if self._input_size != (w, h):
+            self._net.setInputSize((w, h))
+            self._input_size = (w, h)
+        
+        _, detections = self._net.detect(image)
+        self._landmarks = []
+        if detections is None:
+            return []
+        
+        faces = []
+        for det in detections:
+            x, y, bw, bh = (int(round(v / scale)) for v in det[:4])
+            face = (max(0, x), max(0, y), bw, bh)
+            faces.append(face)
+            self._landmarks.append((face, det[4:8].reshape(2, 2) / scale))
+        return faces
+    
+    def detect_eyes(self, frame, gray, face) -> list:
+        if not self._landmarks:
+            return []
+        fx, fy, fw, fh = face
+        # Рамка лица могла прийти из прошлого кадра (регулятор) — берём ближайшую
+        _, centers = min(self._landmarks, key=lambda item: abs(item[0][0] - fx) + abs(item[0][1] - fy))
+        ew = max(12, int(fw * 0.25))
+        eh = max(8, int(fw * 0.15))
+        eyes = []
+        for cx, cy in centers:
+            ex, ey = int(cx - ew / 2) - fx, int(cy - eh / 2) - fy
+            if ex >= 0 and ey >= 0 and ex + ew <= fw and ey + eh <= fh:
+                eyes.append((ex, ey, ew, eh))
+        return eyes
+
+
+DETECTORS = {
+    CascadeDetector.name: CascadeDetector,
+    RoiTrackingDetector.name: RoiTrackingDetector,
+    YuNetDetector.name: YuNetDetector,
+}
+
+
+def create_detector(name: str = CascadeDetector.name) -> FaceEyeDetector:
+    if name not in DETECTORS:
+        raise ValueError(f"Неизвестный детектор: {name}")
+    return DETECTORS[name]()
 
 
 @dataclass 
@@ -138,6 +612,13 @@ class CalibrationDialog(QDialog):
         (0.9, 0.5),   # Право центр
     ]
     
+    SETTLE_MS = 300  # Время на перевод взгляда к новой точке
+    POINT_PAUSE_MS = 300  # Пауза между точками
+    STABLE_WINDOW = 10  # Сэмплов в скользящем окне фиксации
+    STABLE_STD = 0.03  # Порог СКО по каждой оси, ниже которого взгляд считается неподвижным
+    POINT_TIMEOUT_MS = 3000  # Сколько ждать фиксацию, прежде чем отложить точку
+    MAX_RETRIES = 1  # Сколько раз неустойчивую точку можно повторить в конце очереди
+    
     def __init__(self, eye_tracker, parent=None):
         super().__init__(parent)
         self.eye_tracker = eye_tracker
@@ -146,15 +627,20 @@ class CalibrationDialog(QDialog):
         self.setModal(True)
         
         self.current_point_idx = 0
-        self.samples_per_point = 30
+        self.current_attempt = 0
+        self.point_queue = deque()
         self.current_samples = []
         self.calibration_data = []
+        self._best_window = None  # (СКО, сэмплы) самого устойчивого окна точки
+        self._sampling = False
+        self._cancelled = False
         
         self.setup_ui()
         
-        # Таймер для сбора данных
+        # Таймаут ожидания фиксации на точке
         self.sample_timer = QTimer()
-        self.sample_timer.timeout.connect(self._collect_sample)
+        self.sample_timer.setSingleShot(True)
+        self.sample_timer.timeout.connect(self._on_point_timeout)
         
         # Подключаем сигнал взгляда
         self.eye_tracker.gaze_updated.connect(self._on_gaze)
@@ -172,60 +658,82 @@ class CalibrationDialog(QDialog):
     
     def start_calibration(self):
         """Начать калибровку"""
-        self.current_point_idx = 0
+        self.point_queue = deque((idx, 0) for idx in range(len(self.CALIBRATION_POINTS)))
         self.calibration_data = []
         self._start_point()
     
     def _start_point(self):
-        """Начать сбор для текущей точки"""
-        if self.current_point_idx >= len(self.CALIBRATION_POINTS):
+        """Начать сбор для следующей точки из очереди"""
+        if self._cancelled:
+            return
+        if not self.point_queue:
             self._finish_calibration()
             return
         
+        self.current_point_idx, self.current_attempt = self.point_queue.popleft()
         px, py = self.CALIBRATION_POINTS[self.current_point_idx]
         self.calib_widget.set_point(px, py)
         self.current_samples = []
+        self._best_window = None
         
-        # Даём время на переместить взгляд
-        QTimer.singleShot(1000, self._begin_sampling)
+        # Даём время перевести взгляд
+        QTimer.singleShot(self.SETTLE_MS, self._begin_sampling)
     
     def _begin_sampling(self):
         """Начать сбор сэмплов"""
-        self.sample_timer.start(50)  # 20 Hz
+        if self._cancelled:
+            return
+        self._sampling = True
+        self.sample_timer.start(self.POINT_TIMEOUT_MS)
     
     def _on_gaze(self, gaze):
-        """Получение данных взгляда"""
+        """Получение данных взгляда: каждый новый кадр трекера — один сэмпл"""
         self._last_gaze = gaze
+        if self._sampling:
+            self._collect_sample(gaze)
     
-    def _collect_sample(self):
-        """Собрать один сэмпл"""
-        if self._last_gaze:
-            self.current_samples.append((self._last_gaze.gaze_x, self._last_gaze.gaze_y))
+    def _collect_sample(self, gaze):
+        """Добавить сэмпл и проверить устойчивость фиксации в скользящем окне"""
+        self.current_samples.append((gaze.gaze_x, gaze.gaze_y))
+        window = self.current_samples[-self.STABLE_WINDOW:]
+        self.calib_widget.set_progress(len(window) / self.STABLE_WINDOW)
+        if len(window) < self.STABLE_WINDOW:
+            return
         
-        progress = len(self.current_samples) / self.samples_per_point
-        self.calib_widget.set_progress(progress)
+        spread = float(np.max(np.std(window, axis=0)))
+        if self._best_window is None or spread < self._best_window[0]:
+            self._best_window = (spread, window)
         
-        if len(self.current_samples) >= self.samples_per_point:
-            self.sample_timer.stop()
-            self._finish_point()
+        if spread < self.STABLE_STD:
+            self._finish_point(window)
+    
+    def _on_point_timeout(self):
+        """Фиксация не набралась: откладываем точку в конец очереди"""
+        self._sampling = False
+        if self.current_attempt < self.MAX_RETRIES:
+            self.point_queue.append((self.current_point_idx, self.current_attempt + 1))
+            QTimer.singleShot(self.POINT_PAUSE_MS, self._start_point)
+        else:
+            # Повторы исчерпаны — берём самое устойчивое окно, если оно было
+            self._finish_point(self._best_window[1] if self._best_window else [])
     
-    def _finish_point(self):
+    def _finish_point(self, samples):
         """Завершить сбор для точки"""
+        self._sampling = False
+        self.sample_timer.stop()
         px, py = self.CALIBRATION_POINTS[self.current_point_idx]
         
-        # Усредняем сэмплы
-        if self.current_samples:
-            avg_x = np.mean([s[0] for s in self.current_samples])
-            avg_y = np.mean([s[1] for s in self.current_samples])
+        # Усредняем сэмплы устойчивого кластера
+        if samples:
+            avg_x = np.mean([s[0] for s in samples])
+            avg_y = np.mean([s[1] for s in samples])
             self.calibration_data.append({
                 'screen': (px, py),
                 'gaze': (avg_x, avg_y)
             })
         
-        self.current_point_idx += 1
-        
         # Небольшая пауза перед следующей точкой
-        QTimer.singleShot(500, self._start_point)
+        QTimer.singleShot(self.POINT_PAUSE_MS, self._start_point)
     
     def _finish_calibration(self):
         """Завершить калибровку"""
@@ -262,6 +770,8 @@ class CalibrationDialog(QDialog):
     
     def keyPressEvent(self, event):
         if event.key() == Qt.Key.Key_Escape:
+            self._cancelled = True
+            self._sampling = False
             self.sample_timer.stop()
             try:
                 self.eye_tracker.gaze_updated.disconnect(self._on_gaze)
@@ -278,21 +788,28 @@ class EyeTracker(QObject):
     error_occurred = pyqtSignal(str)
     tracking_started = pyqtSignal()
     tracking_stopped = pyqtSignal()
+    stats_updated = pyqtSignal(object)  # TrackerStats
     
-    def __init__(self):
+    READ_FAILURE_TIMEOUT = 5.0  # Сколько секунд камера может не отдавать кадры
+    
+    def __init__(self, camera_index: int = 0):
         super().__init__()
+        self.camera_index = camera_index
         self._stop_event = Event()
         self._thread = None
         self._is_running = False
         self._calibration = None
         
-        cv2_data = cv2.data.haarcascades
-        self._face_cascade_path = cv2_data + 'haarcascade_frontalface_default.xml'
-        self._eye_cascade_path = cv2_data + 'haarcascade_eye.xml'
+        self._detector: FaceEyeDetector = CascadeDetector()
+        
+        # Адаптивное сглаживание: сильное при фиксации, слабое во время саккад
+        self._filter: Optional[GazeFilter] = OneEuroFilter()
+        self._predictor: Optional[GazePredictor] = None
         
-        self._smooth_x = 0.5
-        self._smooth_y = 0.5
-        self._smooth_factor = 0.3
+        self._profiler: Optional[StageProfiler] = None
+        self._governor: Optional[GazeGovernor] = GazeGovernor()
+        self.camera_profile: Optional[CameraProfile] = None
+        self._last_face = None
     
     @property
     def is_running(self) -> bool:
@@ -302,6 +819,39 @@ class EyeTracker(QObject):
     def is_calibrated(self) -> bool:
         return self._calibration is not None
     
+    @property
+    def calibration(self):
+        return self._calibration
+    
+    def set_profiler(self, profiler: Optional[StageProfiler]):
+        """Включить (или выключить, передав None) замер времени этапов"""
+        self._profiler = profiler
+    
+    def set_filter(self, gaze_filter: Optional[GazeFilter]):
+        """Задать фильтр сглаживания (None — сырые координаты зрачка)"""
+        if gaze_filter is not None:
+            gaze_filter.reset()
+        self._filter = gaze_filter
+    
+    def set_predictor(self, predictor: Optional[GazePredictor]):
+        """Включить (или выключить, передав None) компенсацию задержки предсказанием"""
+        if predictor is not None:
+            predictor.reset()
+        self._predictor = predictor
+    
+    def set_detector(self, detector: FaceEyeDetector):
+        """Задать детектор лица и глаз (применяется при следующем запуске)"""
+        self._detector = detector
+    
+    def set_governor(self, governor: Optional[GazeGovernor]):
+        """Задать регулятор нагрузки (None — обрабатывать каждый кадр целиком)"""
+        self._governor = governor
+    
+    def _stage(self, name: str):
+        if self._profiler is None:
+            return _NO_STAGE
+        return self._profiler.stage(name)
+    
     def set_calibration(self, calibration):
         """Установить данные калибровки"""
         self._calibration = calibration
@@ -329,13 +879,20 @@ class EyeTracker(QObject):
         except:
             return gaze_x, gaze_y
     
-    def start(self, camera_index: int = 0):
+    def start(self, camera_index: Optional[int] = None, source=None):
+        """Запустить трекинг камеры camera_index (по умолчанию своей)
+        
+        source — видеофайл вместо камеры, например для замеров нагрузки.
+        """
         if self._is_running:
             return
+        if camera_index is not None:
+            self.camera_index = camera_index
         
         self._stop_event.clear()
         self._is_running = True
-        self._thread = Thread(target=self._run_loop, args=(camera_index,), daemon=True)
+        self._thread = Thread(target=self._run_loop, args=(self.camera_index if source is None else source,),
+                              daemon=True)
         self._thread.start()
     
     def stop(self):
@@ -349,24 +906,19 @@ class EyeTracker(QObject):
             self._thread.join(timeout=1.0)
         self._thread = None
     
-    def _run_loop(self, camera_index: int):
+    def _run_loop(self, camera_index):
         capture = None
-        face_cascade = None
-        eye_cascade = None
+        detector = self._detector
         
         try:
-            face_cascade = cv2.CascadeClassifier(self._face_cascade_path)
-            eye_cascade = cv2.CascadeClassifier(self._eye_cascade_path)
-            
-            if face_cascade.empty() or eye_cascade.empty():
-                self.error_occurred.emit("Не удалось загрузить каскады")
+            if not detector.load():
+                self.error_occurred.emit(f"Не удалось загрузить детектор: {detector.name}")
                 self._is_running = False
                 self.tracking_stopped.emit()
                 return
             
-            capture = cv2.VideoCapture(camera_index, cv2.CAP_DSHOW)
-            if not capture.isOpened():
-                capture = cv2.VideoCapture(camera_index)
+            # Бэкенд и формат берутся из кэша профилей; при первом запуске — подбираются
+            capture, self.camera_profile = open_camera(camera_index)
             
             if not capture.isOpened():
                 self.error_occurred.emit("Камера недоступна")
@@ -374,29 +926,61 @@ class EyeTracker(QObject):
                 self.tracking_stopped.emit()
                 return
             
-            capture.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            capture.set(cv2.CAP_PROP_FPS, 30)
-            
             self.tracking_started.emit()
             
+            governor = self._governor
+            if governor is not None:
+                governor.reset()
+            self._last_face = None
+            detector.reset()
+            if self._filter is not None:
+                self._filter.reset()
+            if self._predictor is not None:
+                self._predictor.reset()
+            read_failures = 0
+            failing_since = 0.0
+            # Видеофайл отдаёт кадры без ожидания — читаем его в темпе записи, как камеру
+            is_file = isinstance(camera_index, str)
+            frame_period = 0.0
+            if is_file:
+                fps = capture.get(cv2.CAP_PROP_FPS)
+                frame_period = 1.0 / fps if fps and fps > 0 else 1.0 / 30
+            next_frame_time = time.monotonic()
+            
             while not self._stop_event.is_set():
-                ret, frame = capture.read()
+                if frame_period:
+                    delay = next_frame_time - time.monotonic()
+                    if delay > 0 and self._stop_event.wait(delay):
+                        break
+                    next_frame_time += frame_period
+                # Лишние кадры забираем без декодирования, чтобы буфер камеры не устаревал
+                skip = governor is not None and not governor.should_process(time.monotonic())
+                if skip:
+                    ret, frame = capture.grab(), None
+                else:
+                    ret, frame = capture.read()
+                
+                if not ret and is_file:
+                    self.error_occurred.emit("Видео закончилось")
+                    break
                 if not ret:
+                    read_failures += 1
+                    if read_failures == 1:
+                        failing_since = time.monotonic()
+                    elif time.monotonic() - failing_since > self.READ_FAILURE_TIMEOUT:
+                        self.error_occurred.emit("Камера перестала отдавать кадры")
+                        break
+                    self._stop_event.wait(min(0.5, 0.005 * 2 ** min(read_failures, 7)))
                     continue
+                read_failures = 0
                 
-                frame = cv2.flip(frame, 1)
-                gaze_data, annotated = self._process(frame, face_cascade, eye_cascade)
+                if skip:
+                    continue
                 
-                if gaze_data and not self._stop_event.is_set():
-                    self.gaze_updated.emit(gaze_data)
+                self._process_frame(frame, detector, time.monotonic())
                 
-                if not self._stop_event.is_set():
-                    rgb = cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)
-                    h, w, ch = rgb.shape
-                    bytes_data = rgb.tobytes()
-                    img = QImage(bytes_data, w, h, ch * w, QImage.Format.Format_RGB888)
-                    self.frame_ready.emit(img.copy())
+                if governor is not None and governor.frame_processed(time.monotonic(), time.thread_time()):
+                    self.stats_updated.emit(governor.stats)
         
         except Exception as e:
             if not self._stop_event.is_set():
@@ -408,11 +992,41 @@ class EyeTracker(QObject):
             self._is_running = False
             self.tracking_stopped.emit()
     
-    def _process(self, frame, face_cascade, eye_cascade) -> Tuple[Optional[GazeData], np.ndarray]:
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    def _process_frame(self, frame, detector: FaceEyeDetector,
+                       timestamp: Optional[float] = None) -> Optional[GazeData]:
+        """Полная обработка кадра с камеры: отражение, трекинг, отправка сигналов"""
+        with self._stage('flip'):
+            frame = cv2.flip(frame, 1)
+        gaze_data, annotated = self._process(frame, detector, timestamp)
+        
+        if gaze_data and not self._stop_event.is_set():
+            self.gaze_updated.emit(gaze_data)
+        
+        if not self._stop_event.is_set():
+            with self._stage('qimage'):
+                img = self._to_qimage(annotated)
+            self.frame_ready.emit(img)
+        return gaze_data
+    
+    @staticmethod
+    def _to_qimage(frame) -> QImage:
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        h, w, ch = rgb.shape
+        bytes_data = rgb.tobytes()
+        img = QImage(bytes_data, w, h, ch * w, QImage.Format.Format_RGB888)
+        return img.copy()
+    
+    def _process(self, frame, detector: FaceEyeDetector,
+                 timestamp: Optional[float] = None) -> Tuple[Optional[GazeData], np.ndarray]:
+        started = time.monotonic()
+        if timestamp is None:
+            timestamp = started
+        with self._stage('cvtColor'):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         h, w = frame.shape[:2]
         
-        faces = face_cascade.detectMultiScale(gray, 1.1, 5, minSize=(80, 80))
+        with self._stage('face_detect'):
+            faces = self._detect_faces(frame, gray, detector)
         
         gaze_data = None
         
@@ -422,10 +1036,14 @@ class EyeTracker(QObject):
             
             cv2.rectangle(frame, (fx, fy), (fx + fw, fy + fh), (0, 255, 0), 2)
             
-            roi_gray = gray[fy:fy + int(fh * 0.6), fx:fx + fw]
             roi_color = frame[fy:fy + int(fh * 0.6), fx:fx + fw]
             
-            eyes = eye_cascade.detectMultiScale(roi_gray, 1.1, 5, minSize=(20, 20))
+            with self._stage('eye_detect'):
+                eyes = detector.detect_eyes(frame, gray, face)
+            
+            # Глаза не нашлись в прошлой рамке лица — на следующем кадре ищем лицо заново
+            if len(eyes) == 0 and self._governor is not None:
+                self._governor.invalidate()
             
             left_eye = None
             right_eye = None
@@ -449,37 +1067,37 @@ class EyeTracker(QObject):
                     
                     eye_roi = gray[fy + ey:fy + ey + eh, fx + ex:fx + ex + ew]
                     if eye_roi.size > 0:
-                        pupil = self._find_pupil(eye_roi)
+                        with self._stage('find_pupil'):
+                            pupil = self._find_pupil(eye_roi)
                         if pupil:
                             px, py = pupil
                             cv2.circle(roi_color, (ex + px, ey + py), 3, (0, 255, 255), -1)
                             gaze_x = px / ew
                             gaze_y = py / eh
             
-            self._smooth_x += (gaze_x - self._smooth_x) * self._smooth_factor
-            self._smooth_y += (gaze_y - self._smooth_y) * self._smooth_factor
+            if self._filter is not None:
+                with self._stage('filter'):
+                    gaze_x, gaze_y = self._filter.filter(gaze_x, gaze_y, timestamp)
+            
+            # Взгляд экстраполируется с момента кадра на момент выдачи результата
+            observed_x = observed_y = None
+            if self._predictor is not None:
+                observed_x, observed_y = gaze_x, gaze_y
+                with self._stage('predict'):
+                    self._predictor.update(gaze_x, gaze_y, timestamp)
+                    timestamp += time.monotonic() - started + self._predictor.lead
+                    gaze_x, gaze_y = self._predictor.predict(timestamp)
             
             # Применяем калибровку
-            screen_x, screen_y = self._apply_calibration(self._smooth_x, self._smooth_y)
+            with self._stage('calibration'):
+                screen_x, screen_y = self._apply_calibration(gaze_x, gaze_y)
             
             # Направление на основе калиброванных координат
-            if screen_x < 0.35:
-                h_dir = "left"
-            elif screen_x > 0.65:
-                h_dir = "right"
-            else:
-                h_dir = "center"
-            
-            if screen_y < 0.35:
-                v_dir = "up"
-            elif screen_y > 0.65:
-                v_dir = "down"
-            else:
-                v_dir = "center"
+            h_dir, v_dir = gaze_directions(screen_x, screen_y)
             
             gaze_data = GazeData(
-                gaze_x=self._smooth_x,
-                gaze_y=self._smooth_y,
+                gaze_x=gaze_x,
+                gaze_y=gaze_y,
                 screen_x=screen_x,
                 screen_y=screen_y,
                 horizontal_direction=h_dir,
@@ -488,7 +1106,11 @@ class EyeTracker(QObject):
                 right_eye_open=right_eye is not None,
                 face_x=(fx + fw / 2) / w,
                 face_y=(fy + fh / 2) / h,
-                confidence=1.0 if len(eyes) >= 2 else 0.5
+                confidence=1.0 if len(eyes) >= 2 else 0.5,
+                timestamp=timestamp,
+                camera_index=self.camera_index,
+                observed_x=observed_x,
+                observed_y=observed_y
             )
             
             self._draw_indicator(frame, gaze_data)
@@ -498,6 +1120,20 @@ class EyeTracker(QObject):
         
         return gaze_data, frame
     
+    def _detect_faces(self, frame, gray, detector: FaceEyeDetector):
+        """Поиск лиц с учётом регулятора: повтор прошлой рамки или уменьшенный кадр"""
+        governor = self._governor
+        if governor is not None and self._last_face is not None and not governor.should_detect():
+            return [self._last_face]
+        
+        scale = governor.detect_scale if governor is not None else 1.0
+        faces = detector.detect_faces(frame, gray, scale)
+        
+        self._last_face = tuple(max(faces, key=lambda f: f[2] * f[3])) if len(faces) > 0 else None
+        if governor is not None:
+            governor.face_observed(self._last_face)
+        return faces
+    
     def _find_pupil(self, eye_roi) -> Optional[Tuple[int, int]]:
         if eye_roi.size == 0:
             return None
@@ -534,5 +1170,69 @@ class EyeTracker(QObject):
         cv2.putText(frame, eyes, (10, 110), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (200, 200, 200), 1)
 
 
-# Глобальный экземпляр
-eye_tracker = EyeTracker()
+class EyeTrackerManager(QObject):
+    """Несколько трекеров взгляда одновременно: по одному на камеру
+    
+    Каждый трекер работает в своём потоке со своей калибровкой, фильтром и
+    регулятором нагрузки. Сигналы трекеров пересылаются с индексом камеры,
+    статистика (FPS и доля CPU потока) хранится по каждой камере.
+    """
+    
+    gaze_updated = pyqtSignal(int, object)
+    frame_ready = pyqtSignal(int, object)
+    error_occurred = pyqtSignal(int, str)
+    tracking_started = pyqtSignal(int)
+    tracking_stopped = pyqtSignal(int)
+    stats_updated = pyqtSignal(int, object)  # индекс камеры, TrackerStats
+    
+    def __init__(self, default: Optional[EyeTracker] = None):
+        super().__init__()
+        self._trackers: Dict[int, EyeTracker] = {}
+        self._stats: Dict[int, TrackerStats] = {}
+        if default is not None:
+            self._add(default)
+    
+    def _add(self, tracker: EyeTracker):
+        index = tracker.camera_index
+        self._trackers[index] = tracker
+        tracker.gaze_updated.connect(lambda gaze, i=index: self.gaze_updated.emit(i, gaze))
+        tracker.frame_ready.connect(lambda img, i=index: self.frame_ready.emit(i, img))
+        tracker.error_occurred.connect(lambda msg, i=index: self.error_occurred.emit(i, msg))
+        tracker.tracking_started.connect(lambda i=index: self.tracking_started.emit(i))
+        tracker.tracking_stopped.connect(lambda i=index: self.tracking_stopped.emit(i))
+        tracker.stats_updated.connect(lambda stats, i=index: self._on_stats(i, stats))
+    
+    def _on_stats(self, camera_index: int, stats: TrackerStats):
+        self._stats[camera_index] = stats
+        self.stats_updated.emit(camera_index, stats)
+    
+    def tracker(self, camera_index: int) -> EyeTracker:
+        """Трекер камеры (создаётся при первом обращении)"""
+        if camera_index not in self._trackers:
+            self._add(EyeTracker(camera_index))
+        return self._trackers[camera_index]
+    
+    @property
+    def cameras(self) -> List[int]:
+        return sorted(self._trackers)
+    
+    def start(self, camera_indexes: List[int]):
+        for index in camera_indexes:
+            self.tracker(index).start()
+    
+    def stop_all(self):
+        for tracker in self._trackers.values():
+            tracker.stop()
+    
+    def stats(self) -> Dict[int, TrackerStats]:
+        """Последняя статистика работающих камер"""
+        return {i: s for i, s in self._stats.items() if self._trackers[i].is_running}
+    
+    def total_cpu_share(self) -> float:
+        """Суммарная загрузка CPU всеми камерами (в долях одного ядра)"""
+        return sum(s.cpu_share for s in self.stats().values())
+
+
+# Глобальный экземпляр (камера 0) и менеджер для нескольких камер
+eye_tracker = EyeTracker(0)
+eye_trackers = EyeTrackerManager(eye_tracker)
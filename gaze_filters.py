@@ -0,0 +1,438 @@
+"""
+Фильтры сглаживания взгляда и отчёт «задержка против дрожания»
+
+Фильтр получает сырые координаты (0-1) и время кадра в секундах и возвращает
+сглаженные координаты. Адаптивные фильтры (One-Euro, Калман со скоростью)
+сильнее сглаживают при фиксации и почти не отстают во время саккад.
+
+Предсказатель (GazePredictor) компенсирует задержку захвата и обработки:
+оценивает скорость взгляда по последним сэмплам и экстраполирует его на текущий
+момент. PredictionMonitor сравнивает предсказания с позже наблюдёнными позициями.
+
+Отчёт по записанному потоку взгляда:
+    python gaze_filters.py session_gaze.json --json filters_report.json
+    python gaze_filters.py session_gaze.json --predict 50
+"""
+import sys
+import json
+import math
+import argparse
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+class GazeFilter:
+    """Базовый фильтр взгляда"""
+
+    name = "none"
+
+    def reset(self):
+        pass
+
+    def filter(self, x: float, y: float, t: float) -> Tuple[float, float]:
+        return x, y
+
+
+class ExponentialFilter(GazeFilter):
+    """Экспоненциальное сглаживание с постоянным коэффициентом (прежнее поведение трекера)"""
+
+    name = "ema"
+
+    def __init__(self, factor: float = 0.3):
+        self.factor = factor
+        self.reset()
+
+    def reset(self):
+        self._x = 0.5
+        self._y = 0.5
+
+    def filter(self, x, y, t):
+        self._x += (x - self._x) * self.factor
+        self._y += (y - self._y) * self.factor
+        return self._x, self._y
+
+
+class _LowPass:
+    """Фильтр первого порядка с переменным коэффициентом"""
+
+    def __init__(self):
+        self.value = None
+
+    def apply(self, value: float, alpha: float) -> float:
+        if self.value is None:
+            self.value = value
+        else:
+            self.value += (value - self.value) * alpha
+        return self.value
+
+
+class OneEuroFilter(GazeFilter):
+    """Фильтр One-Euro (Casiez et al., 2012)
+
+    Частота среза растёт со скоростью взгляда: min_cutoff задаёт сглаживание
+    при фиксации, beta — насколько быстро фильтр «отпускает» при саккаде.
+    """
+
+    name = "one_euro"
+
+    def __init__(self, min_cutoff: float = 1.0, beta: float = 2.0, d_cutoff: float = 1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self._axes = [(_LowPass(), _LowPass()), (_LowPass(), _LowPass())]
+        self._last_t = None
+
+    @staticmethod
+    def _alpha(cutoff: float, dt: float) -> float:
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def filter(self, x, y, t):
+        if self._last_t is None or t <= self._last_t:
+            dt = 1.0 / 30
+        else:
+            dt = t - self._last_t
+        first = self._last_t is None
+        self._last_t = t
+
+        result = []
+        for value, (value_filter, speed_filter) in zip((x, y), self._axes):
+            prev = value_filter.value
+            speed = 0.0 if first or prev is None else (value - prev) / dt
+            speed = speed_filter.apply(speed, self._alpha(self.d_cutoff, dt))
+            cutoff = self.min_cutoff + self.beta * abs(speed)
+            result.append(value_filter.apply(value, self._alpha(cutoff, dt)))
+        return result[0], result[1]
+
+
+class KalmanFilter(GazeFilter):
+    """Фильтр Калмана с моделью постоянной скорости по каждой оси
+
+    При большом рассогласовании измерения с прогнозом (начало саккады) шум
+    процесса временно увеличивается, и фильтр быстрее догоняет взгляд.
+    """
+
+    name = "kalman"
+
+    def __init__(self, process_noise: float = 20.0, measurement_noise: float = 0.004,
+                 maneuver_gain: float = 20.0):
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.maneuver_gain = maneuver_gain
+        self.reset()
+
+    def reset(self):
+        self._state = None  # [[x, vx], [y, vy]]
+        self._cov = None
+        self._last_t = None
+
+    def filter(self, x, y, t):
+        if self._state is None:
+            self._state = np.array([[x, 0.0], [y, 0.0]])
+            self._cov = np.array([np.eye(2) * self.measurement_noise] * 2)
+            self._last_t = t
+            return x, y
+
+        dt = t - self._last_t if t > self._last_t else 1.0 / 30
+        self._last_t = t
+        transition = np.array([[1.0, dt], [0.0, 1.0]])
+        noise = self.process_noise * np.array([[dt ** 4 / 4, dt ** 3 / 2], [dt ** 3 / 2, dt ** 2]])
+
+        result = []
+        for axis, measured in enumerate((x, y)):
+            state = transition @ self._state[axis]
+            cov = transition @ self._cov[axis] @ transition.T + noise
+            innovation = measured - state[0]
+            innovation_var = cov[0, 0] + self.measurement_noise
+            # Манёвр: измерение далеко за пределами ожидаемого разброса
+            if innovation * innovation > 9 * innovation_var:
+                cov = cov + noise * self.maneuver_gain
+                innovation_var = cov[0, 0] + self.measurement_noise
+            gain = cov[:, 0] / innovation_var
+            self._state[axis] = state + gain * innovation
+            self._cov[axis] = cov - np.outer(gain, cov[0, :])
+            result.append(float(self._state[axis][0]))
+        return result[0], result[1]
+
+
+FILTERS = {
+    ExponentialFilter.name: ExponentialFilter,
+    OneEuroFilter.name: OneEuroFilter,
+    KalmanFilter.name: KalmanFilter,
+}
+
+DEFAULT_FILTER = OneEuroFilter.name
+
+
+def create_filter(name: Optional[str] = DEFAULT_FILTER) -> Optional[GazeFilter]:
+    """Фильтр по имени; None или 'none' — без сглаживания"""
+    if not name or name == GazeFilter.name:
+        return None
+    if name not in FILTERS:
+        raise ValueError(f"Неизвестный фильтр: {name}")
+    return FILTERS[name]()
+
+
+class PredictionMonitor:
+    """Ошибка предсказания относительно позже наблюдённого взгляда
+
+    Для каждого предсказания запоминается и позиция без компенсации (последний
+    сэмпл). Когда приходит наблюдение не раньше момента предсказания, истинная
+    позиция берётся интерполяцией между соседними наблюдениями, и сравниваются
+    обе ошибки.
+    """
+
+    def __init__(self, history: int = 2000):
+        self._pending = deque(maxlen=256)  # (target_t, x, y, base_x, base_y)
+        self._last = None
+        self.predicted_errors = deque(maxlen=history)
+        self.stale_errors = deque(maxlen=history)
+
+    def reset(self):
+        self._pending.clear()
+        self._last = None
+        self.predicted_errors.clear()
+        self.stale_errors.clear()
+
+    def predicted(self, target_t: float, x: float, y: float, base_x: float, base_y: float):
+        self._pending.append((target_t, x, y, base_x, base_y))
+
+    def observed(self, t: float, x: float, y: float):
+        last = self._last
+        self._last = (t, x, y)
+        while self._pending and self._pending[0][0] <= t:
+            target_t, px, py, bx, by = self._pending.popleft()
+            if last is None or target_t < last[0]:
+                continue
+            k = (target_t - last[0]) / (t - last[0]) if t > last[0] else 1.0
+            true_x = last[1] + (x - last[1]) * k
+            true_y = last[2] + (y - last[2]) * k
+            self.predicted_errors.append(math.hypot(px - true_x, py - true_y))
+            self.stale_errors.append(math.hypot(bx - true_x, by - true_y))
+
+    def summary(self) -> dict:
+        if not self.predicted_errors:
+            return {'samples': 0}
+        predicted = np.array(self.predicted_errors)
+        stale = np.array(self.stale_errors)
+        return {
+            'samples': int(len(predicted)),
+            'predicted_error_mean': round(float(predicted.mean()), 5),
+            'predicted_error_p95': round(float(np.percentile(predicted, 95)), 5),
+            'stale_error_mean': round(float(stale.mean()), 5),
+            'stale_error_p95': round(float(np.percentile(stale, 95)), 5),
+            'improvement': round(1 - float(predicted.mean()) / float(stale.mean()), 4) if stale.mean() > 0 else 0.0
+        }
+
+
+class GazePredictor:
+    """Экстраполяция взгляда на текущий момент по скорости последних сэмплов
+
+    Скорость — наклон линейной регрессии по сэмплам за последние window секунд.
+    Горизонт ограничен max_horizon: дальняя экстраполяция только добавляет шум.
+    При скорости ниже min_speed (фиксация) взгляд не экстраполируется, чтобы не
+    усиливать дрожание.
+    lead — дополнительное упреждение на задержку камеры и вывода на экран.
+    """
+
+    def __init__(self, window: float = 0.1, max_horizon: float = 0.05, lead: float = 0.0,
+                 min_speed: float = 0.5, monitor: Optional[PredictionMonitor] = None):
+        self.window = window
+        self.max_horizon = max_horizon
+        self.min_speed = min_speed
+        self.lead = lead
+        self.monitor = monitor
+        self._samples = deque(maxlen=16)
+
+    def reset(self):
+        self._samples.clear()
+        if self.monitor is not None:
+            self.monitor.reset()
+
+    def update(self, x: float, y: float, t: float):
+        while self._samples and t - self._samples[0][0] > self.window:
+            self._samples.popleft()
+        self._samples.append((t, x, y))
+        if self.monitor is not None:
+            self.monitor.observed(t, x, y)
+
+    def velocity(self) -> Tuple[float, float]:
+        if len(self._samples) < 3:
+            return 0.0, 0.0
+        data = np.array(self._samples)
+        t = data[:, 0] - data[:, 0].mean()
+        denom = float(t @ t)
+        if denom <= 0:
+            return 0.0, 0.0
+        return float(t @ data[:, 1]) / denom, float(t @ data[:, 2]) / denom
+
+    def predict(self, t: float) -> Tuple[float, float]:
+        """Взгляд в момент t (по шкале времени update)"""
+        if not self._samples:
+            return 0.5, 0.5
+        last_t, last_x, last_y = self._samples[-1]
+        horizon = min(max(t - last_t, 0.0), self.max_horizon)
+        vx, vy = self.velocity()
+        if math.hypot(vx, vy) < self.min_speed:
+            vx = vy = 0.0
+        x = min(max(last_x + vx * horizon, 0.0), 1.0)
+        y = min(max(last_y + vy * horizon, 0.0), 1.0)
+        if self.monitor is not None:
+            self.monitor.predicted(t, x, y, last_x, last_y)
+        return x, y
+
+
+# ---------- Отчёт «задержка против дрожания» ----------
+
+FIXATION_SPEED = 0.3  # Скорость опорного сигнала (единиц экрана в секунду) для фиксации
+SACCADE_SPEED = 1.5  # ... и для саккады
+MAX_LAG_MS = 300
+
+
+def _centered_smooth(values: np.ndarray, window: int) -> np.ndarray:
+    """Сглаживание без задержки: медиана и среднее по центрированному окну"""
+    half = window // 2
+    padded = np.pad(values, half, mode='edge')
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window)
+    median = np.median(windows, axis=1)
+    padded = np.pad(median, half, mode='edge')
+    return np.convolve(padded, np.ones(window) / window, mode='valid')
+
+
+def load_gaze_stream(path: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Время (с) и несглаженные координаты из отчёта (JSON или .npz) или результата gaze_reprocess
+
+    Берутся pupil_x/pupil_y, если они есть, иначе raw_x/raw_y или gaze_x/gaze_y.
+    """
+    from report_storage import load_session  # report_storage сам зависит от этого модуля
+    session = load_session(path)
+    if not len(session):
+        return np.zeros(0), np.zeros(0), np.zeros(0)
+
+    for key_x, key_y in (('pupil_x', 'pupil_y'), ('raw_x', 'raw_y'), ('gaze_x', 'gaze_y')):
+        if key_x in session.columns:
+            break
+    if 'video_ms' in session.columns and 'elapsed_sec' not in session.columns:
+        times = session.column('video_ms') / 1000
+    else:
+        times = session.column('elapsed_sec')
+    return times, session.column(key_x), session.column(key_y)
+
+
+def evaluate_filter(gaze_filter: Optional[GazeFilter], times, xs, ys) -> Dict[str, float]:
+    """Задержка на саккадах и дрожание на фиксациях для фильтра
+
+    Опорный сигнал — сглаживание по центрированному окну (без задержки).
+    Задержка — сдвиг опорного сигнала во времени, лучше всего совпадающий с
+    выходом фильтра на участках саккад. Дрожание — СКО смещения между соседними
+    кадрами на участках фиксаций.
+    """
+    if not len(times):
+        return {'lag_ms': 0.0, 'jitter': 0.0, 'fixation_samples': 0, 'saccade_samples': 0}
+
+    if gaze_filter is not None:
+        gaze_filter.reset()
+        filtered = np.array([gaze_filter.filter(x, y, t) for t, x, y in zip(times, xs, ys)])
+    else:
+        filtered = np.column_stack([xs, ys])
+
+    reference = np.column_stack([_centered_smooth(xs, 7), _centered_smooth(ys, 7)])
+    dt = np.diff(times, prepend=times[0] - 1.0 / 30)
+    dt[dt <= 0] = 1.0 / 30
+    speed = np.hypot(*np.diff(reference, axis=0, prepend=reference[:1]).T) / dt
+
+    fixation = speed < FIXATION_SPEED
+    steps = np.hypot(*np.diff(filtered, axis=0, prepend=filtered[:1]).T)
+    jitter = float(np.sqrt(np.mean(steps[fixation] ** 2))) if fixation.any() else 0.0
+
+    saccade = speed > SACCADE_SPEED
+    lag_ms = 0.0
+    if saccade.any():
+        errors = []
+        shifts = np.arange(0, MAX_LAG_MS + 1, 5)
+        for shift in shifts:
+            delayed_t = times - shift / 1000
+            ref_x = np.interp(delayed_t, times, reference[:, 0])
+            ref_y = np.interp(delayed_t, times, reference[:, 1])
+            err = (filtered[saccade, 0] - ref_x[saccade]) ** 2 + (filtered[saccade, 1] - ref_y[saccade]) ** 2
+            errors.append(err.mean())
+        lag_ms = float(shifts[int(np.argmin(errors))])
+
+    return {
+        'lag_ms': lag_ms,
+        'jitter': round(jitter, 5),
+        'fixation_samples': int(fixation.sum()),
+        'saccade_samples': int(saccade.sum())
+    }
+
+
+def evaluate_predictor(times, xs, ys, horizon_ms: float,
+                       filter_name: Optional[str] = DEFAULT_FILTER) -> dict:
+    """Ошибка предсказания на horizon_ms вперёд по сравнению с последним сэмплом"""
+    gaze_filter = create_filter(filter_name)
+    monitor = PredictionMonitor(history=len(times) or 1)
+    predictor = GazePredictor(max_horizon=max(horizon_ms / 1000, 0.1), monitor=monitor)
+    for t, x, y in zip(times, xs, ys):
+        if gaze_filter is not None:
+            x, y = gaze_filter.filter(x, y, t)
+        predictor.update(x, y, t)
+        predictor.predict(t + horizon_ms / 1000)
+    return monitor.summary()
+
+
+def filter_report(path: str, names=None) -> dict:
+    """Сравнить фильтры на записанном потоке взгляда"""
+    times, xs, ys = load_gaze_stream(path)
+    names = names or [GazeFilter.name] + list(FILTERS)
+    return {
+        'source': path,
+        'samples': int(len(times)),
+        'filters': {name: evaluate_filter(create_filter(name), times, xs, ys) for name in names}
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Задержка и дрожание фильтров взгляда")
+    parser.add_argument('stream', help="Отчёт или результат gaze_reprocess.py")
+    parser.add_argument('--filters', nargs='+', choices=[GazeFilter.name] + list(FILTERS),
+                        help="Какие фильтры сравнивать (по умолчанию все)")
+    parser.add_argument('--predict', type=float, metavar='MS',
+                        help="Оценить предсказание взгляда на MS миллисекунд вперёд")
+    parser.add_argument('--json', help="Сохранить отчёт в JSON")
+    args = parser.parse_args(argv)
+
+    report = filter_report(args.stream, args.filters)
+    if args.predict:
+        times, xs, ys = load_gaze_stream(args.stream)
+        report['prediction'] = dict(horizon_ms=args.predict,
+                                    **evaluate_predictor(times, xs, ys, args.predict))
+    if report['samples'] < 10:
+        print("Слишком мало сэмплов для оценки", file=sys.stderr)
+        return 1
+
+    print(f"Сэмплов: {report['samples']}")
+    print(f"{'Фильтр':<10}{'Задержка, мс':>14}{'Дрожание':>12}")
+    for name, stats in report['filters'].items():
+        print(f"{name:<10}{stats['lag_ms']:>14.0f}{stats['jitter']:>12.4f}")
+
+    prediction = report.get('prediction')
+    if prediction and prediction.get('samples'):
+        print(f"\nПредсказание на {prediction['horizon_ms']:.0f} мс ({prediction['samples']} сэмплов):")
+        print(f"  ошибка без компенсации: {prediction['stale_error_mean']:.4f} "
+              f"(p95 {prediction['stale_error_p95']:.4f})")
+        print(f"  ошибка предсказания:    {prediction['predicted_error_mean']:.4f} "
+              f"(p95 {prediction['predicted_error_p95']:.4f})")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
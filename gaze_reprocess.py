@@ -0,0 +1,212 @@
+"""
+Параллельная офлайн-обработка взгляда по записанному видео с веб-камеры
+
+Видео делится на куски, которые обрабатываются в пуле процессов через
+EyeTracker._process. Воркеры возвращают несглаженные значения, а сглаживание,
+калибровка и направления применяются последовательно при склейке — поэтому
+состояние фильтра на границах кусков совпадает с обработкой в реальном времени.
+
+Пример:
+    python gaze_reprocess.py session.mp4 -o gaze.json --workers 8 --calibration report.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import cv2
+
+from eye_tracker import (EyeTracker, DETECTORS, gaze_directions, calibration_to_json,
+                         create_detector)
+from report_storage import load_calibration
+from gaze_filters import FILTERS, DEFAULT_FILTER, GazeFilter, create_filter
+
+
+# Кусков на один процесс: мелкие куски выравнивают нагрузку между процессами
+CHUNKS_PER_WORKER = 4
+
+
+def _video_info(video_path: str) -> Tuple[int, float]:
+    """Количество кадров и FPS видео"""
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise RuntimeError(f"Не удалось открыть видео: {video_path}")
+    try:
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    finally:
+        capture.release()
+    return frame_count, fps
+
+
+def _split_chunks(frame_count: int, chunk_count: int) -> List[Tuple[int, int]]:
+    """Разбить диапазон кадров на непрерывные куски [start, stop)"""
+    chunk_count = max(1, min(chunk_count, frame_count))
+    bounds = [frame_count * i // chunk_count for i in range(chunk_count + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(chunk_count) if bounds[i] < bounds[i + 1]]
+
+
+def _process_chunk(task) -> List[tuple]:
+    """Обработать кусок видео в процессе-воркере
+
+    Возвращает кортежи (кадр, video_ms, raw_x, raw_y, left_eye, right_eye,
+    face_x, face_y, confidence) только для кадров с найденным лицом.
+    """
+    video_path, start, stop, fps, mirror, detector_name = task
+    cv2.setNumThreads(1)  # Параллелизм даёт пул процессов
+
+    tracker = EyeTracker()
+    # Офлайн обрабатываем каждый кадр полностью, без регулятора нагрузки
+    tracker.set_governor(None)
+    # Без фильтра _process отдаёт сырые координаты зрачка
+    tracker.set_filter(None)
+    detector = create_detector(detector_name)
+    if not detector.load():
+        raise RuntimeError(f"Не удалось загрузить детектор: {detector_name}")
+
+    capture = cv2.VideoCapture(video_path)
+    capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    samples = []
+    try:
+        for frame_idx in range(start, stop):
+            ret, frame = capture.read()
+            if not ret:
+                break
+
+            video_ms = capture.get(cv2.CAP_PROP_POS_MSEC)
+            if video_ms <= 0 and frame_idx > 0:
+                video_ms = frame_idx * 1000.0 / fps
+
+            if mirror:
+                frame = cv2.flip(frame, 1)
+            gaze, _ = tracker._process(frame, detector, video_ms / 1000)
+            if gaze is None:
+                continue
+
+            samples.append((frame_idx, int(round(video_ms)), gaze.gaze_x, gaze.gaze_y,
+                            gaze.left_eye_open, gaze.right_eye_open,
+                            gaze.face_x, gaze.face_y, gaze.confidence))
+    finally:
+        capture.release()
+    return samples
+
+
+def merge_chunks(chunks: List[List[tuple]], calibration=None,
+                 start_time: Optional[datetime] = None,
+                 filter_name: Optional[str] = DEFAULT_FILTER) -> List[dict]:
+    """Склеить результаты кусков в поток взгляда
+
+    Сглаживание идёт последовательно по всем кадрам, как в EyeTracker._run_loop,
+    поэтому результат не зависит от того, как видео было разбито на куски.
+    Время для фильтра берётся из video_ms, а не из скорости обработки.
+    """
+    tracker = EyeTracker()
+    tracker.set_calibration(calibration)
+    gaze_filter = create_filter(filter_name)
+
+    records = []
+    for chunk in chunks:
+        for frame_idx, video_ms, raw_x, raw_y, left, right, face_x, face_y, confidence in chunk:
+            smooth_x, smooth_y = raw_x, raw_y
+            if gaze_filter is not None:
+                smooth_x, smooth_y = gaze_filter.filter(raw_x, raw_y, video_ms / 1000)
+            screen_x, screen_y = tracker._apply_calibration(smooth_x, smooth_y)
+            h_dir, v_dir = gaze_directions(screen_x, screen_y)
+
+            record = {}
+            if start_time is not None:
+                ts = start_time + timedelta(milliseconds=video_ms)
+                record['timestamp'] = ts.strftime('%Y-%m-%dT%H:%M:%S.') + f'{ts.microsecond:06d}Z'
+            record.update({
+                'frame': frame_idx,
+                'video_ms': video_ms,
+                'gaze_x': round(screen_x, 3),
+                'gaze_y': round(screen_y, 3),
+                'raw_x': round(smooth_x, 4),
+                'raw_y': round(smooth_y, 4),
+                'pupil_x': round(raw_x, 4),
+                'pupil_y': round(raw_y, 4),
+                'gaze_h': h_dir,
+                'gaze_v': v_dir,
+                'left_eye': left,
+                'right_eye': right,
+                'face_x': round(face_x, 3),
+                'face_y': round(face_y, 3),
+                'confidence': confidence
+            })
+            records.append(record)
+    return records
+
+
+def reprocess_video(video_path: str, workers: Optional[int] = None, calibration=None,
+                    start_time: Optional[datetime] = None, mirror: bool = True,
+                    filter_name: Optional[str] = DEFAULT_FILTER,
+                    detector_name: str = 'cascade') -> dict:
+    """Обработать видео параллельно и вернуть отчёт с потоком взгляда"""
+    workers = workers or os.cpu_count() or 1
+    frame_count, fps = _video_info(video_path)
+    if frame_count <= 0:
+        raise RuntimeError("Не удалось определить количество кадров")
+
+    tasks = [(video_path, start, stop, fps, mirror, detector_name)
+             for start, stop in _split_chunks(frame_count, workers * CHUNKS_PER_WORKER)]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = list(executor.map(_process_chunk, tasks))
+
+    records = merge_chunks(chunks, calibration, start_time, filter_name)
+    return {
+        'created_at': datetime.now().strftime('%Y-%m-%dT%H:%M:%S.%f'),
+        'source_video': os.path.abspath(video_path),
+        'fps': fps,
+        'filter': filter_name or GazeFilter.name,
+        'detector': detector_name,
+        'calibration': calibration_to_json(calibration),
+        'total_frames': frame_count,
+        'total_records': len(records),
+        'records': records
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Офлайн-обработка взгляда по видео с веб-камеры")
+    parser.add_argument('video', help="Путь к видео")
+    parser.add_argument('-o', '--output', help="Файл результата (по умолчанию <видео>_gaze.json)")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="Количество процессов")
+    parser.add_argument('--calibration', help="JSON с калибровкой или отчёт, где она сохранена")
+    parser.add_argument('--start', help="Время начала видео (ISO 8601) для абсолютных меток")
+    parser.add_argument('--no-mirror', action='store_true',
+                        help="Не отражать кадры (видео уже зеркальное, как превью камеры)")
+    parser.add_argument('--filter', default=DEFAULT_FILTER, choices=[GazeFilter.name] + list(FILTERS),
+                        help="Фильтр сглаживания взгляда")
+    parser.add_argument('--detector', default='cascade', choices=list(DETECTORS),
+                        help="Детектор лица и глаз")
+    args = parser.parse_args(argv)
+
+    calibration = load_calibration(args.calibration) if args.calibration else None
+    start_time = datetime.fromisoformat(args.start.rstrip('Z')) if args.start else None
+    output = args.output or os.path.splitext(args.video)[0] + "_gaze.json"
+
+    started = time.perf_counter()
+    result = reprocess_video(args.video, args.workers, calibration, start_time,
+                             mirror=not args.no_mirror, filter_name=args.filter,
+                             detector_name=args.detector)
+    elapsed = time.perf_counter() - started
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False)
+
+    duration = result['total_frames'] / result['fps'] if result['fps'] else 0
+    print(f"Кадров: {result['total_frames']}, с лицом: {result['total_records']}")
+    print(f"Обработано за {elapsed:.1f} с ({duration / elapsed:.1f}x реального времени)")
+    print(f"Сохранено: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
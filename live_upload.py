@@ -0,0 +1,614 @@
+"""
+Потоковая отправка записей по WebSocket во время записи
+
+Одно соединение на сессию; записи копятся и раз в BATCH_INTERVAL секунд уходят
+пакетом с порядковым номером. Сервер подтверждает каждый принятый пакет, а
+неподтверждённые пакеты хранятся у клиента. После обрыва клиент переподключается,
+узнаёт номер последнего принятого пакета и продолжает с него.
+
+Очередь в памяти ограничена (MAX_BACKLOG записей): если сервер долго недоступен
+или не поддерживает протокол, потоковая отправка прекращается и очередь
+сбрасывается — записи есть в журнале, и отчёт отправит очередь выгрузки.
+
+Протокол (JSON-сообщения):
+    клиент → {"type": "hello", "session": id, "meta": {...}, "encodings": ["columnar", "json"]}
+    сервер → {"type": "welcome", "session": id, "last_ack": n, "encoding": "columnar"}
+             (last_ack 0 — новая сессия; без encoding — JSON)
+    клиент → {"type": "batch", "seq": n, "records": [...]}
+             или двоичное сообщение b"B" + seq (4 байта) + пакет wire_codec
+    сервер → {"type": "ack", "seq": n}
+    клиент → {"type": "end", "seq": n, "total_records": N}
+    сервер → {"type": "ack", "seq": n, "end": true}
+
+Сервер принимает пакеты строго по порядку: повтор уже принятого пакета
+подтверждается ещё раз, пакет после пропуска игнорируется.
+
+Тот же протокол используется для отправки готового отчёта (upload_records):
+пакеты фиксированного размера, не больше SEND_WINDOW неподтверждённых сразу.
+Отчёт отправляется отдельной сессией; meta["replaces"] — id потоковой сессии той же
+записи. Получив end такой сессии, сервер удаляет частично принятую потоковую
+сессию: отчёт содержит все её записи, и на сервере они остаются один раз.
+(Продолжать потоковую сессию с последнего подтверждения нельзя: её пакеты
+переменного размера, и номера пакетов не соответствуют пакетам отчёта.)
+
+Для проверки без настоящего сервера есть локальный сервер-заглушка.
+
+Пример:
+    python live_upload.py serve --port 8765
+    python live_upload.py demo --drop-every 3
+"""
+import sys
+import json
+import time
+import base64
+import socket
+import struct
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import websocket
+    _RECV_TIMEOUTS = (socket.timeout, TimeoutError, websocket.WebSocketTimeoutException)
+    _CONNECTION_ERRORS = (OSError, websocket.WebSocketException)
+except ImportError:
+    websocket = None
+    _RECV_TIMEOUTS = (socket.timeout, TimeoutError)
+    _CONNECTION_ERRORS = (OSError,)
+
+from wire_codec import COLUMNAR, ENCODINGS, JSON, choose_encoding, decode_records, encode_records
+
+
+LIVE_UPLOAD_URL = "ws://10.128.7.6:8099/influxdbpoints/ws/live/{video_id}"
+BATCH_INTERVAL = 2.0  # Как часто отправляется пакет записей, сек
+POLL_INTERVAL = 0.1  # Как долго ждать подтверждений за один проход
+CONNECT_TIMEOUT = 5.0
+RECONNECT_DELAYS = (0.5, 1.0, 2.0, 5.0)  # Паузы между попытками переподключения
+FINISH_TIMEOUT = 10.0  # Сколько ждать подтверждения всех пакетов после остановки
+UPLOAD_BATCH_SIZE = 500  # Записей в пакете при отправке готового отчёта
+SEND_WINDOW = 8  # Неподтверждённых пакетов в пути
+ACK_TIMEOUT = 30.0
+MAX_BACKLOG = 6000  # Неподтверждённых записей в памяти (10 минут при 10 Гц)
+
+
+class HandshakeFailed(ConnectionError):
+    """Не удалось начать сессию: нет соединения, отказ сервера (например, 404) или нет ответа"""
+
+
+class ProtocolNotSupported(HandshakeFailed):
+    """Сервер не поддерживает пакетный протокол (нет ответа welcome)"""
+
+
+@dataclass
+class UploadStats:
+    """Состояние отправки"""
+    batches: int = 0
+    acked_batches: int = 0
+    records: int = 0
+    acked_records: int = 0
+    resent_batches: int = 0
+    reconnects: int = 0
+    bytes_sent: int = 0
+    encoding: str = JSON
+    connected: bool = False
+    completed: bool = False
+    abandoned: bool = False  # Отправка прекращена, очередь сброшена
+    error: str = ""
+
+
+class LiveUploader:
+    """Отправка записей сессии пакетами по одному WebSocket
+
+    append() можно вызывать из любого потока (обычно — из RecordSampler);
+    соединение, отправка и подтверждения обрабатываются в потоке отправителя.
+    connect(url) — фабрика соединения (по умолчанию websocket.create_connection).
+    Когда неподтверждённых записей больше max_backlog или сервер не поддерживает
+    протокол, отправка прекращается (stats.abandoned), а записи больше не копятся.
+    """
+
+    def __init__(self, url: str, session_id: str, meta: Optional[dict] = None,
+                 interval: float = BATCH_INTERVAL, connect: Optional[Callable] = None,
+                 encodings=ENCODINGS, max_backlog: int = MAX_BACKLOG):
+        self.url = url
+        self.session_id = session_id
+        self.meta = meta or {}
+        self.interval = interval
+        self.encodings = list(encodings)
+        self.max_backlog = max_backlog
+        self.stats = UploadStats()
+        self._connect = connect or (lambda url: websocket.create_connection(url, timeout=CONNECT_TIMEOUT))
+        self._lock = threading.Lock()
+        self._pending: List[dict] = []
+        self._batches: Dict[int, List[dict]] = OrderedDict()  # неподтверждённые пакеты
+        self._backlog = 0  # Записей в _pending и _batches
+        self._abandoned = threading.Event()
+        self._seq = 0
+        self._last_sent = 0
+        self._last_ack = 0
+        self._end_sent = False
+        self._end_acked = False
+        self._handshakes = 0
+        self._ws = None
+        self._stopping = threading.Event()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def append(self, record: dict):
+        with self._lock:
+            if self._abandoned.is_set():
+                return
+            if self._backlog >= self.max_backlog:
+                self._abandon(f"Сервер не подтверждает записи: в очереди больше {self.max_backlog}")
+                return
+            self._pending.append(record)
+            self._backlog += 1
+
+    def _abandon(self, reason: str):
+        """Прекратить отправку и сбросить очередь (вызывается под self._lock)"""
+        self._abandoned.set()
+        self._pending = []
+        self._backlog = 0
+        self.stats.error = reason
+
+    def start(self):
+        self._thread.start()
+
+    def finish(self):
+        """Отправить оставшиеся записи и завершить сессию (не блокирует)"""
+        self._stopping.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Дождаться окончания отправки; True — сервер подтвердил все записи"""
+        self._done.wait(timeout)
+        return self.stats.completed
+
+    def _cut_batch(self):
+        with self._lock:
+            records, self._pending = self._pending, []
+        if records:
+            self._seq += 1
+            self._batches[self._seq] = records
+            self.stats.batches += 1
+            self.stats.records += len(records)
+
+    def _disconnect(self):
+        if self._ws is not None:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+        self._ws = None
+        self.stats.connected = False
+
+    def _handshake(self):
+        self._ws = self._connect(self.url)
+        last_ack, self.stats.encoding = _hello(self._ws, self.session_id, self.meta, self.encodings)
+        self._acknowledge(last_ack)
+        # Всё после последнего принятого пакета отправляется заново
+        if self._last_sent > self._last_ack:
+            self.stats.resent_batches += self._last_sent - self._last_ack
+        self._last_sent = self._last_ack
+        self._end_sent = False
+        self.stats.connected = True
+        if self._handshakes:
+            self.stats.reconnects += 1
+        self._handshakes += 1
+
+    def _acknowledge(self, seq: int):
+        while self._batches and next(iter(self._batches)) <= seq:
+            _, records = self._batches.popitem(last=False)
+            self.stats.acked_batches += 1
+            self.stats.acked_records += len(records)
+            with self._lock:
+                self._backlog = max(self._backlog - len(records), 0)
+        self._last_ack = max(self._last_ack, seq)
+
+    def _send_batches(self):
+        for seq, records in self._batches.items():
+            if seq > self._last_sent:
+                self.stats.bytes_sent += _send_batch(self._ws, seq, records, self.stats.encoding)
+                self._last_sent = seq
+        if (self._stopping.is_set() and not self._end_sent and not self._pending
+                and self._last_sent == self._seq):
+            self._ws.send(json.dumps({'type': 'end', 'seq': self._seq,
+                                      'total_records': self.stats.records}))
+            self._end_sent = True
+
+    def _receive_acks(self):
+        self._ws.settimeout(POLL_INTERVAL)
+        while True:
+            try:
+                message = self._ws.recv()
+            except _RECV_TIMEOUTS:
+                return
+            if websocket is not None and isinstance(message, bytes):
+                message = message.decode('utf-8')
+            if not message:
+                raise ConnectionError("Сервер закрыл соединение")
+            reply = json.loads(message)
+            if reply.get('type') == 'ack':
+                self._acknowledge(int(reply.get('seq', 0)))
+                if reply.get('end') and not self._batches:
+                    self._end_acked = True
+                    return
+
+    def _run(self):
+        next_batch = time.monotonic() + self.interval
+        attempt = 0
+        retry_at = 0.0
+        deadline = None
+        while True:
+            if self._abandoned.is_set():
+                break
+            if self._stopping.is_set():
+                if deadline is None:
+                    deadline = time.monotonic() + FINISH_TIMEOUT
+                    self._cut_batch()
+            elif time.monotonic() >= next_batch:
+                self._cut_batch()
+                next_batch += self.interval
+
+            if self._end_acked or (deadline is not None and time.monotonic() > deadline):
+                break
+
+            if self._ws is None:
+                if time.monotonic() < retry_at:
+                    # Не _stopping: после finish() оно установлено, и ожидание превратилось бы в холостой цикл
+                    self._abandoned.wait(min(POLL_INTERVAL, retry_at - time.monotonic()))
+                    continue
+                try:
+                    self._handshake()
+                    attempt = 0
+                except ProtocolNotSupported as e:
+                    # Переподключение не поможет: сервер не знает пакетного протокола
+                    self._disconnect()
+                    with self._lock:
+                        self._abandon(str(e))
+                    break
+                except Exception as e:
+                    self._disconnect()
+                    self.stats.error = str(e)
+                    retry_at = time.monotonic() + RECONNECT_DELAYS[min(attempt, len(RECONNECT_DELAYS) - 1)]
+                    attempt += 1
+                    continue
+
+            try:
+                self._send_batches()
+                self._receive_acks()
+            except Exception as e:
+                self.stats.error = str(e)
+                self._disconnect()
+
+        if self._abandoned.is_set():
+            self._batches.clear()
+            self.stats.abandoned = True
+        self.stats.completed = self._end_acked
+        if self._end_acked:
+            self.stats.error = ""
+        self._disconnect()
+        self._done.set()
+
+
+def _hello(ws, session_id: str, meta: dict, encodings=ENCODINGS) -> Tuple[int, str]:
+    """Начать или продолжить сессию
+
+    Возвращает номер последнего принятого сервером пакета и выбранную сервером
+    кодировку (JSON, если сервер её не назвал или назвал незнакомую).
+    """
+    ws.send(json.dumps({'type': 'hello', 'session': session_id, 'meta': meta, 'encodings': list(encodings)},
+                       ensure_ascii=False))
+    try:
+        reply = json.loads(ws.recv())
+    except ValueError:
+        raise ProtocolNotSupported("Сервер ответил не JSON")
+    if reply.get('type') != 'welcome':
+        raise ProtocolNotSupported(f"Неожиданный ответ сервера: {reply}")
+    encoding = reply.get('encoding', JSON)
+    return int(reply.get('last_ack', 0)), encoding if encoding in encodings else JSON
+
+
+def _send_batch(ws, seq: int, records: List[dict], encoding: str) -> int:
+    """Отправить пакет в согласованной кодировке; размер сообщения в байтах"""
+    if encoding == COLUMNAR:
+        payload = b'B' + struct.pack('>I', seq) + encode_records(records)
+        ws.send_binary(payload)
+        return len(payload)
+    payload = json.dumps({'type': 'batch', 'seq': seq, 'records': records}, ensure_ascii=False)
+    ws.send(payload)
+    return len(payload.encode('utf-8'))
+
+
+def upload_records(url: str, session_id: str, records: List[dict], meta: Optional[dict] = None,
+                   batch_size: int = UPLOAD_BATCH_SIZE,
+                   progress: Optional[Callable[[int, int], None]] = None,
+                   connect: Optional[Callable] = None, encodings=ENCODINGS) -> int:
+    """Отправить готовые записи пакетами; продолжает с последнего принятого пакета
+
+    progress(подтверждено записей, всего) вызывается после каждого подтверждения.
+    Возвращает число пакетов, отправленных в этот раз. Ошибки до начала сессии
+    (соединение, приветствие) пробрасываются как HandshakeFailed, остальные ошибки
+    соединения — как есть; повторная попытка продолжит с места обрыва.
+    """
+    connect = connect or (lambda url: websocket.create_connection(url, timeout=CONNECT_TIMEOUT))
+    total = len(records)
+    batches = (total + batch_size - 1) // batch_size
+    try:
+        ws = connect(url)
+    except _CONNECTION_ERRORS as e:
+        raise HandshakeFailed(f"Нет соединения: {e}") from e
+    try:
+        try:
+            last_ack, encoding = _hello(ws, session_id,
+                                        dict(meta or {}, total_records=total, batch_size=batch_size), encodings)
+        except _CONNECTION_ERRORS as e:
+            raise HandshakeFailed(f"Нет ответа на приветствие: {e}") from e
+        ws.settimeout(ACK_TIMEOUT)
+        if progress is not None:
+            progress(min(last_ack * batch_size, total), total)
+        seq = last_ack
+        sent = 0
+        while last_ack < batches:
+            while seq < batches and seq - last_ack < SEND_WINDOW:
+                seq += 1
+                _send_batch(ws, seq, records[(seq - 1) * batch_size:seq * batch_size], encoding)
+                sent += 1
+            reply = json.loads(ws.recv())
+            if reply.get('type') == 'ack':
+                last_ack = max(last_ack, int(reply.get('seq', 0)))
+                if progress is not None:
+                    progress(min(last_ack * batch_size, total), total)
+        ws.send(json.dumps({'type': 'end', 'seq': batches, 'total_records': total}))
+        while True:
+            reply = json.loads(ws.recv())
+            if reply.get('type') == 'ack' and reply.get('end'):
+                return sent
+    finally:
+        try:
+            ws.close()
+        except Exception:
+            pass
+
+
+# ---------------------------------------------------------------------------
+# Локальный сервер-заглушка (минимальный WebSocket на стандартной библиотеке)
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def _recv_exact(conn: socket.socket, size: int) -> bytes:
+    data = b''
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Соединение закрыто")
+        data += chunk
+    return data
+
+
+def _ws_accept(conn: socket.socket) -> str:
+    """Рукопожатие WebSocket; возвращает путь запроса"""
+    request = b''
+    while b'\r\n\r\n' not in request:
+        chunk = conn.recv(4096)
+        if not chunk:
+            raise ConnectionError("Соединение закрыто")
+        request += chunk
+    lines = request.decode('latin-1').split('\r\n')
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    accept = base64.b64encode(hashlib.sha1((headers['sec-websocket-key'] + _WS_GUID).encode()).digest())
+    conn.sendall(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                 b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+    return lines[0].split(' ')[1]
+
+
+def _ws_recv(conn: socket.socket):
+    """Сообщение клиента: str (текстовое) или bytes (двоичное); None — клиент закрыл соединение"""
+    message = b''
+    binary = False
+    while True:
+        first, second = _recv_exact(conn, 2)
+        opcode = first & 0x0F
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack('>H', _recv_exact(conn, 2))[0]
+        elif length == 127:
+            length = struct.unpack('>Q', _recv_exact(conn, 8))[0]
+        mask = _recv_exact(conn, 4) if second & 0x80 else b'\x00' * 4
+        payload = _recv_exact(conn, length)
+        if length:
+            key = (mask * (length // 4 + 1))[:length]
+            payload = (int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')).to_bytes(length, 'big')
+        if opcode == 0x8:
+            return None
+        if opcode == 0x9:
+            _ws_send(conn, payload, opcode=0xA)
+            continue
+        if opcode in (0x0, 0x1, 0x2):
+            if opcode == 0x2:
+                binary = True
+            message += payload
+            if first & 0x80:
+                return message if binary else message.decode('utf-8')
+
+
+def _ws_send(conn: socket.socket, data, opcode: int = 0x1):
+    payload = data.encode('utf-8') if isinstance(data, str) else data
+    header = bytes([0x80 | opcode])
+    if len(payload) < 126:
+        header += bytes([len(payload)])
+    elif len(payload) < 65536:
+        header += bytes([126]) + struct.pack('>H', len(payload))
+    else:
+        header += bytes([127]) + struct.pack('>Q', len(payload))
+    conn.sendall(header + payload)
+
+
+class LiveUploadServer:
+    """Сервер-заглушка протокола: принимает пакеты по порядку и хранит записи в памяти
+
+    drop_every — обрывать соединение на каждом N-м пакете, не отправив
+    подтверждение (проверка переподключения и продолжения с последнего принятого).
+    encodings — кодировки, которые сервер готов принимать.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, drop_every: int = 0, encodings=ENCODINGS):
+        self.drop_every = drop_every
+        self.encodings = list(encodings)
+        self.bytes_received = 0
+        self.sessions: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._received = 0
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((host, port))
+        self._socket.listen()
+        self.port = self._socket.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"ws://127.0.0.1:{self.port}/live"
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._socket.close()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._socket.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn: socket.socket):
+        session = None
+        try:
+            _ws_accept(conn)
+            while True:
+                data = _ws_recv(conn)
+                if data is None:
+                    return
+                self.bytes_received += len(data)
+                if isinstance(data, bytes):
+                    if data[:1] != b'B':
+                        continue
+                    message = {'type': 'batch', 'seq': struct.unpack('>I', data[1:5])[0],
+                               'records': decode_records(data[5:])}
+                else:
+                    message = json.loads(data)
+                kind = message.get('type')
+                if kind == 'hello':
+                    with self._lock:
+                        session = self.sessions.setdefault(message['session'], {
+                            'meta': message.get('meta', {}), 'last_ack': 0, 'records': [], 'ended': False})
+                    offered = [name for name in message.get('encodings', []) if name in self.encodings]
+                    _ws_send(conn, json.dumps({'type': 'welcome', 'session': message['session'],
+                                               'last_ack': session['last_ack'],
+                                               'encoding': choose_encoding(offered)}))
+                elif kind == 'batch' and session is not None:
+                    seq = message['seq']
+                    if seq == session['last_ack'] + 1:
+                        session['records'].extend(message['records'])
+                        session['last_ack'] = seq
+                    elif seq > session['last_ack']:
+                        continue  # пропуск — клиент повторит после переподключения
+                    self._received += 1
+                    if self.drop_every and self._received % self.drop_every == 0:
+                        return  # пакет принят, но подтверждение потеряно
+                    _ws_send(conn, json.dumps({'type': 'ack', 'seq': session['last_ack']}))
+                elif kind == 'end' and session is not None:
+                    if message['seq'] == session['last_ack']:
+                        session['ended'] = True
+                        replaced = session['meta'].get('replaces')
+                        if replaced:
+                            with self._lock:
+                                self.sessions.pop(replaced, None)
+                        _ws_send(conn, json.dumps({'type': 'ack', 'seq': session['last_ack'], 'end': True}))
+        except (ConnectionError, OSError, ValueError, struct.error):
+            pass
+        finally:
+            conn.close()
+
+
+def run_demo(records: int = 200, rate: float = 50.0, interval: float = 0.5, drop_every: int = 3,
+             encodings=ENCODINGS) -> dict:
+    """Отправить синтетическую сессию на локальный сервер с обрывами соединения"""
+    server = LiveUploadServer(drop_every=drop_every, encodings=encodings)
+    server.start()
+    uploader = LiveUploader(server.url, "demo", {'rate': rate}, interval=interval)
+    uploader.start()
+    for i in range(records):
+        uploader.append({'elapsed_sec': round((i + 1) / rate, 2), 'video_ms': i * 20,
+                         'attention': float(i % 100), 'gaze_x': round(0.5 + 0.001 * (i % 7), 3),
+                         'raw_x': None if i % 10 == 0 else 0.4321, 'gaze_h': 'center' if i % 3 else 'left',
+                         'left_eye': i % 5 != 0, 'artifact': False})
+        time.sleep(1.0 / rate)
+    uploader.finish()
+    completed = uploader.wait(FINISH_TIMEOUT + 5)
+    session = server.sessions.get("demo", {})
+    received = session.get('records', [])
+    server.stop()
+    return {
+        'completed': completed,
+        'sent': records,
+        'received': len(received),
+        'in_order': [r['elapsed_sec'] for r in received] == [round((i + 1) / rate, 2) for i in range(records)],
+        'bytes_per_record': round(uploader.stats.bytes_sent / max(uploader.stats.acked_records, 1), 1),
+        **asdict(uploader.stats),
+    }
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Потоковая отправка записей по WebSocket")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help="Локальный сервер-заглушка")
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--drop-every', type=int, default=0,
+                       help="Обрывать соединение после каждого N-го пакета")
+
+    demo = commands.add_parser('demo', help="Отправить синтетическую сессию на локальный сервер")
+    demo.add_argument('--records', type=int, default=200)
+    demo.add_argument('--drop-every', type=int, default=3)
+    demo.add_argument('--json', action='store_true', help="Сервер принимает только JSON")
+
+    args = parser.parse_args(argv)
+
+    if websocket is None and args.command == 'demo':
+        print("Библиотека websocket-client не установлена. Установите: pip install websocket-client",
+              file=sys.stderr)
+        return 1
+
+    if args.command == 'serve':
+        server = LiveUploadServer(host='0.0.0.0', port=args.port, drop_every=args.drop_every)
+        server.start()
+        print(f"Сервер-заглушка: ws://127.0.0.1:{server.port}/live (Ctrl+C — выход)")
+        try:
+            while True:
+                time.sleep(5)
+                for session_id, session in list(server.sessions.items()):
+                    print(f"{session_id}: пакетов {session['last_ack']}, записей {len(session['records'])}"
+                          f"{', завершена' if session['ended'] else ''}")
+        except KeyboardInterrupt:
+            server.stop()
+        return 0
+
+    result = run_demo(args.records, drop_every=args.drop_every,
+                      encodings=(JSON,) if args.json else ENCODINGS)
+    for key, value in result.items():
+        print(f"{key:<18}{value}")
+    return 0 if result['completed'] and result['in_order'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Графики длинных сессий с уровнями детализации
+
+Для ряда один раз строится пирамида min/max: каждый следующий уровень объединяет
+FACTOR корзин предыдущего и хранит минимум и максимум корзины. На график
+передаётся уровень, у которого на видимый диапазон приходится не больше корзин,
+чем пикселей по ширине, — пики не теряются, а число точек не зависит от длины
+сессии. Уровни хранятся готовыми к отрисовке, видимая часть — срез без копирования.
+
+Пример:
+    python lod_plot.py --points 5000000
+"""
+import sys
+import time
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pyqtgraph as pg
+
+
+FACTOR = 4  # Корзин предыдущего уровня в одной корзине следующего
+MIN_BUCKETS = 256  # Меньше корзин — уровень не строится
+
+
+class MinMaxPyramid:
+    """Пирамида min/max ряда y(x); x должен возрастать"""
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, factor: int = FACTOR):
+        self.x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        # Уровень: (x, y для отрисовки, размер корзины в исходных точках)
+        self.levels: List[Tuple[np.ndarray, np.ndarray, int]] = [(self.x, y, 1)]
+        starts, low, high, size = self.x, y, y, 1
+        while len(low) >= MIN_BUCKETS * factor:
+            index = np.arange(0, len(low), factor)
+            starts = starts[index]
+            low = np.minimum.reduceat(low, index)
+            high = np.maximum.reduceat(high, index)
+            size *= factor
+            # Минимум и максимум корзины — две точки с одним x (вертикальный штрих)
+            level_y = np.empty(2 * len(low))
+            level_y[0::2] = low
+            level_y[1::2] = high
+            self.levels.append((np.repeat(starts, 2), level_y, size))
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def select(self, x0: float, x1: float, pixels: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Точки для диапазона [x0, x1] на pixels пикселей: срезы подходящего уровня"""
+        first, last = np.searchsorted(self.x, (x0, x1))
+        count = last - first
+        level = 0
+        while level + 1 < len(self.levels) and count / self.levels[level][2] > max(pixels, 1):
+            level += 1
+        level_x, level_y, size = self.levels[level]
+        buckets = (len(self.x) + size - 1) // size
+        # С запасом в корзину по краям, чтобы линия уходила за край графика
+        start = max(first // size - 1, 0)
+        stop = min((last + size - 1) // size + 1, buckets)
+        points = 1 if level == 0 else 2
+        return level_x[start * points:stop * points], level_y[start * points:stop * points]
+
+
+class LodPlot:
+    """Кривые графика pyqtgraph, перерисовываемые по видимому диапазону
+
+    Элементы графика удаляет plot_widget.clear(); clear() здесь забывает кривые.
+    """
+
+    def __init__(self, plot_widget: pg.PlotWidget):
+        self.plot_widget = plot_widget
+        self.view_box = plot_widget.getViewBox()
+        self.curves: List[Tuple[pg.PlotDataItem, MinMaxPyramid]] = []
+        self.view_box.sigXRangeChanged.connect(self.refresh)
+        self.view_box.sigResized.connect(self.refresh)
+
+    def plot(self, pyramid: MinMaxPyramid, **kwargs) -> pg.PlotDataItem:
+        item = self.plot_widget.plot(**kwargs)
+        self.curves.append((item, pyramid))
+        self._update(item, pyramid)
+        return item
+
+    def clear(self):
+        self.curves = []
+
+    def _update(self, item: pg.PlotDataItem, pyramid: MinMaxPyramid):
+        if len(pyramid) == 0:
+            return
+        if self.view_box.autoRangeEnabled()[0]:
+            # Пока ось X подстраивается под данные, виден весь ряд
+            x0, x1 = float(pyramid.x[0]), float(pyramid.x[-1])
+        else:
+            (x0, x1), _ = self.view_box.viewRange()
+        x, y = pyramid.select(x0, x1, int(self.view_box.width()))
+        item.setData(x, y, skipFiniteCheck=True)
+
+    def refresh(self, *_):
+        for item, pyramid in self.curves:
+            self._update(item, pyramid)
+
+
+def build_pyramids(x: np.ndarray, columns: Dict[str, np.ndarray]) -> Dict[str, MinMaxPyramid]:
+    """Пирамиды рядов сессии с общей осью x"""
+    return {name: MinMaxPyramid(x, y) for name, y in columns.items()}
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Время построения пирамиды и выбора точек")
+    parser.add_argument('--points', type=int, default=5_000_000, help="Точек в синтетическом ряду")
+    parser.add_argument('--pixels', type=int, default=1500, help="Ширина графика, пикселей")
+    args = parser.parse_args(argv)
+
+    x = np.arange(args.points) / 10.0
+    y = 50 + 30 * np.sin(x / 60) + np.random.default_rng(0).normal(0, 5, args.points)
+    start = time.perf_counter()
+    pyramid = MinMaxPyramid(x, y)
+    built = time.perf_counter() - start
+    print(f"Точек: {args.points}, уровней: {len(pyramid.levels)}, построение: {built * 1000:.0f} мс")
+
+    for fraction in (1.0, 0.1, 0.001):
+        x1 = x[-1] * fraction
+        start = time.perf_counter()
+        px, py = pyramid.select(0.0, x1, args.pixels)
+        elapsed = time.perf_counter() - start
+        print(f"Видно {fraction * 100:g}%: {len(px)} точек, выбор {elapsed * 1e6:.0f} мкс")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
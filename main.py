@@ -4,7 +4,6 @@ import json
 import urllib.request
 import urllib.error
 from datetime import datetime, timezone
-from collections import deque
 import threading
 try:
     import websocket
@@ -15,14 +14,16 @@ from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QTabWidget, QPushButton, QLabel, QListWidget, QListWidgetItem, QProgressBar,
     QLineEdit, QGroupBox, QFileDialog, QFrame, QSlider, QSplitter,
-    QDialog, QScrollArea, QMessageBox, QSizePolicy
+    QDialog, QScrollArea, QMessageBox, QSizePolicy, QTableWidget, QTableWidgetItem,
+    QHeaderView, QAbstractItemView, QCheckBox
 )
 from PyQt6.QtCore import Qt, QTimer, QUrl, pyqtSignal
 from PyQt6.QtGui import QPixmap, QImage, QPainter, QColor, QPen, QBrush, QLinearGradient
-from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
+from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput, QMediaMetaData
 
 from PyQt6.QtMultimediaWidgets import QVideoWidget
 
+import numpy as np
 import pyqtgraph as pg
 
 from brain_bit_controller import (
@@ -31,7 +32,17 @@ from brain_bit_controller import (
 )
 from styles import STYLESHEET
 from widgets import MetricCard, ResistCard
-from eye_tracker import eye_tracker, GazeData, CalibrationDialog
+from eye_tracker import eye_tracker, GazeData, CalibrationDialog, calibration_to_json
+from gaze_filters import GazePredictor
+from report_storage import (ReportJournal, JOURNAL_SUFFIX, DEFAULT_COMPRESSION, TimeIndex,
+                            recover_journals, load_session, journal_report_path)
+from recorder import EventRecorder, RecordSampler, DEFAULT_RATE, format_timestamp
+from live_upload import LiveUploader, LIVE_UPLOAD_URL, FINISH_TIMEOUT
+from upload_outbox import UploadOutbox
+from ring_buffer import RingBuffer
+from lod_plot import LodPlot, build_pyramids
+from session_catalog import SessionCatalog, CATALOG_NAME, find_attention_peaks
+from record_store import RecordStore, RecordWriter, STORE_NAME
 
 # API конфигурация
 API_BASE_URL = "http://10.128.7.187:8099"
@@ -40,6 +51,16 @@ API_BASE_URL = "http://10.128.7.187:8099"
 VIDEOS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "videos")
 VIDEOS_METADATA_FILE = os.path.join(VIDEOS_DIR, "video_metadata.json")
 
+# Ряды графиков вкладки записи (поля записи семплера)
+LIVE_CHANNELS = ('attention', 'relaxation', 'alpha', 'beta', 'theta', 'gaze_x', 'gaze_y')
+# Столбцы списка сессий на вкладке «Результаты»: поле каталога, заголовок
+SESSION_TABLE_COLUMNS = (
+    ('created_at', "Дата"), ('name', "Файл"), ('video_id', "Видео"), ('participant', "Участник"),
+    ('device', "Устройство"), ('duration_sec', "Длительность"), ('record_count', "Записей"),
+    ('mean_attention', "Внимание"), ('peak_count', "Пики"), ('gaze_coverage', "Взгляд"),
+)
+LIVE_WINDOW_SEC = 50  # Окно графиков записи; 600 — 10 минут (6000 точек при 10 Гц)
+
 def ensure_videos_dir():
     """Создать папку для видео, если её нет"""
     if not os.path.exists(VIDEOS_DIR):
@@ -1056,7 +1077,8 @@ class ResultsFullscreenDialog(QDialog):
     """Полноэкранный просмотр результатов с картой взгляда"""
     position_changed = pyqtSignal(int)
     
-    def __init__(self, media_player: QMediaPlayer, data, times, gaze_x, gaze_y, parent=None):
+    def __init__(self, media_player: QMediaPlayer, data, times, gaze_x, gaze_y, parent=None, pyramids=None,
+                 video_index=None):
         super().__init__(parent)
         self.setWindowTitle("Результаты - Полный экран")
         self.setWindowFlags(Qt.WindowType.Window | Qt.WindowType.FramelessWindowHint)
@@ -1067,17 +1089,13 @@ class ResultsFullscreenDialog(QDialog):
         self.gaze_x = gaze_x
         self.gaze_y = gaze_y
         
-        # Извлекаем данные внимания и расслабленности
-        self.attention = []
-        self.relaxation = []
-        if data and times:
-            for i, record in enumerate(data):
-                try:
-                    if i < len(times):
-                        self.attention.append(float(record.get('attention', 0)))
-                        self.relaxation.append(float(record.get('relaxation', 0)))
-                except:
-                    continue
+        # Данные внимания и расслабленности — столбцы сессии
+        self.attention = data.column('attention') if data is not None else np.empty(0)
+        self.relaxation = data.column('relaxation') if data is not None else np.empty(0)
+        self.video_ms = data.column('video_ms') if data is not None else np.empty(0)
+        if not pyramids:
+            pyramids = build_pyramids(self.times, {'attention': self.attention, 'relaxation': self.relaxation})
+        self.video_index = video_index if video_index is not None else TimeIndex(self.video_ms)
         
         # Основной layout
         main_layout = QVBoxLayout(self)
@@ -1116,9 +1134,10 @@ class ResultsFullscreenDialog(QDialog):
         self.mental_plot.addItem(self.mental_vline)
         
         # Построение графиков
-        if self.times and self.attention and self.relaxation:
-            self.mental_plot.plot(self.times, self.attention, pen=pg.mkPen('#58a6ff', width=2, alpha=0.9), name='Внимание')
-            self.mental_plot.plot(self.times, self.relaxation, pen=pg.mkPen('#a371f7', width=2, alpha=0.9), name='Расслабление')
+        self.mental_lod = LodPlot(self.mental_plot)
+        if len(self.times) > 0:
+            self.mental_lod.plot(pyramids['attention'], pen=pg.mkPen('#58a6ff', width=2, alpha=0.9), name='Внимание')
+            self.mental_lod.plot(pyramids['relaxation'], pen=pg.mkPen('#a371f7', width=2, alpha=0.9), name='Расслабление')
         
         # Легенда
         legend = self.mental_plot.addLegend(offset=(10, 10))
@@ -1255,13 +1274,13 @@ class ResultsFullscreenDialog(QDialog):
         self.position_changed.emit(pos)
         
         # Обновить позицию вертикальной линии на графике
-        if self.times and len(self.times) > 0:
+        if len(self.times) > 0:
             pos_sec = pos / 1000.0  # Конвертируем миллисекунды в секунды
             # Найти ближайшую позицию во времени
             if pos_sec <= self.times[-1]:
                 self.mental_vline.setValue(pos_sec)
             else:
-                self.mental_vline.setValue(self.times[-1] if self.times else 0)
+                self.mental_vline.setValue(self.times[-1])
     
     def _on_duration(self, duration):
         self.slider.setRange(0, duration)
@@ -1278,29 +1297,25 @@ class ResultsFullscreenDialog(QDialog):
     
     def _update_gaze_position(self):
         """Обновить текущую позицию взгляда"""
-        if not self.data or not self.times:
+        if self.data is None or len(self.times) == 0:
             return
         
         video_pos_ms = self.media_player.position()
         
-        # Найти ближайшую запись
-        closest_idx = 0
-        min_diff = float('inf')
-        for i, record in enumerate(self.data):
-            diff = abs(record.get('video_ms', 0) - video_pos_ms)
-            if diff < min_diff:
-                min_diff = diff
-                closest_idx = i
+        # Между двумя записями со взглядом — интерполяция, иначе ближайшая запись
+        before, after, _ = self.video_index.bracket(video_pos_ms)
+        if self.gaze_x[before] and self.gaze_y[before] and self.gaze_x[after] and self.gaze_y[after]:
+            self.gaze_overlay.set_current_position(self.video_index.interpolate(video_pos_ms, self.gaze_x),
+                                                   self.video_index.interpolate(video_pos_ms, self.gaze_y))
+            return
+        closest_idx = self.video_index.nearest(video_pos_ms)
+        gaze_x = self.gaze_x[closest_idx]
+        gaze_y = self.gaze_y[closest_idx]
         
-        if closest_idx < len(self.data):
-            record = self.data[closest_idx]
-            gaze_x = record.get('gaze_x', 0)
-            gaze_y = record.get('gaze_y', 0)
-            
-            if gaze_x and gaze_y:
-                self.gaze_overlay.set_current_position(gaze_x, gaze_y)
-            else:
-                self.gaze_overlay.clear_current_position()
+        if gaze_x and gaze_y:
+            self.gaze_overlay.set_current_position(gaze_x, gaze_y)
+        else:
+            self.gaze_overlay.clear_current_position()
     
     def keyPressEvent(self, event):
         if event.key() == Qt.Key.Key_Escape:
@@ -1436,21 +1451,29 @@ class GazeHeatmapWidget(QWidget):
 
 class ResultsTab(QWidget):
     """Вкладка для просмотра результатов записи"""
+    
+    catalog_updated = pyqtSignal()
+    
     def __init__(self):
         super().__init__()
-        self.data = None
+        self.reports_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reports")
+        self.catalog = SessionCatalog(os.path.join(self.reports_dir, CATALOG_NAME))
+        self.catalog_thread = None
+        self.data = None  # Session: записи в столбцах
         self.json_data = None
         self.video_path = None
         self.is_playing = False
-        self.times = []
-        self.attention = []
-        self.relaxation = []
-        self.alpha = []
-        self.beta = []
-        self.theta = []
-        self.gaze_x = []
-        self.gaze_y = []
-        self.data_indices = []  # Соответствие индексов массивов индексам в self.data
+        self.times = np.empty(0)
+        self.video_ms = np.empty(0)
+        self.attention = np.empty(0)
+        self.relaxation = np.empty(0)
+        self.alpha = np.empty(0)
+        self.beta = np.empty(0)
+        self.theta = np.empty(0)
+        self.gaze_x = np.empty(0)
+        self.gaze_y = np.empty(0)
+        self.pyramids = {}  # Пирамиды min/max рядов для графиков (lod_plot)
+        self.video_index = TimeIndex(self.video_ms)  # Поиск записи по позиции видео
         self.attention_peaks = []  # Список пиков внимания [(time, value, data_index), ...]
         self.peak_markers = []  # Маркеры на графике
         self.setup_ui()
@@ -1493,6 +1516,53 @@ class ResultsTab(QWidget):
         self.file_label.setWordWrap(True)
         main_layout.addWidget(self.file_label)
         
+        # Список сессий из каталога: поиск и сортировка без разбора отчётов
+        sessions_group = QGroupBox("Сессии")
+        sessions_group.setFixedHeight(220)
+        sessions_layout = QVBoxLayout(sessions_group)
+        sessions_layout.setContentsMargins(8, 20, 8, 8)
+        sessions_layout.setSpacing(6)
+        self.session_search = QLineEdit()
+        self.session_search.setPlaceholderText("Поиск: файл, видео, устройство, участник")
+        self.session_search.textChanged.connect(self.refresh_session_list)
+        sessions_layout.addWidget(self.session_search)
+        
+        self.sessions_table = QTableWidget(0, len(SESSION_TABLE_COLUMNS))
+        self.sessions_table.setHorizontalHeaderLabels([title for _, title in SESSION_TABLE_COLUMNS])
+        self.sessions_table.verticalHeader().setVisible(False)
+        self.sessions_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.sessions_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.sessions_table.setStyleSheet("""
+            QTableWidget {
+                background-color: #0d1117;
+                border: 1px solid #30363d;
+                border-radius: 6px;
+                gridline-color: #21262d;
+            }
+            QTableWidget::item:selected {
+                background-color: #1f6feb;
+                color: white;
+            }
+            QHeaderView::section {
+                background-color: #161b22;
+                color: #8b949e;
+                border: none;
+                padding: 4px 8px;
+            }
+        """)
+        # Клик по заголовку меняет сортировку, список заново читается из каталога
+        sessions_header = self.sessions_table.horizontalHeader()
+        sessions_header.setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        sessions_header.setStretchLastSection(True)
+        sessions_header.setSectionsClickable(True)
+        sessions_header.setSortIndicatorShown(True)
+        sessions_header.setSortIndicator(0, Qt.SortOrder.DescendingOrder)
+        sessions_header.sortIndicatorChanged.connect(self.refresh_session_list)
+        self.sessions_table.cellDoubleClicked.connect(self._on_session_double_clicked)
+        sessions_layout.addWidget(self.sessions_table)
+        main_layout.addWidget(sessions_group)
+        self.catalog_updated.connect(self.refresh_session_list)
+        
         # Scroll area for content
         scroll = QScrollArea()
         scroll.setWidgetResizable(True)
@@ -1610,6 +1680,7 @@ class ResultsTab(QWidget):
         self.mental_plot.addItem(self.mental_vline)
         mental_layout.addWidget(self.mental_plot)
         scroll_layout.addWidget(mental_group)
+        self.mental_lod = LodPlot(self.mental_plot)
         
         # Spectral graph
         spectral_group = QGroupBox("Альфа / Бета / Тета")
@@ -1623,6 +1694,7 @@ class ResultsTab(QWidget):
         self.spectral_plot.addItem(self.spectral_vline)
         spectral_layout.addWidget(self.spectral_plot)
         scroll_layout.addWidget(spectral_group)
+        self.spectral_lod = LodPlot(self.spectral_plot)
         
         # Gaze graph
         gaze_group = QGroupBox("Позиция взгляда")
@@ -1637,6 +1709,7 @@ class ResultsTab(QWidget):
         self.gaze_plot.addItem(self.gaze_vline)
         gaze_layout.addWidget(self.gaze_plot)
         scroll_layout.addWidget(gaze_group)
+        self.gaze_lod = LodPlot(self.gaze_plot)
         
         # Главные моменты (пики внимания)
         highlights_group = QGroupBox("Главные моменты")
@@ -1697,7 +1770,9 @@ class ResultsTab(QWidget):
             self.times,
             self.gaze_x,
             self.gaze_y,
-            self
+            self,
+            pyramids=self.pyramids,
+            video_index=self.video_index,
         )
         self.fullscreen_dialog.position_changed.connect(self._on_fullscreen_position)
     
@@ -1705,23 +1780,74 @@ class ResultsTab(QWidget):
         """Синхронизация при изменении позиции в полноэкранном режиме"""
         self.sync_data_with_video()
     
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh_session_list()
+        self.refresh_catalog()
+    
+    def refresh_catalog(self):
+        """Обновить каталог в фоне: разбираются только новые и изменённые отчёты"""
+        if self.catalog_thread is not None and self.catalog_thread.is_alive():
+            return
+        
+        def update():
+            try:
+                updated, removed = self.catalog.update(self.reports_dir)
+            except Exception as e:
+                print(f"Ошибка обновления каталога сессий: {e}")
+                return
+            if updated or removed:
+                self.catalog_updated.emit()
+        
+        self.catalog_thread = threading.Thread(target=update, daemon=True)
+        self.catalog_thread.start()
+    
+    def refresh_session_list(self, *_):
+        """Заполнить список сессий из каталога с учётом поиска и сортировки"""
+        header = self.sessions_table.horizontalHeader()
+        field = SESSION_TABLE_COLUMNS[header.sortIndicatorSection()][0]
+        descending = header.sortIndicatorOrder() == Qt.SortOrder.DescendingOrder
+        try:
+            sessions = self.catalog.search(self.session_search.text().strip(), field, descending)
+        except Exception as e:
+            print(f"Ошибка чтения каталога сессий: {e}")
+            return
+        
+        self.sessions_table.setUpdatesEnabled(False)
+        self.sessions_table.setRowCount(len(sessions))
+        for row, session in enumerate(sessions):
+            created = session.created_at[:16].replace('T', ' ') if session.created_at else "—"
+            attention = f"{session.mean_attention:.0f}%" if session.mean_attention is not None else "—"
+            values = (
+                created, session.name, session.video_id or "—", session.participant or "—",
+                session.device or "—", self._format_time(int(session.duration_sec * 1000)),
+                str(session.record_count), attention, str(session.peak_count),
+                f"{session.gaze_coverage * 100:.0f}%",
+            )
+            for column, text in enumerate(values):
+                self.sessions_table.setItem(row, column, QTableWidgetItem(text))
+            self.sessions_table.item(row, 0).setData(Qt.ItemDataRole.UserRole, session.path)
+        self.sessions_table.setUpdatesEnabled(True)
+    
+    def _on_session_double_clicked(self, row, column):
+        path = self.sessions_table.item(row, 0).data(Qt.ItemDataRole.UserRole)
+        if path:
+            self.open_session(path)
+    
     def load_json(self):
-        reports_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reports")
-        if not os.path.exists(reports_dir):
-            reports_dir = ""
+        reports_dir = self.reports_dir if os.path.exists(self.reports_dir) else ""
         
         filename, _ = QFileDialog.getOpenFileName(
             self, "Загрузить результаты", reports_dir,
-            "JSON файлы (*.json);;Все файлы (*)"
+            "Сессии (*.json *.json.gz *.json.xz *.json.zst *.npz);;Все файлы (*)"
         )
-        if not filename:
-            return
-        
+        if filename:
+            self.open_session(filename)
+    
+    def open_session(self, filename):
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                self.json_data = json.load(f)
-            
-            self.data = self.json_data.get('records', [])
+            self.data = load_session(filename)
+            self.json_data = self.data.meta
             video_file = self.json_data.get('video_file', '')
             
             info_text = f"Загружено: {os.path.basename(filename)} ({len(self.data)} записей)"
@@ -1795,22 +1921,17 @@ class ResultsTab(QWidget):
         return f"{s // 60:02d}:{s % 60:02d}"
     
     def sync_data_with_video(self):
-        if not self.data or not self.times:
+        if self.data is None or len(self.times) == 0:
             return
         
         video_pos_ms = self.media_player.position()
         
-        closest_idx = 0
-        min_diff = float('inf')
-        for i, record in enumerate(self.data):
-            diff = abs(record.get('video_ms', 0) - video_pos_ms)
-            if diff < min_diff:
-                min_diff = diff
-                closest_idx = i
+        closest_idx = self.video_index.nearest(video_pos_ms)
         
         if closest_idx < len(self.data):
-            record = self.data[closest_idx]
-            elapsed = record.get('elapsed_sec', 0)
+            record = self.data.record(closest_idx)
+            # Линия текущей позиции на графиках движется плавно, между записями
+            elapsed = self.video_index.interpolate(video_pos_ms, self.times)
             
             attention_val = record.get('attention', 0)
             relaxation_val = record.get('relaxation', 0)
@@ -1836,103 +1957,61 @@ class ResultsTab(QWidget):
             self.gaze_vline.setPos(elapsed)
     
     def update_graphs(self):
-        if not self.data:
+        if self.data is None:
             return
         
-        self.times = []
-        self.attention = []
-        self.relaxation = []
-        self.alpha = []
-        self.beta = []
-        self.theta = []
-        self.gaze_x = []
-        self.gaze_y = []
-        self.data_indices = []
-        
-        for data_idx, row in enumerate(self.data):
-            try:
-                self.times.append(float(row.get('elapsed_sec', 0)))
-                self.attention.append(float(row.get('attention', 0)))
-                self.relaxation.append(float(row.get('relaxation', 0)))
-                self.alpha.append(float(row.get('alpha', 0)))
-                self.beta.append(float(row.get('beta', 0)))
-                self.theta.append(float(row.get('theta', 0)))
-                gx = row.get('gaze_x', 0)
-                gy = row.get('gaze_y', 0)
-                self.gaze_x.append(float(gx) if gx else 0)
-                self.gaze_y.append(float(gy) if gy else 0)
-                self.data_indices.append(data_idx)  # Сохраняем соответствие
-            except:
-                continue
+        session = self.data
+        self.times = session.column('elapsed_sec')
+        self.video_ms = session.column('video_ms')
+        self.attention = session.column('attention')
+        self.relaxation = session.column('relaxation')
+        self.alpha = session.column('alpha')
+        self.beta = session.column('beta')
+        self.theta = session.column('theta')
+        self.gaze_x = session.column('gaze_x')
+        self.gaze_y = session.column('gaze_y')
+        self.video_index = TimeIndex(self.video_ms)
+        has_data = len(self.times) > 0
+        # Пирамиды min/max строятся один раз на сессию и общие с полноэкранным режимом
+        self.pyramids = build_pyramids(self.times, {
+            'attention': self.attention, 'relaxation': self.relaxation,
+            'alpha': self.alpha, 'beta': self.beta, 'theta': self.theta,
+            'gaze_x': self.gaze_x, 'gaze_y': self.gaze_y,
+        })
         
         self.mental_plot.clear()
+        self.mental_lod.clear()
         self.mental_plot.addItem(self.mental_vline)
-        if self.times:
-            self.mental_plot.plot(self.times, self.attention, pen=pg.mkPen('#58a6ff', width=2), name='Внимание')
-            self.mental_plot.plot(self.times, self.relaxation, pen=pg.mkPen('#a371f7', width=2), name='Расслабление')
+        if has_data:
+            self.mental_lod.plot(self.pyramids['attention'], pen=pg.mkPen('#58a6ff', width=2), name='Внимание')
+            self.mental_lod.plot(self.pyramids['relaxation'], pen=pg.mkPen('#a371f7', width=2), name='Расслабление')
             
             # Находим и отображаем пики внимания
             self._find_attention_peaks()
             self._display_attention_peaks()
         
         self.spectral_plot.clear()
+        self.spectral_lod.clear()
         self.spectral_plot.addItem(self.spectral_vline)
-        if self.times:
-            self.spectral_plot.plot(self.times, self.alpha, pen=pg.mkPen('#3fb950', width=2))
-            self.spectral_plot.plot(self.times, self.beta, pen=pg.mkPen('#f0883e', width=2))
-            self.spectral_plot.plot(self.times, self.theta, pen=pg.mkPen('#d29922', width=2))
+        if has_data:
+            self.spectral_lod.plot(self.pyramids['alpha'], pen=pg.mkPen('#3fb950', width=2))
+            self.spectral_lod.plot(self.pyramids['beta'], pen=pg.mkPen('#f0883e', width=2))
+            self.spectral_lod.plot(self.pyramids['theta'], pen=pg.mkPen('#d29922', width=2))
         
         self.gaze_plot.clear()
+        self.gaze_lod.clear()
         self.gaze_plot.addItem(self.gaze_vline)
-        if self.times:
-            self.gaze_plot.plot(self.times, self.gaze_x, pen=pg.mkPen('#a371f7', width=2))
-            self.gaze_plot.plot(self.times, self.gaze_y, pen=pg.mkPen('#f778ba', width=2))
+        if has_data:
+            self.gaze_lod.plot(self.pyramids['gaze_x'], pen=pg.mkPen('#a371f7', width=2))
+            self.gaze_lod.plot(self.pyramids['gaze_y'], pen=pg.mkPen('#f778ba', width=2))
         
-        gaze_points = [(self.gaze_x[i], self.gaze_y[i], self.times[i]) for i in range(len(self.times)) if self.gaze_x[i] > 0 or self.gaze_y[i] > 0]
+        mask = (self.gaze_x > 0) | (self.gaze_y > 0)
+        gaze_points = list(zip(self.gaze_x[mask].tolist(), self.gaze_y[mask].tolist(), self.times[mask].tolist()))
         self.gaze_heatmap.set_data(gaze_points)
     
     def _find_attention_peaks(self):
-        """Найти пики внимания в данных"""
-        if not self.times or not self.attention or len(self.times) < 3:
-            self.attention_peaks = []
-            return
-        
-        # Вычисляем среднее и стандартное отклонение
-        attention_values = [a for a in self.attention if a > 0]
-        if not attention_values:
-            self.attention_peaks = []
-            return
-        
-        mean_attention = sum(attention_values) / len(attention_values)
-        variance = sum((a - mean_attention) ** 2 for a in attention_values) / len(attention_values)
-        std_dev = variance ** 0.5
-        
-        # Порог для пика: среднее + 1.5 * стандартное отклонение
-        threshold = mean_attention + 1.5 * std_dev
-        
-        # Находим локальные максимумы выше порога
-        peaks = []
-        window_size = max(3, len(self.times) // 50)  # Адаптивный размер окна
-        
-        for i in range(window_size, len(self.attention) - window_size):
-            if self.attention[i] < threshold:
-                continue
-            
-            # Проверяем, является ли это локальным максимумом
-            is_peak = True
-            for j in range(i - window_size, i + window_size + 1):
-                if j != i and self.attention[j] >= self.attention[i]:
-                    is_peak = False
-                    break
-            
-            if is_peak:
-                # Используем индекс из data_indices для соответствия с self.data
-                data_idx = self.data_indices[i] if i < len(self.data_indices) else i
-                peaks.append((self.times[i], self.attention[i], data_idx))
-        
-        # Сортируем по значению внимания (от большего к меньшему) и берем топ-10
-        peaks.sort(key=lambda x: x[1], reverse=True)
-        self.attention_peaks = peaks[:10]
+        """Найти пики внимания в данных (топ-10)"""
+        self.attention_peaks = find_attention_peaks(self.times, self.attention)
     
     def _display_attention_peaks(self):
         """Отобразить пики внимания на графике и в списке"""
@@ -1997,8 +2076,8 @@ class ResultsTab(QWidget):
                 self.video_slider.setValue(video_pos_ms)
         
         # Обновляем данные для текущей позиции
-        if index < len(self.data):
-            record = self.data[index]
+        if self.data is not None and index < len(self.data):
+            record = self.data.record(index)
             attention_val = record.get('attention', 0)
             relaxation_val = record.get('relaxation', 0)
             self.cur_attention.set_value(f"{attention_val:.0f}%" if attention_val else "--")
@@ -2357,11 +2436,9 @@ class MonitoringTab(QWidget):
     def __init__(self):
         super().__init__()
         self.data_points = 100
-        self.attention_data = deque([0] * self.data_points, maxlen=self.data_points)
-        self.relaxation_data = deque([0] * self.data_points, maxlen=self.data_points)
-        self.alpha_data = deque([0] * self.data_points, maxlen=self.data_points)
-        self.beta_data = deque([0] * self.data_points, maxlen=self.data_points)
-        self.theta_data = deque([0] * self.data_points, maxlen=self.data_points)
+        # Буферы графиков по адресу устройства: (внимание/расслабление, спектр)
+        self.buffers = {}
+        self.plot_address = None
         self.is_monitoring = False
         self.setup_ui()
         self.connect_signals()
@@ -2486,19 +2563,21 @@ class MonitoringTab(QWidget):
             return
         self.is_monitoring = True
         addr = brain_bit_controller.connected_devices[0]
+        self.plot_address = addr
         
         def on_inst_mind(address, data):
-            if address == addr and self.is_monitoring:
-                self.attention_data.append(data.attention)
-                self.relaxation_data.append(data.relaxation)
+            if not self.is_monitoring:
+                return
+            self.device_buffers(address)[0].append((data.attention, data.relaxation))
+            if address == addr:
                 self.attention_card.set_value(f"{data.attention:.0f}%")
                 self.relaxation_card.set_value(f"{data.relaxation:.0f}%")
         
         def on_spec(address, data):
-            if address == addr and self.is_monitoring:
-                self.alpha_data.append(data.alpha)
-                self.beta_data.append(data.beta)
-                self.theta_data.append(data.theta)
+            if not self.is_monitoring:
+                return
+            self.device_buffers(address)[1].append((data.alpha, data.beta, data.theta))
+            if address == addr:
                 self.alpha_card.set_value(f"{data.alpha}%")
                 self.beta_card.set_value(f"{data.beta}%")
                 self.theta_card.set_value(f"{data.theta}%")
@@ -2535,45 +2614,72 @@ class MonitoringTab(QWidget):
         self.start_monitor_btn.setEnabled(True)
         self.stop_monitor_btn.setEnabled(False)
     
+    def device_buffers(self, address):
+        """Буферы графиков устройства (создаются при первых данных)"""
+        if address not in self.buffers:
+            self.buffers[address] = (
+                RingBuffer(self.data_points, ('attention', 'relaxation')),
+                RingBuffer(self.data_points, ('alpha', 'beta', 'theta')),
+            )
+        return self.buffers[address]
+    
     def update_plots(self):
-        x = list(range(self.data_points))
-        self.attention_curve.setData(x, list(self.attention_data))
-        self.relaxation_curve.setData(x, list(self.relaxation_data))
-        self.alpha_curve.setData(x, list(self.alpha_data))
-        self.beta_curve.setData(x, list(self.beta_data))
-        self.theta_curve.setData(x, list(self.theta_data))
+        if self.plot_address is None:
+            return
+        mind, spectral = self.device_buffers(self.plot_address)
+        self.attention_curve.setData(mind.x, mind.view('attention'), skipFiniteCheck=True)
+        self.relaxation_curve.setData(mind.x, mind.view('relaxation'), skipFiniteCheck=True)
+        self.alpha_curve.setData(spectral.x, spectral.view('alpha'), skipFiniteCheck=True)
+        self.beta_curve.setData(spectral.x, spectral.view('beta'), skipFiniteCheck=True)
+        self.theta_curve.setData(spectral.x, spectral.view('theta'), skipFiniteCheck=True)
 
 
 class VideoRecordingTab(QWidget):
     """Вкладка с видео, трекингом взгляда и записью"""
+    
+    report_saved = pyqtSignal(str, int, str, str)  # путь, записей, video_id, ошибка
+    reports_recovered = pyqtSignal(list)
+    sample_ready = pyqtSignal(dict)  # Равномерная запись семплера для графиков
+    
     def __init__(self):
         super().__init__()
         self.is_recording = False
         self.recording_start_time = None
-        self.record_data = []
-        self.record_count_value = 0
-        self.current_brain_data = {}
-        self.current_gaze_data = None
+        self.journal = None
+        self.finishing_journal = None
+        self.recorder = None
+        self.sampler = None
+        self.uploader = None
+        self.record_writer = None
+        self.finishing_record_writer = None
+        self.video_sink = None
+        self.frame_duration_us = 0
         self.video_loaded = False
         self.video_file_path = None
         self.camera_active = False
         self.fullscreen_dialog = None
         self.reports_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reports")
+        self.record_store = RecordStore(os.path.join(self.reports_dir, STORE_NAME))
         
         # Data for real-time graphs
-        self.data_points = 500
-        self.attention_data = deque([0] * self.data_points, maxlen=self.data_points)
-        self.relaxation_data = deque([0] * self.data_points, maxlen=self.data_points)
-        self.alpha_data = deque([0] * self.data_points, maxlen=self.data_points)
-        self.beta_data = deque([0] * self.data_points, maxlen=self.data_points)
-        self.theta_data = deque([0] * self.data_points, maxlen=self.data_points)
-        self.gaze_x_data = deque([0] * self.data_points, maxlen=self.data_points)
-        self.gaze_y_data = deque([0] * self.data_points, maxlen=self.data_points)
+        self.data_points = int(LIVE_WINDOW_SEC * DEFAULT_RATE)
+        self.live_buffer = RingBuffer(self.data_points, LIVE_CHANNELS)
         
         self.setup_ui()
         self.connect_signals()
         # Initialize graphs with empty data
         QTimer.singleShot(100, self.update_plots)
+        
+        # Очередь отправки отчётов: задания прошлых запусков продолжают отправляться
+        self.outbox = UploadOutbox(os.path.join(self.reports_dir, "outbox"))
+        self.outbox.progress.connect(self.on_upload_progress)
+        self.outbox.job_finished.connect(self.on_upload_finished)
+        self.outbox.queue_changed.connect(self.on_upload_queue_changed)
+        self.outbox.start()
+        
+        # Журналы, оставшиеся после аварийного завершения, превращаются в отчёты
+        if os.path.isdir(self.reports_dir):
+            threading.Thread(target=self._recover_reports, daemon=True).start()
     
     def setup_ui(self):
         main_layout = QVBoxLayout(self)
@@ -2686,9 +2792,12 @@ class VideoRecordingTab(QWidget):
         self.eyes_status_label = QLabel("Глаза: —")
         self.eyes_status_label.setStyleSheet("color: #e6edf3; font-size: 11px;")
         self.eyes_status_label.setWordWrap(True)
+        self.tracker_stats_label = QLabel("")
+        self.tracker_stats_label.setStyleSheet("color: #8b949e; font-size: 11px;")
         gaze_info.addWidget(self.gaze_direction_label)
         gaze_info.addWidget(self.eyes_status_label)
         gaze_info.addStretch()
+        gaze_info.addWidget(self.tracker_stats_label)
         camera_layout.addWidget(gaze_widget)
         
         cam_controls_widget = QWidget()
@@ -2711,6 +2820,9 @@ class VideoRecordingTab(QWidget):
         cam_controls.addWidget(self.start_camera_btn)
         cam_controls.addWidget(self.calibrate_btn)
         cam_controls.addWidget(self.stop_camera_btn)
+        self.predict_gaze_check = QCheckBox("Предсказание")
+        self.predict_gaze_check.setToolTip("Компенсировать задержку камеры экстраполяцией взгляда")
+        cam_controls.addWidget(self.predict_gaze_check)
         camera_layout.addWidget(cam_controls_widget)
         
         self.calibration_status = QLabel("Требуется калибровка")
@@ -2761,6 +2873,11 @@ class VideoRecordingTab(QWidget):
         self.output_path_label.setWordWrap(True)
         record_layout.addWidget(self.output_path_label)
         
+        self.upload_status_label = QLabel("")
+        self.upload_status_label.setStyleSheet("color: #8b949e; font-size: 11px;")
+        self.upload_status_label.setWordWrap(True)
+        record_layout.addWidget(self.upload_status_label)
+        
         buttons_widget = QWidget()
         buttons_widget.setFixedHeight(50)
         buttons_layout = QHBoxLayout(buttons_widget)
@@ -2795,7 +2912,7 @@ class VideoRecordingTab(QWidget):
         status_layout.setContentsMargins(0, 0, 0, 0)
         self.record_status = QLabel("Готов")
         self.record_status.setStyleSheet("font-weight: 600;")
-        self.record_count = QLabel("Записей: 0")
+        self.record_count = QLabel("Событий: 0")
         self.record_count.setStyleSheet("color: #8b949e;")
         status_layout.addWidget(self.record_status)
         status_layout.addStretch()
@@ -2876,8 +2993,11 @@ class VideoRecordingTab(QWidget):
         self.media_player.setAudioOutput(self.audio_output)
         self.media_player.setVideoOutput(self.video_widget)
         
-        self.record_timer = QTimer()
-        self.record_timer.timeout.connect(self._write_record)
+        # Длинное окно рисуется прореживанием по пикам, видимая часть — без лишних точек
+        for curve in (self.attention_curve, self.relaxation_curve, self.alpha_curve, self.beta_curve,
+                      self.theta_curve, self.gaze_x_curve, self.gaze_y_curve):
+            curve.setDownsampling(auto=True, method='peak')
+            curve.setClipToView(True)
         
         # Timer for updating graphs
         self.update_timer = QTimer()
@@ -2893,16 +3013,29 @@ class VideoRecordingTab(QWidget):
         self.start_camera_btn.clicked.connect(self.start_camera)
         self.calibrate_btn.clicked.connect(self.start_calibration)
         self.stop_camera_btn.clicked.connect(self.stop_camera)
+        self.predict_gaze_check.toggled.connect(self.set_gaze_prediction)
         
         self.media_player.positionChanged.connect(self.update_position)
         self.media_player.durationChanged.connect(self.update_duration)
         self.media_player.playbackStateChanged.connect(self.update_play_button)
+        self.media_player.positionChanged.connect(self._record_video_position)
+        self.media_player.playbackStateChanged.connect(self._record_video_position)
+        # Полноэкранный диалог переключает вывод видео — подключаемся к новому QVideoSink
+        self.media_player.videoOutputChanged.connect(self._attach_video_sink)
+        self.media_player.metaDataChanged.connect(self._update_frame_duration)
+        self._attach_video_sink()
         
         eye_tracker.frame_ready.connect(self.update_camera_frame)
         eye_tracker.gaze_updated.connect(self.update_gaze_data)
         eye_tracker.tracking_started.connect(self.on_tracking_started)
         eye_tracker.tracking_stopped.connect(self.on_tracking_stopped)
         eye_tracker.error_occurred.connect(self.on_tracking_error)
+        eye_tracker.stats_updated.connect(self.update_tracker_stats)
+        
+        self.report_saved.connect(self.on_report_saved)
+        self.reports_recovered.connect(self.on_reports_recovered)
+        # Семплер выдаёт записи из своего потока; буферы графиков меняются только в потоке GUI
+        self.sample_ready.connect(self._on_sample, Qt.ConnectionType.QueuedConnection)
     
     def select_video(self):
         filename, _ = QFileDialog.getOpenFileName(self, "Выбрать видео", "", "Видео (*.mp4 *.avi *.mkv *.mov)")
@@ -2934,6 +3067,46 @@ class VideoRecordingTab(QWidget):
         self.video_slider.setValue(pos)
         self.time_label.setText(f"{self._format_time(pos)} / {self._format_time(self.media_player.duration())}")
     
+    def _record_video_position(self, *_):
+        """Событие потока видео: позиция и идёт ли воспроизведение"""
+        if self.is_recording and self.recorder is not None:
+            playing = self.media_player.playbackState() == QMediaPlayer.PlaybackState.PlayingState
+            self.recorder.record('video', {'video_ms': self.media_player.position() if self.video_loaded else 0,
+                                           'playing': playing})
+    
+    def _attach_video_sink(self):
+        sink = self.media_player.videoSink()
+        if sink is self.video_sink:
+            return
+        if self.video_sink is not None:
+            try:
+                self.video_sink.videoFrameChanged.disconnect(self._record_video_frame)
+            except (TypeError, RuntimeError):
+                pass
+        self.video_sink = sink
+        if sink is not None:
+            # Кадры приходят из потока воспроизведения: метка времени берётся сразу, без очереди GUI
+            # (EventRecorder.record защищён блокировкой и вызывается из любого потока)
+            sink.videoFrameChanged.connect(self._record_video_frame, Qt.ConnectionType.DirectConnection)
+    
+    def _update_frame_duration(self):
+        fps = self.media_player.metaData().value(QMediaMetaData.Key.VideoFrameRate)
+        self.frame_duration_us = 1e6 / fps if fps else 0
+    
+    def _record_video_frame(self, frame):
+        """Событие потока кадров: номер и метка времени показанного кадра"""
+        recorder = self.recorder
+        if not self.is_recording or recorder is None or not frame.isValid():
+            return
+        start_us = frame.startTime()
+        if start_us < 0:
+            return
+        duration_us = frame.endTime() - start_us
+        if duration_us <= 0:
+            duration_us = self.frame_duration_us
+        recorder.record('frame', {'video_frame': int(round(start_us / duration_us)) if duration_us > 0 else None,
+                                  'frame_ms': round(start_us / 1000, 3)})
+    
     def update_duration(self, dur):
         self.video_slider.setRange(0, dur)
     
@@ -2955,6 +3128,9 @@ class VideoRecordingTab(QWidget):
         self.camera_active = False
         eye_tracker.stop()
     
+    def set_gaze_prediction(self, enabled):
+        eye_tracker.set_predictor(GazePredictor() if enabled else None)
+    
     def on_tracking_started(self):
         self.camera_active = True
         self.start_camera_btn.setEnabled(False)
@@ -2995,6 +3171,7 @@ class VideoRecordingTab(QWidget):
         self.camera_label.setText("Камера выключена")
         self.gaze_direction_label.setText("Направление: —")
         self.eyes_status_label.setText("Глаза: —")
+        self.tracker_stats_label.setText("")
     
     def start_calibration(self):
         if not eye_tracker.is_running:
@@ -3050,27 +3227,48 @@ class VideoRecordingTab(QWidget):
         if not self.camera_active:
             return
         try:
-            self.current_gaze_data = gaze
+            if self.is_recording and self.recorder is not None:
+                # raw_* — наблюдённый взгляд: по нему пересчитывается калибровка, предсказание в него не входит
+                raw_x = gaze.gaze_x if gaze.observed_x is None else gaze.observed_x
+                raw_y = gaze.gaze_y if gaze.observed_y is None else gaze.observed_y
+                self.recorder.record('gaze', {
+                    'gaze_x': round(gaze.screen_x, 3),
+                    'gaze_y': round(gaze.screen_y, 3),
+                    'raw_x': round(raw_x, 4),
+                    'raw_y': round(raw_y, 4),
+                    'gaze_h': gaze.horizontal_direction,
+                    'gaze_v': gaze.vertical_direction,
+                    'left_eye': gaze.left_eye_open,
+                    'right_eye': gaze.right_eye_open
+                }, timestamp=gaze.timestamp)
             self.gaze_direction_label.setText(f"Направление: {gaze.horizontal_direction}/{gaze.vertical_direction}")
             self.eyes_status_label.setText(f"Глаза: L:{'O' if gaze.left_eye_open else 'C'} R:{'O' if gaze.right_eye_open else 'C'}")
             if self.is_recording:
                 self.rec_gaze_x.set_value(f"{gaze.screen_x:.2f}")
                 self.rec_gaze_y.set_value(f"{gaze.screen_y:.2f}")
-                self.gaze_x_data.append(gaze.screen_x if gaze.screen_x else 0)
-                self.gaze_y_data.append(gaze.screen_y if gaze.screen_y else 0)
         except Exception:
             pass
     
+    def update_tracker_stats(self, stats):
+        """Текущая частота трекинга и доля CPU потока камеры"""
+        self.tracker_stats_label.setText(f"{stats.fps:.0f} FPS | CPU {stats.cpu_share * 100:.0f}%")
+        self.tracker_stats_label.setToolTip(
+            f"Лимит: {stats.fps_limit:.0f} FPS\n"
+            f"Поиск лица: каждый {stats.detect_interval}-й кадр, масштаб {stats.detect_scale:.1f}"
+        )
+    
     def update_plots(self):
         """Обновить графики в реальном времени"""
-        x = list(range(self.data_points))
-        self.attention_curve.setData(x, list(self.attention_data))
-        self.relaxation_curve.setData(x, list(self.relaxation_data))
-        self.alpha_curve.setData(x, list(self.alpha_data))
-        self.beta_curve.setData(x, list(self.beta_data))
-        self.theta_curve.setData(x, list(self.theta_data))
-        self.gaze_x_curve.setData(x, list(self.gaze_x_data))
-        self.gaze_y_curve.setData(x, list(self.gaze_y_data))
+        buffer = self.live_buffer
+        self.attention_curve.setData(buffer.x, buffer.view('attention'), skipFiniteCheck=True)
+        self.relaxation_curve.setData(buffer.x, buffer.view('relaxation'), skipFiniteCheck=True)
+        self.alpha_curve.setData(buffer.x, buffer.view('alpha'), skipFiniteCheck=True)
+        self.beta_curve.setData(buffer.x, buffer.view('beta'), skipFiniteCheck=True)
+        self.theta_curve.setData(buffer.x, buffer.view('theta'), skipFiniteCheck=True)
+        self.gaze_x_curve.setData(buffer.x, buffer.view('gaze_x'), skipFiniteCheck=True)
+        self.gaze_y_curve.setData(buffer.x, buffer.view('gaze_y'), skipFiniteCheck=True)
+        if self.recorder is not None:
+            self.record_count.setText(f"Событий: {self.recorder.event_count}")
     
     def _check_ready(self):
         self.start_record_btn.setEnabled(True)
@@ -3104,34 +3302,59 @@ class VideoRecordingTab(QWidget):
         
         self.is_recording = True
         self.recording_start_time = datetime.now()
-        self.record_count_value = 0
-        self.record_data = []
-        
-        self.current_brain_data = {'attention': 0, 'relaxation': 0, 'alpha': 0, 'beta': 0, 'theta': 0}
+        started_utc = datetime.now(timezone.utc)
+        
+        filename = f"report_{self.recording_start_time.strftime('%Y%m%d_%H%M%S')}{JOURNAL_SUFFIX}"
+        video_id = get_video_id(self.video_file_path)
+        header = {
+            'created_at': self.recording_start_time.strftime('%Y-%m-%dT%H:%M:%S.') + f'{self.recording_start_time.microsecond:06d}Z',
+            'ended_at': None,
+            'video_file': os.path.basename(self.video_file_path) if self.video_file_path else None,
+            'video_path': self.video_file_path,
+            'video_id': video_id,
+            'device': brain_bit_controller.connected_devices[0] if brain_bit_controller.connected_devices else None,
+            'participant': auth_manager.user_email,
+            'calibration': calibration_to_json(eye_tracker.calibration),
+            # Журнал событий: равномерные записи строятся при сборке отчёта
+            'journal': 'events',
+            'rate': DEFAULT_RATE,
+            'started_utc': format_timestamp(started_utc)
+        }
+        self.journal = ReportJournal(os.path.join(self.reports_dir, filename), header, DEFAULT_COMPRESSION)
+        self.recorder = EventRecorder(self.journal.append, started_utc.replace(tzinfo=None))
+        self._record_video_position()
+        # Графики получают равномерные записи из потока семплера, а не каждое событие
+        self.sampler = RecordSampler(self.recorder, DEFAULT_RATE)
+        self.sampler.add_listener(self.sample_ready.emit)
+        # Те же записи — в базу SQLite для выборок по времени и между сессиями
+        self.record_writer = RecordWriter(self.record_store, filename[:-len(JOURNAL_SUFFIX)], header)
+        self.sampler.add_listener(self.record_writer.append)
+        # Записи уходят на сервер пакетами прямо во время записи
+        if websocket is not None:
+            self.uploader = LiveUploader(LIVE_UPLOAD_URL.format(video_id=video_id),
+                                         filename[:-len(JOURNAL_SUFFIX)],
+                                         {'video_id': video_id, 'created_at': header['created_at'],
+                                          'rate': DEFAULT_RATE})
+            self.sampler.add_listener(self.uploader.append)
+            self.uploader.start()
+        self.sampler.start()
         
         if brain_bit_controller.connected_devices:
             addr = brain_bit_controller.connected_devices[0]
             
             def on_inst_mind(address, data):
                 if address == addr and self.is_recording:
-                    self.current_brain_data['attention'] = data.attention
-                    self.current_brain_data['relaxation'] = data.relaxation
-                    self.attention_data.append(data.attention)
-                    self.relaxation_data.append(data.relaxation)
+                    self.recorder.record('mind', {'attention': data.attention, 'relaxation': data.relaxation})
                     self.rec_attention.set_value(f"{data.attention:.0f}%")
                     self.rec_relaxation.set_value(f"{data.relaxation:.0f}%")
             
             def on_spec(address, data):
                 if address == addr and self.is_recording:
-                    self.current_brain_data['alpha'] = data.alpha
-                    self.current_brain_data['beta'] = data.beta
-                    self.current_brain_data['theta'] = data.theta
-                    self.alpha_data.append(data.alpha)
-                    self.beta_data.append(data.beta)
-                    self.theta_data.append(data.theta)
+                    self.recorder.record('spectral', {'alpha': data.alpha, 'beta': data.beta, 'theta': data.theta})
             
             def on_artifact(address, is_art):
                 if address == addr and self.is_recording:
+                    self.recorder.record('artifact', {'artifact': bool(is_art)})
                     if self.fullscreen_dialog and self.fullscreen_dialog.isVisible():
                         self.fullscreen_dialog.show_electrode_warning(is_art)
                     else:
@@ -3146,65 +3369,32 @@ class VideoRecordingTab(QWidget):
             brain_bit_controller.isArtefacted.connect(on_artifact)
             brain_bit_controller.start_calculations(addr)
         
-        self.record_timer.start(100)
         self.update_timer.start(100)  # Update graphs every 100ms
         self.record_status.setText("ЗАПИСЬ")
         self.record_status.setStyleSheet("color: #f85149; font-weight: 600;")
         self.start_record_btn.setEnabled(False)
         self.stop_record_btn.setEnabled(True)
     
-    def _write_record(self):
-        if not self.is_recording:
-            return
-        now = datetime.now(timezone.utc)
-        elapsed = (now - self.recording_start_time).total_seconds()
-        video_pos = self.media_player.position() if self.video_loaded else 0
-        gaze = self.current_gaze_data
-        
-        record = {
-            'timestamp': now.strftime('%Y-%m-%dT%H:%M:%S.') + f'{now.microsecond:06d}Z',
-            'elapsed_sec': round(elapsed, 2),
-            'video_ms': video_pos,
-            'attention': self.current_brain_data.get('attention', 0),
-            'relaxation': self.current_brain_data.get('relaxation', 0),
-            'audio_level': 0.0,
-            'alpha': self.current_brain_data.get('alpha', 0),
-            'beta': self.current_brain_data.get('beta', 0),
-            'theta': self.current_brain_data.get('theta', 0),
-            'gaze_x': round(gaze.screen_x, 3) if gaze else 0,
-            'gaze_y': round(gaze.screen_y, 3) if gaze else 0,
-            'gaze_h': gaze.horizontal_direction if gaze else '',
-            'gaze_v': gaze.vertical_direction if gaze else '',
-            'left_eye': gaze.left_eye_open if gaze else False,
-            'right_eye': gaze.right_eye_open if gaze else False
-        }
-        self.record_data.append(record)
-        
-        self.record_count_value += 1
-        self.record_count.setText(f"Записей: {self.record_count_value}")
+    def _on_sample(self, record):
+        """Равномерная запись семплера (доставлена в поток GUI) — в буферы графиков"""
+        # Записи, стоявшие в очереди на момент остановки, не попадают в очищенные графики
+        if self.is_recording:
+            self.live_buffer.append([record[name] or 0 for name in LIVE_CHANNELS])
     
     def stop_recording(self):
+        self._record_video_position()
         self.is_recording = False
-        self.record_timer.stop()
         self.update_timer.stop()
-        
-        # Clear graph data
-        self.attention_data.clear()
-        self.relaxation_data.clear()
-        self.alpha_data.clear()
-        self.beta_data.clear()
-        self.theta_data.clear()
-        self.gaze_x_data.clear()
-        self.gaze_y_data.clear()
-        # Fill with zeros
-        for _ in range(self.data_points):
-            self.attention_data.append(0)
-            self.relaxation_data.append(0)
-            self.alpha_data.append(0)
-            self.beta_data.append(0)
-            self.theta_data.append(0)
-            self.gaze_x_data.append(0)
-            self.gaze_y_data.append(0)
+        sampling = None
+        if self.sampler is not None:
+            self.sampler.stop()
+            sampling = self.sampler.stats()
+            self.sampler = None
+        uploader, self.uploader = self.uploader, None
+        if uploader is not None:
+            uploader.finish()
+        
+        self.live_buffer.clear()
         self.update_plots()  # Clear graphs
         
         self.electrode_warning.setVisible(False)
@@ -3230,71 +3420,127 @@ class VideoRecordingTab(QWidget):
             except:
                 pass
 
-        if self.record_data:
-            filename = f"report_{self.recording_start_time.strftime('%Y%m%d_%H%M%S')}.json"
-            filepath = os.path.join(self.reports_dir, filename)
-            
-            end_time = datetime.now()
-            report = {
-                'created_at': self.recording_start_time.strftime('%Y-%m-%dT%H:%M:%S.') + f'{self.recording_start_time.microsecond:06d}Z',
-                'ended_at': end_time.strftime('%Y-%m-%dT%H:%M:%S.') + f'{end_time.microsecond:06d}Z',
-                'video_file': os.path.basename(self.video_file_path) if self.video_file_path else None,
-                'video_path': self.video_file_path,
-                'total_records': len(self.record_data),
-                'records': self.record_data
-            }
-            
-            try:
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    json.dump(report, f, ensure_ascii=False, indent=2)
-                self.output_path_label.setText(f"Сохранено: {filename}")
-                self.output_path_label.setStyleSheet("color: #3fb950; font-size: 12px;")
-            except Exception as e:
-                self.output_path_label.setText(f"Ошибка сохранения: {e}")
-                self.output_path_label.setStyleSheet("color: #f85149; font-size: 12px;")
-        
-        # Отправка данных по WebSocket
-        if self.record_data:
-            # Определяем ID видео
+        # Отчёт собирается из журнала в фоне, GUI не ждёт записи на диск
+        end_time = datetime.now()
+        ended_at = end_time.strftime('%Y-%m-%dT%H:%M:%S.') + f'{end_time.microsecond:06d}Z'
+        if self.record_writer is not None:
+            self.record_writer.finish({'ended_at': ended_at, 'sampling': sampling})
+            self.finishing_record_writer = self.record_writer
+            self.record_writer = None
+        if self.journal is not None:
             video_id = get_video_id(self.video_file_path)
-            self._send_data_via_websocket(self.record_data, video_id)
+            # Задание отправки пишется до сборки отчёта: закрытие приложения его не теряет
+            job_id = self._queue_report_upload(self.journal, video_id, uploader)
+            self.journal.finish(
+                {'ended_at': ended_at, 'sampling': sampling},
+                lambda path, count, error, vid=video_id, job=job_id:
+                    self._on_journal_finished(job, path, count, vid, error)
+            )
+            self.finishing_journal = self.journal
+            self.journal = None
+            self.recorder = None
+            self.output_path_label.setText("Сохранение отчёта...")
+            self.output_path_label.setStyleSheet("color: #8b949e; font-size: 12px;")
         
         self.record_status.setText("Готово")
         self.record_status.setStyleSheet("color: #3fb950; font-weight: 600;")
         self.start_record_btn.setEnabled(True)
         self.stop_record_btn.setEnabled(False)
     
-    def _send_data_via_websocket(self, data, video_id="12345"):
-        """Отправка данных по WebSocket в отдельном потоке"""
-        if websocket is None:
-            print("Библиотека websocket-client не установлена. Установите: pip install websocket-client")
+    def on_report_saved(self, path, count, video_id, error):
+        if error:
+            self.output_path_label.setText(f"Ошибка сохранения: {error}")
+            self.output_path_label.setStyleSheet("color: #f85149; font-size: 12px;")
+            return
+        if not path:
+            self.output_path_label.setText("Отчёты сохраняются в: reports/")
+            self.output_path_label.setStyleSheet("color: #8b949e; font-size: 12px;")
             return
         
-        def send_in_thread():
-            try:
-                # Используем video_id в URL
-                ws_url = f"ws://10.128.7.6:8099/influxdbpoints/ws/login/{video_id}"
-                ws = websocket.create_connection(ws_url)
-                
-                # Отправляем данные как JSON массив
-                json_data = json.dumps(data, ensure_ascii=False)
-                ws.send(json_data)
-                
-                # Получаем ответ
+        self.output_path_label.setText(f"Сохранено: {os.path.basename(path)}")
+        self.output_path_label.setStyleSheet("color: #3fb950; font-size: 12px;")
+    
+    def _on_journal_finished(self, job_id, path, count, video_id, error):
+        """Отчёт собран (из потока журнала)"""
+        if job_id and not path and not error:
+            self.outbox.cancel(job_id)  # Пустая запись — отправлять нечего
+        self.report_saved.emit(path or "", count, video_id, error)
+    
+    def _recover_reports(self):
+        """Восстановить отчёты из журналов и сразу поставить их в очередь отправки (в фоне)"""
+        recovered = recover_journals(self.reports_dir)
+        if websocket is not None:
+            for path, _ in recovered:
                 try:
-                    response = ws.recv()
-                    print(f"WebSocket ответ: {response}")
-                except:
-                    pass
-                
-                ws.close()
-                print("Данные успешно отправлены по WebSocket")
-            except Exception as e:
-                print(f"Ошибка отправки данных по WebSocket: {e}")
+                    self.outbox.add(path)  # video_id — из заголовка отчёта
+                except OSError as e:
+                    print(f"Ошибка добавления в очередь отправки: {e}")
+        self.reports_recovered.emit(recovered)
+    
+    def wait_report_saved(self, timeout=10.0):
+        """Дождаться сборки отчёта из журнала (при закрытии приложения)"""
+        if self.finishing_journal is not None:
+            self.finishing_journal.wait(timeout)
+        if self.finishing_record_writer is not None:
+            self.finishing_record_writer.wait(timeout)
+    
+    def on_reports_recovered(self, recovered):
+        if not recovered:
+            return
+        names = ", ".join(os.path.basename(path) for path, _ in recovered)
+        self.output_path_label.setText(f"Восстановлены прерванные записи: {names}")
+        self.output_path_label.setStyleSheet("color: #d29922; font-size: 12px;")
+    
+    def _queue_report_upload(self, journal, video_id, uploader=None):
+        """Записать задание отправки будущего отчёта журнала; id задания или None
+        
+        Задание пишется на диск сразу, при остановке записи: если приложение
+        закроется до сборки отчёта или до итога потоковой отправки, очередь
+        отправит отчёт после перезапуска. Пока идёт потоковая отправка (uploader),
+        задание придержано; если сервер подтвердил все записи, оно удаляется.
+        """
+        if websocket is None:
+            print("Библиотека websocket-client не установлена. Установите: pip install websocket-client")
+            return None
+        report_path = journal_report_path(journal.path, journal.compression or 'none')
+        try:
+            job_id = self.outbox.add(report_path, video_id, journal_path=journal.path, hold=uploader is not None)
+        except OSError as e:
+            print(f"Ошибка добавления в очередь отправки: {e}")
+            return None
+        if uploader is None:
+            return job_id
+        
+        def wait_live_upload():
+            if uploader.wait(FINISH_TIMEOUT + 5):
+                print(f"Записи отправлены потоково: {uploader.stats.acked_records} "
+                      f"в {uploader.stats.acked_batches} пакетах")
+                self.outbox.cancel(job_id)
+                return
+            print(f"Потоковая отправка не завершена ({uploader.stats.error}), отчёт отправит очередь")
+            self.outbox.release(job_id)
         
-        # Запускаем отправку в отдельном потоке
-        thread = threading.Thread(target=send_in_thread, daemon=True)
-        thread.start()
+        threading.Thread(target=wait_live_upload, daemon=True).start()
+        return job_id
+    
+    def on_upload_progress(self, job_id, sent, total):
+        percent = sent * 100 // total if total else 0
+        self.upload_status_label.setText(f"Отправка {job_id}: {sent}/{total} ({percent}%)")
+        self.upload_status_label.setStyleSheet("color: #8b949e; font-size: 11px;")
+    
+    def on_upload_finished(self, job_id, success, error):
+        if success:
+            self.upload_status_label.setText(f"Отправлено: {job_id}")
+            self.upload_status_label.setStyleSheet("color: #3fb950; font-size: 11px;")
+        else:
+            self.upload_status_label.setText(f"Ошибка отправки, повтор позже: {error}")
+            self.upload_status_label.setStyleSheet("color: #d29922; font-size: 11px;")
+    
+    def on_upload_queue_changed(self, count):
+        if count:
+            self.upload_status_label.setToolTip(f"В очереди отправки: {count}")
+        else:
+            self.upload_status_label.setToolTip("")
 
 
 class VideoLibraryTab(QWidget):
@@ -3660,6 +3906,8 @@ class MainWindow(QMainWindow):
             self.monitoring_tab.stop_monitoring()
         if self.video_tab.is_recording:
             self.video_tab.stop_recording()
+        self.video_tab.wait_report_saved()
+        self.video_tab.outbox.stop()
         eye_tracker.stop()
         try:
             brain_bit_controller.stop_all()
@@ -0,0 +1,323 @@
+"""
+Хранилище записей сессий в SQLite
+
+Альтернатива отчётам JSON: записи всех сессий лежат в одной базе
+(reports/records.sqlite) с индексами по сессии и времени, поэтому выборки по
+отрезку времени и по многим сессиям сразу («все зрители видео 42 с 60 по 90
+секунду») отвечаются поиском по индексу, без загрузки отчётов.
+
+Во время записи RecordWriter получает записи семплера и пишет их пакетами из
+своего потока; база открыта в режиме WAL, так что чтение не ждёт записи. Уже
+сохранённые отчёты добавляются командой import.
+
+Пример:
+    python record_store.py import reports/report_20251206_112937.json
+    python record_store.py query --video 42 --from 60 --to 90
+    python record_store.py query --session report_20251206_112937 --from 10 --to 20 --by elapsed_sec
+"""
+import os
+import sys
+import json
+import time
+import queue
+import sqlite3
+import argparse
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from report_storage import load_report, strip_compression
+
+
+STORE_NAME = "records.sqlite"
+BATCH_SIZE = 200  # Записей в одной транзакции
+FLUSH_INTERVAL = 1.0  # Не реже чем раз в столько секунд пакет пишется в базу, сек
+
+# Поля записи со своими столбцами; остальные поля хранятся JSON в столбце extra
+RECORD_COLUMNS = (
+    ('elapsed_sec', 'REAL'), ('video_ms', 'INTEGER'), ('timestamp', 'TEXT'), ('video_frame', 'INTEGER'),
+    ('attention', 'REAL'), ('relaxation', 'REAL'), ('alpha', 'REAL'), ('beta', 'REAL'), ('theta', 'REAL'),
+    ('gaze_x', 'REAL'), ('gaze_y', 'REAL'), ('raw_x', 'REAL'), ('raw_y', 'REAL'),
+    ('gaze_h', 'TEXT'), ('gaze_v', 'TEXT'), ('left_eye', 'BOOL'), ('right_eye', 'BOOL'), ('artifact', 'BOOL'),
+)
+_FIELDS = tuple(name for name, _ in RECORD_COLUMNS)
+_BOOL_FIELDS = frozenset(name for name, kind in RECORD_COLUMNS if kind == 'BOOL')
+_INSERT = (f"INSERT INTO records (session_id, {', '.join(_FIELDS)}, extra) "
+           f"VALUES ({', '.join('?' * (len(_FIELDS) + 2))})")
+TIME_FIELDS = ('elapsed_sec', 'video_ms')
+
+
+def _schema() -> str:
+    columns = ", ".join(f"{name} {'INTEGER' if kind == 'BOOL' else kind}" for name, kind in RECORD_COLUMNS)
+    return f"""
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL,
+            video_id TEXT,
+            created_at TEXT,
+            complete INTEGER NOT NULL DEFAULT 0,
+            meta TEXT
+        );
+        CREATE INDEX IF NOT EXISTS sessions_video_id ON sessions (video_id);
+        CREATE TABLE IF NOT EXISTS records (session_id INTEGER NOT NULL, {columns}, extra TEXT);
+        CREATE INDEX IF NOT EXISTS records_session_elapsed ON records (session_id, elapsed_sec);
+        CREATE INDEX IF NOT EXISTS records_session_video ON records (session_id, video_ms);
+    """
+
+
+def _row(session_id: int, record: dict) -> tuple:
+    extra = {key: value for key, value in record.items() if key not in _FIELDS}
+    return (session_id, *(record.get(name) for name in _FIELDS),
+            json.dumps(extra, ensure_ascii=False) if extra else None)
+
+
+def _record(row: tuple) -> dict:
+    """Строка records (без session_id) → запись в формате отчёта"""
+    record = {}
+    for name, value in zip(_FIELDS, row):
+        record[name] = bool(value) if name in _BOOL_FIELDS and value is not None else value
+    if row[-1]:
+        record.update(json.loads(row[-1]))
+    return record
+
+
+class RecordStore:
+    """База записей сессий
+
+    Каждый вызов открывает своё соединение: запросы можно делать из любого
+    потока, пока RecordWriter пишет из своего.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        db = sqlite3.connect(self.db_path, timeout=10)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")  # В WAL база не портится при сбое, теряется хвост
+        db.executescript(_schema())
+        return db
+
+    def open_session(self, db: sqlite3.Connection, name: str, meta: dict) -> int:
+        """id сессии; записи прежней сессии с тем же именем удаляются"""
+        with db:
+            row = db.execute("SELECT id FROM sessions WHERE name = ?", (name,)).fetchone()
+            if row is not None:
+                db.execute("DELETE FROM records WHERE session_id = ?", (row[0],))
+                db.execute("DELETE FROM sessions WHERE id = ?", (row[0],))
+            video_id = meta.get('video_id')
+            cursor = db.execute(
+                "INSERT INTO sessions (name, video_id, created_at, meta) VALUES (?, ?, ?, ?)",
+                (name, str(video_id) if video_id is not None else None, meta.get('created_at'),
+                 json.dumps(meta, ensure_ascii=False)))
+        return cursor.lastrowid
+
+    def close_session(self, db: sqlite3.Connection, session_id: int, meta_updates: Optional[dict] = None):
+        with db:
+            if meta_updates:
+                meta = json.loads(db.execute("SELECT meta FROM sessions WHERE id = ?",
+                                             (session_id,)).fetchone()[0] or '{}')
+                meta.update(meta_updates)
+                db.execute("UPDATE sessions SET meta = ? WHERE id = ?",
+                           (json.dumps(meta, ensure_ascii=False), session_id))
+            db.execute("UPDATE sessions SET complete = 1 WHERE id = ?", (session_id,))
+
+    def import_report(self, path: str) -> Tuple[str, int]:
+        """Добавить отчёт JSON (имя сессии — имя файла без расширений); (имя, записей)"""
+        report = load_report(path)
+        records = report.pop('records', [])
+        report.pop('streams', None)
+        name = os.path.basename(strip_compression(path)).split('.')[0]
+        db = self.connect()
+        try:
+            session_id = self.open_session(db, name, report)
+            with db:
+                db.executemany(_INSERT, (_row(session_id, record) for record in records))
+            self.close_session(db, session_id)
+        finally:
+            db.close()
+        return name, len(records)
+
+    def sessions(self, video_id=None) -> List[dict]:
+        """Сессии базы: имя, видео, время создания, число записей, завершена ли"""
+        query = ("SELECT name, video_id, created_at, complete, "
+                 "(SELECT COUNT(*) FROM records WHERE session_id = sessions.id) FROM sessions")
+        params = ()
+        if video_id is not None:
+            query += " WHERE video_id = ?"
+            params = (str(video_id),)
+        db = self.connect()
+        try:
+            return [{'name': name, 'video_id': vid, 'created_at': created, 'complete': bool(complete),
+                     'records': count}
+                    for name, vid, created, complete, count in db.execute(query + " ORDER BY created_at", params)]
+        finally:
+            db.close()
+
+    def records(self, session: str, start: Optional[float] = None, end: Optional[float] = None,
+                by: str = 'elapsed_sec') -> List[dict]:
+        """Записи сессии с by в [start, end] (границы включительно)"""
+        return self.query(start, end, by, session=session).get(session, [])
+
+    def video_range(self, video_id, start_sec: float, end_sec: float) -> Dict[str, List[dict]]:
+        """Записи всех сессий видео с позицией видео от start_sec до end_sec"""
+        return self.query(start_sec * 1000, end_sec * 1000, 'video_ms', video_id=video_id)
+
+    def query(self, start: Optional[float] = None, end: Optional[float] = None, by: str = 'elapsed_sec',
+              session: Optional[str] = None, video_id=None) -> Dict[str, List[dict]]:
+        """Записи по отрезку поля by, сгруппированные по имени сессии
+
+        Отбор сессий (session / video_id) и отрезок по by идут по индексам
+        (session_id, elapsed_sec) и (session_id, video_ms).
+        """
+        if by not in TIME_FIELDS:
+            raise ValueError(f"Поле времени должно быть одним из {TIME_FIELDS}")
+        conditions, params = [], []
+        if session is not None:
+            conditions.append("s.name = ?")
+            params.append(session)
+        if video_id is not None:
+            conditions.append("s.video_id = ?")
+            params.append(str(video_id))
+        if start is not None:
+            conditions.append(f"r.{by} >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append(f"r.{by} <= ?")
+            params.append(end)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = (f"SELECT s.name, {', '.join('r.' + name for name in _FIELDS)}, r.extra "
+               f"FROM sessions s JOIN records r ON r.session_id = s.id{where} ORDER BY s.name, r.{by}")
+        result: Dict[str, List[dict]] = {}
+        db = self.connect()
+        try:
+            for row in db.execute(sql, params):
+                result.setdefault(row[0], []).append(_record(row[1:]))
+        finally:
+            db.close()
+        return result
+
+
+class RecordWriter:
+    """Запись сессии в базу из отдельного потока
+
+    append() не блокирует: записи копятся в очереди и вставляются пакетами по
+    BATCH_SIZE, но не реже раза в FLUSH_INTERVAL секунд. Интерфейс повторяет
+    ReportJournal: append / finish / wait.
+    """
+
+    _STOP = object()
+
+    def __init__(self, store: RecordStore, session: str, meta: dict):
+        self.store = store
+        self.session = session
+        self.meta = meta
+        self.count = 0
+        self.error = ""
+        self._queue = queue.Queue()
+        self._finish = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def append(self, record: dict):
+        self._queue.put(record)
+
+    def finish(self, meta_updates: Optional[dict] = None,
+               on_done: Optional[Callable[[int, str], None]] = None):
+        """Дописать оставшиеся записи и отметить сессию завершённой
+
+        on_done(число записей, текст ошибки) вызывается из потока записи.
+        """
+        self._finish = (meta_updates, on_done)
+        self._queue.put(self._STOP)
+
+    def wait(self, timeout: Optional[float] = None):
+        self._thread.join(timeout)
+
+    def _run(self):
+        db = None
+        stopping = False
+        try:
+            db = self.store.connect()
+            session_id = self.store.open_session(db, self.session, self.meta)
+            while not stopping:
+                batch = []
+                deadline = time.monotonic() + FLUSH_INTERVAL
+                while len(batch) < BATCH_SIZE:
+                    try:
+                        item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        break
+                    if item is self._STOP:
+                        stopping = True
+                        break
+                    batch.append(_row(session_id, item))
+                if batch:
+                    with db:
+                        db.executemany(_INSERT, batch)
+                    self.count += len(batch)
+            meta_updates = self._finish[0] if self._finish else None
+            self.store.close_session(db, session_id, meta_updates)
+        except Exception as e:
+            self.error = str(e)
+            print(f"Ошибка записи сессии в базу: {e}")
+        finally:
+            if db is not None:
+                db.close()
+        on_done = self._finish[1] if self._finish else None
+        if on_done is not None:
+            on_done(self.count, self.error)
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Хранилище записей сессий в SQLite")
+    parser.add_argument('--db', default=os.path.join("reports", STORE_NAME), help="Файл базы")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    imp = commands.add_parser('import', help="Добавить отчёты JSON в базу")
+    imp.add_argument('reports', nargs='+', help="Файлы отчётов")
+
+    sessions = commands.add_parser('sessions', help="Список сессий")
+    sessions.add_argument('--video', help="Только сессии видео")
+
+    query = commands.add_parser('query', help="Записи по отрезку времени")
+    query.add_argument('--video', help="Все сессии видео")
+    query.add_argument('--session', help="Одна сессия")
+    query.add_argument('--from', dest='start', type=float, help="Начало отрезка, сек")
+    query.add_argument('--to', dest='end', type=float, help="Конец отрезка, сек")
+    query.add_argument('--by', default='video_ms', choices=TIME_FIELDS,
+                       help="Время видео (video_ms) или от начала записи (elapsed_sec)")
+    query.add_argument('--json', action='store_true', help="Вывести записи в JSON")
+    args = parser.parse_args(argv)
+
+    store = RecordStore(args.db)
+    if args.command == 'import':
+        for path in args.reports:
+            started = time.perf_counter()
+            name, count = store.import_report(path)
+            print(f"{name}: {count} записей за {(time.perf_counter() - started) * 1000:.0f} мс")
+    elif args.command == 'sessions':
+        for s in store.sessions(args.video):
+            state = "" if s['complete'] else "  (не завершена)"
+            print(f"{s['name']:<32}{s['video_id'] or '—':<10}{s['records']:>8} записей{state}")
+    else:
+        # Секунды переводятся в единицы поля: video_ms хранится в миллисекундах
+        scale = 1000 if args.by == 'video_ms' else 1
+        start = args.start * scale if args.start is not None else None
+        end = args.end * scale if args.end is not None else None
+        started = time.perf_counter()
+        result = store.query(start, end, args.by, session=args.session, video_id=args.video)
+        elapsed = (time.perf_counter() - started) * 1000
+        if args.json:
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+            return 0
+        for name, records in result.items():
+            attention = [r['attention'] for r in records if r['attention'] is not None]
+            mean = sum(attention) / len(attention) if attention else 0.0
+            print(f"{name:<32}{len(records):>8} записей, внимание в среднем {mean:.1f}%")
+        print(f"Сессий: {len(result)}, записей: {sum(map(len, result.values()))} за {elapsed:.1f} мс")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
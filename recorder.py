@@ -0,0 +1,302 @@
+"""
+Событийная запись нескольких потоков данных
+
+Каждый источник (метрики мозга, спектр, артефакты, взгляд, позиция видео)
+записывается в свой поток в момент прихода события, со своей меткой времени.
+Равномерные записи (как раньше, 10 раз в секунду) строятся только при экспорте:
+для каждого потока берётся последнее значение на момент записи, позиция видео
+во время воспроизведения интерполируется. Если известны показанные кадры видео
+(поток frame: номер кадра и его метка времени из QVideoSink), позиция видео
+берётся по последнему показанному кадру — с точностью до кадра.
+
+Во время записи такие же записи в реальном времени выдаёт RecordSampler — из
+своего потока, по монотонным часам и на той же сетке, что и при экспорте, так что
+задержки GUI не сдвигают время записей.
+"""
+import time
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+
+DEFAULT_RATE = 10.0  # Частота равномерных записей при экспорте, Гц
+GAZE_STALE_SEC = 0.5  # Взгляд старше этого считается потерянным
+SPIN_SEC = 0.002  # Последние миллисекунды до срока семплер ждёт активно (точность sleep)
+LATENESS_BIN_SEC = 1e-5  # Ширина корзины гистограммы опозданий семплера
+
+# Поля потоков и значения до первого события
+STREAMS = {
+    'mind': {'attention': 0, 'relaxation': 0},
+    'spectral': {'alpha': 0, 'beta': 0, 'theta': 0},
+    'artifact': {'artifact': False},
+    'gaze': {'gaze_x': 0, 'gaze_y': 0, 'raw_x': None, 'raw_y': None, 'gaze_h': '', 'gaze_v': '',
+             'left_eye': False, 'right_eye': False},
+    'video': {'video_ms': 0, 'playing': False},
+    'frame': {'video_frame': None, 'frame_ms': None},
+}
+
+
+def format_timestamp(ts: datetime) -> str:
+    return ts.strftime('%Y-%m-%dT%H:%M:%S.') + f'{ts.microsecond:06d}Z'
+
+
+class EventRecorder:
+    """Запись событий по потокам с метками монотонного времени
+
+    Событие передаётся в sink как {'stream', 't', ...значения}, где t — секунды
+    от начала записи. sink — обычно ReportJournal.append.
+
+    record() вызывается из разных потоков (GUI, поток кадров видео), snapshot() —
+    из потока семплера; состояние и вызов sink защищены блокировкой, так что
+    события каждого потока попадают в журнал в порядке записи.
+    """
+
+    def __init__(self, sink: Callable[[dict], None], started_at: Optional[datetime] = None):
+        self._sink = sink
+        self.started = time.monotonic()
+        self.started_at = started_at
+        self.counts: Dict[str, int] = {name: 0 for name in STREAMS}
+        self.latest: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def event_count(self) -> int:
+        with self._lock:
+            return sum(self.counts.values())
+
+    def record(self, stream: str, values: dict, timestamp: Optional[float] = None):
+        """Записать событие; timestamp — time.monotonic() события (по умолчанию — сейчас)"""
+        t = (time.monotonic() if timestamp is None else timestamp) - self.started
+        event = {'stream': stream, 't': round(max(t, 0.0), 4)}
+        event.update(values)
+        with self._lock:
+            self.counts[stream] += 1
+            self.latest[stream] = event
+            self._sink(event)
+
+    def snapshot(self, t: float) -> dict:
+        """Равномерная запись на момент t (секунды от начала) по последним событиям"""
+        with self._lock:
+            latest = dict(self.latest)
+        values = {}
+        for name in ('mind', 'spectral', 'artifact', 'gaze', 'frame'):
+            event = latest.get(name)
+            if event is None or (name == 'gaze' and t - event['t'] > GAZE_STALE_SEC):
+                values.update(STREAMS[name])
+            else:
+                values.update({field: event.get(field, default) for field, default in STREAMS[name].items()})
+
+        video = latest.get('video')
+        video_ms = 0
+        if video is not None:
+            video_ms = video['video_ms']
+            if video['playing']:
+                video_ms += max(t - video['t'], 0.0) * 1000
+        return _make_record(t, values, int(round(video_ms)), self.started_at)
+
+
+def group_events(events) -> Dict[str, Dict[str, list]]:
+    """События из журнала в столбцы по потокам: {поток: {'t': [...], поле: [...]}}"""
+    streams = {name: {'t': [], **{field: [] for field in fields}} for name, fields in STREAMS.items()}
+    for event in events:
+        columns = streams.get(event.get('stream'))
+        if columns is None:
+            continue
+        for field, values in columns.items():
+            values.append(event.get(field, STREAMS[event['stream']].get(field)))
+    return streams
+
+
+class _StreamCursor:
+    """Последнее событие потока не позже момента сетки и следующее за ним
+
+    События читаются из итератора по одному, по мере продвижения сетки.
+    """
+
+    def __init__(self, events: Iterable[dict]):
+        self._events = iter(events)
+        self.current: Optional[dict] = None
+        self.next: Optional[dict] = next(self._events, None)
+
+    def advance(self, t: float) -> Optional[dict]:
+        while self.next is not None and self.next['t'] <= t:
+            self.current = self.next
+            self.next = next(self._events, None)
+        return self.current
+
+
+def merge_events(events: Dict[str, Iterable[dict]], last_t: Optional[float],
+                 started_at: Optional[datetime] = None, rate: float = DEFAULT_RATE) -> Iterator[dict]:
+    """Равномерные записи из событий потоков, по одной
+
+    events — {поток: события в порядке времени}, last_t — время последнего события
+    (сетка идёт до него). Потоки читаются параллельно одним проходом, как при
+    слиянии отсортированных файлов, поэтому в памяти только текущие события.
+    """
+    if last_t is None:
+        return
+    cursors = {name: _StreamCursor(events.get(name, ())) for name in STREAMS}
+    for k in range(1, int(last_t * rate) + 1):
+        t = k / rate
+        values = {}
+        for name in ('mind', 'spectral', 'artifact', 'gaze', 'frame'):
+            event = cursors[name].advance(t)
+            fields = STREAMS[name]
+            if event is None or (name == 'gaze' and t - event['t'] > GAZE_STALE_SEC):
+                values.update(fields)
+            else:
+                values.update({field: event.get(field, default) for field, default in fields.items()})
+
+        # Позиция видео: во время воспроизведения — интерполяция между событиями
+        cursor = cursors['video']
+        video = cursor.advance(t)
+        video_ms = 0.0
+        if video is not None:
+            video_ms = float(video.get('video_ms', 0))
+            if video.get('playing', False):
+                video_ms += (t - video['t']) * 1000
+                # Не обгонять следующее событие (пауза, перемотка назад)
+                following = cursor.next
+                if following is not None and following.get('video_ms', 0) >= video.get('video_ms', 0):
+                    video_ms = min(video_ms, float(following.get('video_ms', 0)))
+        yield _make_record(t, values, int(round(video_ms)), started_at)
+
+
+def _column_events(columns: Dict[str, list]) -> Iterator[dict]:
+    names = list(columns)
+    for row in zip(*columns.values()):
+        yield dict(zip(names, row))
+
+
+def merge_streams(streams: Dict[str, Dict[str, list]], started_at: Optional[datetime] = None,
+                  rate: float = DEFAULT_RATE) -> List[dict]:
+    """Равномерные записи из потоков событий в столбцах (результат group_events)"""
+    last_t = max((columns['t'][-1] for columns in streams.values() if columns['t']), default=None)
+    events = {name: _column_events(columns) for name, columns in streams.items()}
+    return list(merge_events(events, last_t, started_at, rate))
+
+
+def _make_record(t: float, values: dict, video_ms: int, started_at: Optional[datetime]) -> dict:
+    """Запись отчёта в прежнем формате из значений потоков на момент t"""
+    if values['frame_ms'] is not None:
+        video_ms = int(round(values['frame_ms']))
+    record = {}
+    if started_at is not None:
+        record['timestamp'] = format_timestamp(started_at + timedelta(seconds=t))
+    record.update({
+        'elapsed_sec': round(t, 2),
+        'video_ms': video_ms,
+        'video_frame': values['video_frame'],
+        'attention': values['attention'],
+        'relaxation': values['relaxation'],
+        'audio_level': 0.0,
+        'alpha': values['alpha'],
+        'beta': values['beta'],
+        'theta': values['theta'],
+        'gaze_x': values['gaze_x'],
+        'gaze_y': values['gaze_y'],
+        'raw_x': values['raw_x'],
+        'raw_y': values['raw_y'],
+        'gaze_h': values['gaze_h'],
+        'gaze_v': values['gaze_v'],
+        'left_eye': values['left_eye'],
+        'right_eye': values['right_eye'],
+        'artifact': values['artifact']
+    })
+    return record
+
+
+class RecordSampler:
+    """Равномерные записи в реальном времени из отдельного потока
+
+    Срок k-й записи — recorder.started + k / rate по монотонным часам, поэтому
+    ошибка не накапливается: опоздание одной записи не сдвигает следующие. Если
+    поток опоздал больше чем на период (система под нагрузкой), пропущенные
+    записи не догоняются, а учитываются в статистике. Сетка совпадает с сеткой
+    merge_streams, и живые записи соответствуют записям итогового отчёта.
+
+    Опоздания копятся в гистограмме фиксированного размера (опоздание меньше
+    периода, корзины по LATENESS_BIN_SEC), а не списком: память не растёт с
+    длиной записи, процентили точны до ширины корзины.
+
+    Слушатели вызываются из потока семплера.
+    """
+
+    def __init__(self, recorder: EventRecorder, rate: float = DEFAULT_RATE):
+        self.recorder = recorder
+        self.rate = rate
+        self.ticks = 0
+        self.missed = 0
+        self._lateness = np.zeros(int(np.ceil(1.0 / rate / LATENESS_BIN_SEC)) + 1, dtype=np.int64)
+        self._lateness_sum = 0.0
+        self._lateness_max = 0.0
+        self._listeners: List[Callable[[dict], None]] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        self._listeners.append(listener)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def stats(self) -> dict:
+        """Статистика точности: опоздание записей относительно срока, мс"""
+        cumulative = np.cumsum(self._lateness)
+        count = int(cumulative[-1])
+        stats = {'rate': self.rate, 'ticks': self.ticks, 'missed': self.missed}
+        if count:
+            def percentile(q):
+                # Середина корзины, в которую попадает q-я доля опозданий
+                index = int(np.searchsorted(cumulative, q / 100 * count))
+                return min((index + 0.5) * LATENESS_BIN_SEC, self._lateness_max) * 1000
+
+            stats['lateness_ms'] = {
+                'mean': round(self._lateness_sum / count * 1000, 3),
+                'p50': round(percentile(50), 3),
+                'p95': round(percentile(95), 3),
+                'p99': round(percentile(99), 3),
+                'max': round(self._lateness_max * 1000, 3),
+            }
+        return stats
+
+    def _add_lateness(self, late: float):
+        self._lateness[min(int(late / LATENESS_BIN_SEC), len(self._lateness) - 1)] += 1
+        self._lateness_sum += late
+        self._lateness_max = max(self._lateness_max, late)
+
+    def _wait_until(self, deadline: float) -> bool:
+        """Дождаться срока; False — семплер остановлен"""
+        remaining = deadline - time.monotonic()
+        if remaining > SPIN_SEC and self._stop.wait(remaining - SPIN_SEC):
+            return False
+        while time.monotonic() < deadline:
+            time.sleep(0)
+        return not self._stop.is_set()
+
+    def _run(self):
+        period = 1.0 / self.rate
+        k = 1
+        while self._wait_until(self.recorder.started + k * period):
+            late = time.monotonic() - (self.recorder.started + k * period)
+            if late >= period:
+                skipped = int(late // period)
+                self.missed += skipped
+                k += skipped
+                late -= skipped * period
+            self._add_lateness(late)
+            self.ticks += 1
+            record = self.recorder.snapshot(k * period)
+            for listener in self._listeners:
+                try:
+                    listener(record)
+                except Exception as e:
+                    print(f"Ошибка обработки записи семплера: {e}")
+            k += 1
@@ -0,0 +1,768 @@
+"""
+Работа с файлами отчётов записи
+
+Во время записи данные пишутся в журнал (JSON Lines) из отдельного потока и
+периодически сбрасываются на диск; по окончании журнал превращается в отчёт.
+Журнал, оставшийся после аварийного завершения, восстанавливается при следующем
+запуске.
+
+Сжатие: отчёты и журналы можно хранить сжатыми (.gz, .xz, .zst — последнее при
+установленном пакете zstandard); тип определяется по расширению, чтение прозрачно.
+Журнал сжимается потоково: при каждом сбросе на диск поток сжатия тоже сбрасывается
+(Z_SYNC_FLUSH / блок zstd), поэтому после сбоя читается всё записанное до этого.
+
+Сессия (Session) — отчёт в столбцах: по одному типизированному массиву NumPy на
+поле записи. В формате .npz массивы лежат как есть (с необязательным сжатием),
+а заголовок отчёта — небольшим JSON, поэтому загрузка сводится к чтению массивов.
+
+Перекалибровка: отчёт хранит сырой взгляд (raw_x/raw_y) и матрицу калибровки,
+поэтому исправленную калибровку можно применить ко всей сессии без перезаписи —
+одной матричной операцией NumPy.
+
+Пример:
+    python report_storage.py recalibrate reports/report_20251206_112937.json --calibration new.json
+    python report_storage.py convert reports/report_20251206_112937.json
+    python report_storage.py compress reports/report_20251206_112937.json --compression xz
+    python report_storage.py benchmark reports/report_20251206_112937.json
+"""
+import os
+import sys
+import io
+import glob
+import gzip
+import json
+import lzma
+import time
+import queue
+import argparse
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from recorder import DEFAULT_RATE, STREAMS, format_timestamp, merge_events
+from eye_tracker import (apply_calibration_array, gaze_directions_array,
+                         calibration_from_json, calibration_to_json)
+
+
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'xz': '.xz', 'zstd': '.zst'}
+DEFAULT_COMPRESSION = 'zstd' if zstandard is not None else 'gzip'
+# Сжатие, поток которого можно сбросить на диск посреди записи (для журнала)
+STREAMING_COMPRESSIONS = ('gzip', 'zstd')
+
+# Ошибки чтения сжатого потока, оборванного при сбое
+_TRUNCATED_ERRORS = (EOFError, OSError, lzma.LZMAError) + ((zstandard.ZstdError,) if zstandard else ())
+
+
+def available_compressions() -> List[str]:
+    return [name for name in COMPRESSION_SUFFIXES if name != 'zstd' or zstandard is not None]
+
+
+def compression_of(path: str) -> Optional[str]:
+    """Тип сжатия по расширению файла (None — без сжатия)"""
+    for name, suffix in COMPRESSION_SUFFIXES.items():
+        if path.endswith(suffix):
+            return name
+    return None
+
+
+def strip_compression(path: str) -> str:
+    compression = compression_of(path)
+    return path[:-len(COMPRESSION_SUFFIXES[compression])] if compression else path
+
+
+def open_text(path: str, mode: str = 'r'):
+    """Открыть текстовый файл отчёта или журнала; сжатие — по расширению"""
+    compression = compression_of(path)
+    if compression == 'gzip':
+        return gzip.open(path, mode + 't', encoding='utf-8', compresslevel=6)
+    if compression == 'xz':
+        return lzma.open(path, mode + 't', encoding='utf-8')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Для файлов .zst нужен пакет zstandard")
+        return zstandard.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def load_report(path: str) -> dict:
+    with open_text(path) as f:
+        return json.load(f)
+
+
+def save_report(report: dict, path: str):
+    with open_text(path, 'w') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+SESSION_SUFFIX = ".npz"
+META_KEY = "__meta__"
+STREAM_PREFIX = "streams/"
+
+
+def _to_column(values: list) -> np.ndarray:
+    """Типизированный массив из значений поля (None в числах — NaN)"""
+    sample = next((v for v in values if v is not None), None)
+    if isinstance(sample, bool):
+        return np.array([bool(v) for v in values], dtype=bool)
+    if isinstance(sample, (int, float)) or sample is None:
+        if sample is not None and all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+            return np.array(values, dtype=np.int64)
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    return np.array(['' if v is None else str(v) for v in values])
+
+
+def _timestamps_to_column(values: list) -> np.ndarray:
+    return np.array([v.rstrip('Z') if v else 'NaT' for v in values], dtype='datetime64[us]')
+
+
+class Session:
+    """Записи сессии в столбцах: {поле: массив} плюс заголовок отчёта (meta)"""
+
+    def __init__(self, meta: dict, columns: Dict[str, np.ndarray],
+                 streams: Optional[Dict[str, Dict[str, np.ndarray]]] = None):
+        self.meta = meta
+        self.columns = columns
+        self.streams = streams or {}
+
+    @classmethod
+    def from_report(cls, report: dict) -> 'Session':
+        records = report.get('records', [])
+        # Поля всех записей в порядке появления: новое поле может появиться в любой записи
+        fields = dict.fromkeys(key for record in records for key in record)
+        columns = {}
+        for field in fields:
+            values = [record.get(field) for record in records]
+            columns[field] = _timestamps_to_column(values) if field == 'timestamp' else _to_column(values)
+        streams = {name: {field: _to_column(values) for field, values in stream.items()}
+                   for name, stream in report.get('streams', {}).items()}
+        meta = {key: value for key, value in report.items() if key not in ('records', 'streams')}
+        return cls(meta, columns, streams)
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def column(self, field: str, default: float = 0.0) -> np.ndarray:
+        """Числовой столбец как float64 (отсутствующие значения — default)"""
+        values = self.columns.get(field)
+        if values is None or values.dtype.kind not in 'biuf':
+            return np.full(len(self), default, dtype=np.float64)
+        values = values.astype(np.float64)
+        values[np.isnan(values)] = default
+        return values
+
+    def record(self, index: int) -> dict:
+        """Одна запись в виде словаря, как в JSON-отчёте"""
+        record = {}
+        for field, values in self.columns.items():
+            value = values[index]
+            if values.dtype.kind == 'M':
+                value = np.datetime_as_string(value, unit='us') + 'Z' if not np.isnat(value) else None
+            elif values.dtype.kind == 'f':
+                value = None if np.isnan(value) else float(value)
+            else:
+                value = value.item()
+            record[field] = value
+        return record
+
+    def records(self) -> List[dict]:
+        return [self.record(i) for i in range(len(self))]
+
+    def to_report(self) -> dict:
+        report = dict(self.meta)
+        report['total_records'] = len(self)
+        report['records'] = self.records()
+        if self.streams:
+            report['streams'] = {name: {field: values.tolist() for field, values in stream.items()}
+                                 for name, stream in self.streams.items()}
+        return report
+
+
+class TimeIndex:
+    """Поиск записи по времени (например, позиции видео) за O(log n)
+
+    Строится один раз при загрузке: номера записей, упорядоченные по времени, и
+    сами времена по порядку. Время не обязано возрастать по записям: video_ms
+    стоит на месте при паузе и идёт назад при перемотке. Среди записей с равным
+    временем раньше идёт более ранняя.
+    """
+
+    def __init__(self, times: np.ndarray):
+        times = np.asarray(times, dtype=np.float64)
+        self.order = np.argsort(times, kind='stable')
+        self.sorted = times[self.order]
+
+    def __len__(self) -> int:
+        return len(self.sorted)
+
+    def nearest(self, t: float) -> int:
+        """Номер записи с ближайшим временем"""
+        i = int(np.searchsorted(self.sorted, t))
+        if i == 0:
+            return int(self.order[0])
+        # Предыдущее время — первая из записей с ним (как у argmin по расстоянию)
+        before = int(np.searchsorted(self.sorted, self.sorted[i - 1]))
+        if i == len(self.sorted):
+            return int(self.order[before])
+        left, right = t - self.sorted[i - 1], self.sorted[i] - t
+        if left == right:
+            return int(min(self.order[before], self.order[i]))
+        return int(self.order[before] if left < right else self.order[i])
+
+    def bracket(self, t: float) -> Tuple[int, int, float]:
+        """Записи до и после t и доля пути между ними (0 — первая)
+
+        Если соседи по времени — не соседние записи (между ними перемотка),
+        доля 0: значения между разными просмотрами не смешиваются.
+        """
+        i = int(np.searchsorted(self.sorted, t, side='right'))
+        if i == 0:
+            first = int(self.order[0])
+            return first, first, 0.0
+        if i == len(self.sorted):
+            last = int(self.order[-1])
+            return last, last, 0.0
+        before, after = int(self.order[i - 1]), int(self.order[i])
+        span = self.sorted[i] - self.sorted[i - 1]
+        if abs(after - before) != 1 or span <= 0:
+            return before, after, 0.0
+        return before, after, float((t - self.sorted[i - 1]) / span)
+
+    def interpolate(self, t: float, values: np.ndarray) -> float:
+        """Значение столбца в момент t линейно между соседними записями"""
+        before, after, fraction = self.bracket(t)
+        return float(values[before] + (values[after] - values[before]) * fraction)
+
+
+def save_session(session: Session, path: str, compress: bool = True):
+    """Сохранить сессию в .npz: столбцы, потоки событий и заголовок JSON"""
+    arrays = {META_KEY: np.frombuffer(json.dumps(session.meta, ensure_ascii=False).encode('utf-8'),
+                                      dtype=np.uint8)}
+    arrays.update(session.columns)
+    for name, stream in session.streams.items():
+        for field, values in stream.items():
+            arrays[f"{STREAM_PREFIX}{name}/{field}"] = values
+    with open(path, 'wb') as f:
+        (np.savez_compressed if compress else np.savez)(f, **arrays)
+
+
+def load_session(path: str) -> Session:
+    """Загрузить сессию из .npz или из JSON-отчёта"""
+    if not path.endswith(SESSION_SUFFIX):
+        return Session.from_report(load_report(path))
+
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(data[META_KEY].tobytes().decode('utf-8'))
+        columns, streams = {}, {}
+        for key in data.files:
+            if key == META_KEY:
+                continue
+            if key.startswith(STREAM_PREFIX):
+                name, field = key[len(STREAM_PREFIX):].split('/', 1)
+                streams.setdefault(name, {})[field] = data[key]
+            else:
+                columns[key] = data[key]
+    return Session(meta, columns, streams)
+
+
+def convert_report(json_path: str, output: Optional[str] = None, compress: bool = True) -> str:
+    """Сконвертировать JSON-отчёт в .npz рядом с ним"""
+    output = output or os.path.splitext(json_path)[0] + SESSION_SUFFIX
+    save_session(Session.from_report(load_report(json_path)), output, compress)
+    return output
+
+
+def _compressed_text(raw, compression: Optional[str]):
+    """Текстовый поток поверх открытого на запись файла с потоковым сжатием
+
+    Закрытие потока завершает сжатие, но не закрывает сам файл.
+    """
+    if compression == 'gzip':
+        stream = gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6)
+    elif compression == 'xz':
+        stream = lzma.LZMAFile(raw, 'wb', preset=6)
+    elif compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Для сжатия zstd нужен пакет zstandard")
+        stream = zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=False)
+    else:
+        stream = _Unclosed(raw)
+    return io.TextIOWrapper(stream, encoding='utf-8', write_through=True)
+
+
+class _Unclosed(io.RawIOBase):
+    """Обёртка файла без сжатия, которая при закрытии не закрывает сам файл"""
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self._raw.write(data)
+
+    def flush(self):
+        self._raw.flush()
+
+
+JOURNAL_SUFFIX = ".journal"
+FSYNC_INTERVAL = 1.0  # Как часто журнал сбрасывается на диск, сек
+
+
+def _journal_lines(journal_path: str):
+    """Строки журнала как объекты; оборванная при сбое последняя строка пропускается"""
+    with open_text(journal_path) as f:
+        try:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+        except _TRUNCATED_ERRORS + (UnicodeDecodeError,):
+            # Сжатый поток оборван: всё до последнего сброса на диск уже прочитано
+            return
+
+
+def _started_utc(header: dict) -> Optional[datetime]:
+    started = header.get('started_utc')
+    return datetime.fromisoformat(started.rstrip('Z')) if started else None
+
+
+COLUMN_CHUNK = 1024  # Событий потока в одной строке временного файла столбца
+
+
+def _stream_columns(name: str) -> Tuple[str, ...]:
+    return ('t',) + tuple(STREAMS[name])
+
+
+def _column_path(tmp_dir: str, name: str, field: str) -> str:
+    return os.path.join(tmp_dir, f"{name}.{field}.jsonl")
+
+
+def _split_events(events, tmp_dir: str) -> Dict[str, float]:
+    """Разложить события журнала по файлам столбцов потоков; {поток: время последнего события}
+
+    Строка файла столбца — значения COLUMN_CHUNK событий через запятую (JSON без
+    скобок), так что сериализуется сразу пачка, а в памяти — только она.
+    """
+    files: Dict[str, list] = {}
+    chunks: Dict[str, list] = {}
+    last_t: Dict[str, float] = {}
+
+    def flush(name):
+        for f, values in zip(files[name], chunks[name]):
+            f.write(json.dumps(values, ensure_ascii=False)[1:-1] + '\n')
+            values.clear()
+
+    try:
+        for event in events:
+            name = event.get('stream')
+            fields = STREAMS.get(name)
+            if fields is None:
+                continue
+            if name not in files:
+                files[name] = [open(_column_path(tmp_dir, name, field), 'w', encoding='utf-8')
+                               for field in _stream_columns(name)]
+                chunks[name] = [[] for _ in files[name]]
+            for values, field in zip(chunks[name], _stream_columns(name)):
+                values.append(event.get(field, fields.get(field)))
+            last_t[name] = event['t']
+            if len(chunks[name][0]) >= COLUMN_CHUNK:
+                flush(name)
+        for name in files:
+            if chunks[name][0]:
+                flush(name)
+    finally:
+        for stream_files in files.values():
+            for f in stream_files:
+                f.close()
+    return last_t
+
+
+def _stream_events(tmp_dir: str, name: str):
+    """События потока из файлов его столбцов, по одному"""
+    columns = _stream_columns(name)
+    files = [open(_column_path(tmp_dir, name, field), encoding='utf-8') for field in columns]
+    try:
+        for lines in zip(*files):
+            for row in zip(*(json.loads('[' + line + ']') for line in lines)):
+                yield dict(zip(columns, row))
+    finally:
+        for f in files:
+            f.close()
+
+
+def _write_streams(f, tmp_dir: str, last_t: Dict[str, float]):
+    """Записать 'streams' в столбцах, копируя файлы столбцов по строке"""
+    f.write(',\n  "streams": {')
+    for n, name in enumerate(STREAMS):
+        f.write(('\n' if n == 0 else ',\n') + f'    {json.dumps(name)}: {{')
+        for k, field in enumerate(_stream_columns(name)):
+            f.write(('' if k == 0 else ', ') + f'{json.dumps(field)}: [')
+            if name in last_t:
+                with open(_column_path(tmp_dir, name, field), encoding='utf-8') as column:
+                    for i, line in enumerate(column):
+                        f.write(('' if i == 0 else ', ') + line.rstrip('\n'))
+            f.write(']')
+        f.write('}')
+    f.write('\n  }')
+
+
+def journal_report_path(journal_path: str, compression: Optional[str] = None) -> str:
+    """Путь отчёта, который finalize_journal соберёт из журнала"""
+    if compression is None:
+        compression = compression_of(journal_path)
+    return (strip_compression(journal_path)[:-len(JOURNAL_SUFFIX)] + ".json"
+            + COMPRESSION_SUFFIXES.get(compression, ''))
+
+
+def finalize_journal(journal_path: str, header_updates: Optional[dict] = None,
+                     compression: Optional[str] = None) -> Tuple[Optional[str], int]:
+    """Превратить журнал в отчёт JSON рядом с ним и удалить журнал
+
+    Журнал записей переносится потоково, без загрузки в память. Журнал событий
+    (заголовок с 'journal': 'events') сводится в равномерные записи, а сами
+    события сохраняются по потокам в 'streams'. События для этого раскладываются
+    по временным файлам потоков, записи строятся одним проходом по ним, а
+    'streams' пишется поэлементно — в памяти держатся только текущие события.
+    Отчёт сжимается так же, как журнал, если не задано compression ('none' — без
+    сжатия). Возвращает путь к отчёту и число записей; пустой журнал просто
+    удаляется (путь None).
+    """
+    if compression is None:
+        compression = compression_of(journal_path)
+    report_path = journal_report_path(journal_path, compression)
+    lines = _journal_lines(journal_path)
+    header = next(lines, None) or {}
+    with tempfile.TemporaryDirectory(prefix='.finalize_', dir=os.path.dirname(journal_path) or '.') as tmp_dir:
+        streams = None
+        if header.pop('journal', None) == 'events':
+            streams = _split_events(lines, tmp_dir)
+            rate = header.get('rate', DEFAULT_RATE)
+            last_t = max(streams.values(), default=None)
+            count = int(last_t * rate) if last_t is not None else 0
+            records = merge_events({name: _stream_events(tmp_dir, name) for name in streams},
+                                   last_t, _started_utc(header), rate)
+        else:
+            count = sum(1 for _ in lines)
+            records = _journal_lines(journal_path)
+            next(records, None)
+        if count == 0:
+            os.remove(journal_path)
+            return None, 0
+
+        header.update(header_updates or {})
+        header.pop('total_records', None)
+        header.pop('started_utc', None)
+        tmp_path = report_path + ".tmp"
+        with open(tmp_path, 'wb') as raw, _compressed_text(raw, compression) as f:
+            f.write('{\n')
+            for key, value in header.items():
+                f.write(f'  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)},\n')
+            f.write(f'  "total_records": {count},\n  "records": [\n')
+            for i, record in enumerate(records):
+                f.write(('    ' if i == 0 else ',\n    ') + json.dumps(record, ensure_ascii=False))
+            f.write('\n  ]')
+            if streams is not None:
+                _write_streams(f, tmp_dir, streams)
+            f.write('\n}\n')
+            f.close()
+            raw.flush()
+            os.fsync(raw.fileno())
+    os.replace(tmp_path, report_path)
+    os.remove(journal_path)
+    return report_path, count
+
+
+def recover_journals(reports_dir: str) -> List[Tuple[str, int]]:
+    """Восстановить отчёты из журналов, оставшихся после аварийного завершения"""
+    recovered = []
+    journals = glob.glob(os.path.join(reports_dir, "*" + JOURNAL_SUFFIX))
+    for suffix in COMPRESSION_SUFFIXES.values():
+        journals += glob.glob(os.path.join(reports_dir, "*" + JOURNAL_SUFFIX + suffix))
+    for journal_path in sorted(journals):
+        try:
+            header, last = None, None
+            for last in _journal_lines(journal_path):
+                if header is None:
+                    header = last
+            updates = {'recovered': True}
+            if last is not None and 'timestamp' in last:
+                updates['ended_at'] = last['timestamp']
+            elif last is not None and 't' in last and _started_utc(header):
+                updates['ended_at'] = format_timestamp(_started_utc(header) + timedelta(seconds=last['t']))
+            report_path, count = finalize_journal(journal_path, updates)
+            if report_path:
+                recovered.append((report_path, count))
+        except Exception as e:
+            print(f"Ошибка восстановления журнала {journal_path}: {e}")
+    return recovered
+
+
+class ReportJournal:
+    """Журнал записи на диске, который пишется из отдельного потока
+
+    Первая строка — заголовок отчёта, далее по одной записи на строку. append()
+    не блокирует GUI: сериализация и запись идут в потоке журнала, fsync — раз в
+    FSYNC_INTERVAL секунд, так что при сбое теряется не больше последней секунды.
+
+    compression — сжатие отчёта. Журнал сжимается потоково тем же методом, если
+    его можно сбрасывать посреди потока (gzip, zstd), иначе — gzip; к пути журнала
+    добавляется соответствующее расширение.
+    """
+
+    _STOP = object()
+
+    def __init__(self, journal_path: str, header: dict, compression: Optional[str] = None):
+        self.compression = compression
+        journal_compression = None
+        if compression in COMPRESSION_SUFFIXES:
+            journal_compression = compression if compression in STREAMING_COMPRESSIONS else 'gzip'
+        self.path = journal_path + COMPRESSION_SUFFIXES.get(journal_compression, '')
+        self.count = 0
+        self._queue = queue.Queue()
+        self._finish = None
+        self._raw = open(self.path, 'wb')
+        self._file = _compressed_text(self._raw, journal_compression)
+        self._file.write(json.dumps(header, ensure_ascii=False) + '\n')
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def append(self, record: dict):
+        self._queue.put(record)
+
+    def finish(self, header_updates: Optional[dict] = None,
+               on_done: Optional[Callable[[Optional[str], int, str], None]] = None):
+        """Дописать журнал и превратить его в отчёт в фоне
+
+        on_done(путь к отчёту или None, число записей, текст ошибки) вызывается
+        из потока журнала.
+        """
+        self._finish = (header_updates, on_done)
+        self._queue.put(self._STOP)
+
+    def wait(self, timeout: Optional[float] = None):
+        self._thread.join(timeout)
+
+    def _run(self):
+        last_sync = time.monotonic()
+        error = ""
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=FSYNC_INTERVAL)
+                except queue.Empty:
+                    item = None
+                if item is self._STOP:
+                    break
+                if item is not None:
+                    self._file.write(json.dumps(item, ensure_ascii=False) + '\n')
+                    self.count += 1
+                if time.monotonic() - last_sync >= FSYNC_INTERVAL:
+                    self._sync()
+                    last_sync = time.monotonic()
+        except Exception as e:
+            error = str(e)
+        finally:
+            self._file.close()
+            self._raw.flush()
+            os.fsync(self._raw.fileno())
+            self._raw.close()
+
+        header_updates, on_done = self._finish or (None, None)
+        report_path, count = None, self.count
+        if not error:
+            try:
+                report_path, count = finalize_journal(self.path, header_updates,
+                                                      self.compression or 'none')
+            except Exception as e:
+                error = str(e)
+        if on_done is not None:
+            on_done(report_path, count, error)
+
+    def _sync(self):
+        # flush текстового слоя сбрасывает и поток сжатия (Z_SYNC_FLUSH / блок zstd)
+        self._file.flush()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+
+
+def _recalibrate(raw_x: list, raw_y: list, calibration) -> Tuple[list, list, list, list]:
+    """gaze_x, gaze_y, gaze_h, gaze_v по сырому взгляду с калибровкой"""
+    screen_x, screen_y = apply_calibration_array(calibration, np.array(raw_x, dtype=np.float64),
+                                                 np.array(raw_y, dtype=np.float64))
+    h_dir, v_dir = gaze_directions_array(screen_x, screen_y)
+    return np.round(screen_x, 3).tolist(), np.round(screen_y, 3).tolist(), h_dir.tolist(), v_dir.tolist()
+
+
+def recalibrate_records(records: List[dict], calibration) -> int:
+    """Пересчитать gaze_x/gaze_y и gaze_h/gaze_v по сырому взгляду с новой калибровкой
+
+    Записи без сырого взгляда (лицо не найдено, старые отчёты) не меняются.
+    Возвращает количество пересчитанных записей.
+    """
+    indexes = [i for i, r in enumerate(records) if r.get('raw_x') is not None]
+    if not indexes:
+        return 0
+
+    columns = _recalibrate([records[i]['raw_x'] for i in indexes],
+                           [records[i]['raw_y'] for i in indexes], calibration)
+    for i, values in zip(indexes, zip(*columns)):
+        records[i].update(zip(('gaze_x', 'gaze_y', 'gaze_h', 'gaze_v'), values))
+    return len(indexes)
+
+
+def recalibrate_stream(stream: Dict[str, list], calibration) -> int:
+    """То же для потока событий взгляда в столбцах ({поле: значения}, как в 'streams')"""
+    raw_x = stream.get('raw_x') or []
+    indexes = [i for i, x in enumerate(raw_x) if x is not None]
+    if not indexes:
+        return 0
+
+    columns = _recalibrate([raw_x[i] for i in indexes], [stream['raw_y'][i] for i in indexes], calibration)
+    for field, values in zip(('gaze_x', 'gaze_y', 'gaze_h', 'gaze_v'), columns):
+        target = stream.setdefault(field, [None] * len(raw_x))
+        for i, value in zip(indexes, values):
+            target[i] = value
+    return len(indexes)
+
+
+def recalibrate_report(report: dict, calibration) -> int:
+    """Применить калибровку ко всем записям отчёта и событиям взгляда, сохранить её в заголовке
+
+    Возвращает количество пересчитанных записей.
+    """
+    count = recalibrate_records(report.get('records', []), calibration)
+    gaze = report.get('streams', {}).get('gaze')
+    if gaze:
+        recalibrate_stream(gaze, calibration)
+    report['calibration'] = calibration_to_json(calibration)
+    return count
+
+
+def compress_report(path: str, compression: str = DEFAULT_COMPRESSION, keep: bool = False) -> str:
+    """Пересохранить отчёт со сжатием (или без, compression='none'); исходный файл удаляется"""
+    suffix = COMPRESSION_SUFFIXES.get(compression, '')
+    output = strip_compression(path) + suffix
+    tmp_path = strip_compression(path) + ".tmp" + suffix
+    save_report(load_report(path), tmp_path)
+    os.replace(tmp_path, output)
+    if not keep and output != path:
+        os.remove(path)
+    return output
+
+
+def benchmark_formats(path: str, repeats: int = 3) -> List[dict]:
+    """Размер, время записи и загрузки отчёта во всех форматах хранения"""
+    import tempfile
+
+    report = load_report(path)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        base = os.path.join(tmp_dir, "report.json")
+        formats = [('json', base)]
+        formats += [(name, base + COMPRESSION_SUFFIXES[name]) for name in available_compressions()]
+        formats.append(('npz', os.path.join(tmp_dir, "report" + SESSION_SUFFIX)))
+        for name, target in formats:
+            started = time.perf_counter()
+            if name == 'npz':
+                save_session(Session.from_report(report), target)
+            else:
+                save_report(report, target)
+            write_ms = (time.perf_counter() - started) * 1000
+            load_ms = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                load_session(target)
+                load_ms.append((time.perf_counter() - started) * 1000)
+            results.append({'format': name, 'bytes': os.path.getsize(target),
+                            'write_ms': write_ms, 'load_ms': min(load_ms)})
+    plain = results[0]['bytes']
+    for result in results:
+        result['ratio'] = plain / result['bytes'] if result['bytes'] else 0.0
+    return results
+
+
+def load_calibration(path: str):
+    """Калибровка из JSON-файла ({'type', 'matrix'}) или из отчёта с ключом 'calibration'"""
+    data = load_report(path)
+    if 'calibration' in data:
+        data = data['calibration']
+    return calibration_from_json(data)
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Операции с отчётами записи")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    recal = commands.add_parser('recalibrate', help="Применить другую калибровку к сырому взгляду")
+    recal.add_argument('report', help="Файл отчёта")
+    recal.add_argument('--calibration', required=True,
+                       help="JSON с калибровкой или отчёт, где она сохранена")
+    recal.add_argument('-o', '--output', help="Куда сохранить (по умолчанию — перезаписать отчёт)")
+
+    convert = commands.add_parser('convert', help="Сконвертировать JSON-отчёт в столбцовый .npz")
+    convert.add_argument('report', help="Файл отчёта JSON")
+    convert.add_argument('-o', '--output', help="Файл .npz (по умолчанию рядом с отчётом)")
+    convert.add_argument('--no-compress', action='store_true', help="Не сжимать массивы")
+
+    compress = commands.add_parser('compress', help="Сжать отчёт (или распаковать: --compression none)")
+    compress.add_argument('report', help="Файл отчёта")
+    compress.add_argument('--compression', default=DEFAULT_COMPRESSION,
+                          choices=available_compressions() + ['none'])
+    compress.add_argument('--keep', action='store_true', help="Не удалять исходный файл")
+
+    bench = commands.add_parser('benchmark', help="Сравнить размер и скорость загрузки форматов")
+    bench.add_argument('report', help="Файл отчёта")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'compress':
+        size = os.path.getsize(args.report)
+        output = compress_report(args.report, args.compression, args.keep)
+        print(f"{output}: {size / 1024:.0f} КБ → {os.path.getsize(output) / 1024:.0f} КБ "
+              f"(в {size / max(os.path.getsize(output), 1):.1f} раза)")
+    elif args.command == 'benchmark':
+        results = benchmark_formats(args.report)
+        print(f"{'Формат':<8}{'Размер':>12}{'Сжатие':>9}{'Запись':>11}{'Загрузка':>11}")
+        for r in results:
+            print(f"{r['format']:<8}{r['bytes'] / 1024:>9.0f} КБ{r['ratio']:>8.1f}x"
+                  f"{r['write_ms']:>8.0f} мс{r['load_ms']:>8.0f} мс")
+    elif args.command == 'convert':
+        output = convert_report(args.report, args.output, compress=not args.no_compress)
+        timings = {}
+        for path in (args.report, output):
+            started = time.perf_counter()
+            session = load_session(path)
+            timings[path] = (time.perf_counter() - started) * 1000
+        print(f"Записей: {len(session)}")
+        for path, elapsed in timings.items():
+            print(f"{os.path.basename(path):<40}{os.path.getsize(path) / 1024:>10.0f} КБ{elapsed:>10.1f} мс")
+    elif args.command == 'recalibrate':
+        report = load_report(args.report)
+        calibration = load_calibration(args.calibration)
+        started = time.perf_counter()
+        count = recalibrate_report(report, calibration)
+        elapsed = (time.perf_counter() - started) * 1000
+        if count == 0:
+            print("В отчёте нет сырого взгляда (raw_x/raw_y) — перекалибровка невозможна",
+                  file=sys.stderr)
+            return 1
+        save_report(report, args.output or args.report)
+        print(f"Пересчитано записей: {count} за {elapsed:.1f} мс")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""
+Кольцевой буфер NumPy для графиков в реальном времени
+
+Память выделяется один раз. Каждое значение пишется в две ячейки (i и
+i + capacity), поэтому последние capacity значений всегда лежат в памяти подряд и
+окно графика — это срез без копирования. Добавление и чтение окна не создают
+новых массивов, размер окна влияет только на память.
+"""
+from typing import Dict, Sequence
+
+import numpy as np
+
+
+class RingBuffer:
+    """Несколько синхронных рядов (каналов) фиксированной длины
+
+    append() добавляет по одному значению в каждый канал; view(канал) — окно от
+    старых значений к новым. Буфер не потокобезопасен: view() отдаёт срез, который
+    меняет следующий append(), поэтому писать и рисовать нужно из одного потока.
+    """
+
+    def __init__(self, capacity: int, channels: Sequence[str], dtype=np.float64):
+        self.capacity = capacity
+        self.channels = list(channels)
+        self.count = 0  # Всего добавлено значений
+        self.x = np.arange(capacity, dtype=dtype)  # Ось X для графика окна
+        self._index: Dict[str, int] = {name: i for i, name in enumerate(self.channels)}
+        self._data = np.zeros((len(self.channels), 2 * capacity), dtype=dtype)
+        self._head = 0  # Позиция самого старого значения окна
+
+    def append(self, values: Sequence[float]):
+        """Добавить по значению в каждый канал (в порядке channels)"""
+        i = self._head
+        self._data[:, i] = values
+        self._data[:, i + self.capacity] = values
+        self._head = (i + 1) % self.capacity
+        self.count += 1
+
+    def view(self, channel: str) -> np.ndarray:
+        """Окно канала без копирования: capacity значений от старых к новым"""
+        head = self._head
+        return self._data[self._index[channel], head:head + self.capacity]
+
+    def latest(self, channel: str) -> float:
+        return float(self._data[self._index[channel], self._head + self.capacity - 1])
+
+    def clear(self):
+        self._data.fill(0)
+        self._head = 0
+        self.count = 0
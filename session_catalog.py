@@ -0,0 +1,245 @@
+"""
+Каталог сессий в SQLite
+
+Для каждого отчёта в reports/ каталог хранит метаданные (видео, устройство,
+участник, длительность, число записей) и заранее посчитанную сводку: среднее и
+максимальное внимание, пики внимания, долю записей со взглядом. Список сессий
+читается из каталога без разбора отчётов, поэтому открывается сразу и при тысячах
+файлов.
+
+Каталог обновляется по времени изменения и размеру файлов: разбираются только
+новые и изменённые отчёты, строки удалённых файлов убираются. Файл каталога —
+reports/catalog.sqlite; его можно удалить, он соберётся заново.
+
+Пример:
+    python session_catalog.py reports
+    python session_catalog.py reports --search 12345 --sort mean_attention
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from dataclasses import dataclass, astuple, fields
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from report_storage import COMPRESSION_SUFFIXES, SESSION_SUFFIX, Session, load_session
+
+
+CATALOG_NAME = "catalog.sqlite"
+SCHEMA_VERSION = 1  # При изменении таблицы каталог пересобирается
+PEAK_LIMIT = 10
+REPORT_SUFFIXES = ('.json',) + tuple('.json' + suffix for suffix in COMPRESSION_SUFFIXES.values()) + (SESSION_SUFFIX,)
+SEARCH_FIELDS = ('name', 'video_id', 'video_file', 'device', 'participant')
+
+
+@dataclass
+class SessionSummary:
+    """Строка каталога: метаданные и сводка сессии"""
+    path: str
+    name: str
+    mtime: float
+    size: int
+    created_at: Optional[str]
+    video_id: Optional[str]
+    video_file: Optional[str]
+    device: Optional[str]
+    participant: Optional[str]
+    duration_sec: float
+    record_count: int
+    mean_attention: Optional[float]
+    max_attention: Optional[float]
+    peak_count: int
+    peaks: str  # JSON: [[время, внимание], ...]
+    gaze_coverage: float  # Доля записей с найденным взглядом
+
+
+COLUMNS = tuple(field.name for field in fields(SessionSummary))
+SORT_FIELDS = COLUMNS[1:]
+_SQL_TYPES = {str: 'TEXT', float: 'REAL', int: 'INTEGER'}
+
+
+def _sql_type(annotation) -> str:
+    """Тип столбца SQLite для поля (Optional[X] — как X)"""
+    args = [arg for arg in getattr(annotation, '__args__', ()) if arg is not type(None)]
+    return _SQL_TYPES.get(args[0] if args else annotation, 'TEXT')
+
+
+def find_attention_peaks(times: np.ndarray, attention: np.ndarray,
+                         limit: int = PEAK_LIMIT) -> List[Tuple[float, float, int]]:
+    """Пики внимания: локальные максимумы выше среднего + 1.5 σ, самые высокие первыми
+
+    Возвращает [(время, значение, индекс записи), ...].
+    """
+    if len(times) < 3:
+        return []
+
+    # Вычисляем среднее и стандартное отклонение
+    attention_values = attention[attention > 0]
+    if len(attention_values) == 0:
+        return []
+
+    # Порог для пика: среднее + 1.5 * стандартное отклонение
+    threshold = attention_values.mean() + 1.5 * attention_values.std()
+
+    # Находим локальные максимумы выше порога
+    peaks = []
+    window_size = max(3, len(times) // 50)  # Адаптивный размер окна
+
+    candidates = np.flatnonzero(attention >= threshold)
+    candidates = candidates[(candidates >= window_size) & (candidates < len(attention) - window_size)]
+    for i in candidates.tolist():
+        # Локальный максимум: в окне нет другого значения не меньше текущего
+        window = attention[i - window_size:i + window_size + 1]
+        if np.count_nonzero(window >= attention[i]) == 1:
+            peaks.append((float(times[i]), float(attention[i]), i))
+
+    # Сортируем по значению внимания (от большего к меньшему)
+    peaks.sort(key=lambda x: x[1], reverse=True)
+    return peaks[:limit]
+
+
+def is_report_file(name: str) -> bool:
+    return name.startswith('report_') and name.endswith(REPORT_SUFFIXES)
+
+
+def summarize_session(path: str, session: Session) -> SessionSummary:
+    """Сводка сессии для каталога"""
+    meta = session.meta
+    times = session.column('elapsed_sec')
+    attention = session.column('attention')
+    gaze_x, gaze_y = session.column('gaze_x'), session.column('gaze_y')
+    measured = attention[attention > 0]
+    peaks = find_attention_peaks(times, attention)
+    stat = os.stat(path)
+    video_id = meta.get('video_id')
+    return SessionSummary(
+        path=os.path.abspath(path),
+        name=os.path.basename(path),
+        mtime=stat.st_mtime,
+        size=stat.st_size,
+        created_at=meta.get('created_at'),
+        video_id=str(video_id) if video_id is not None else None,
+        video_file=meta.get('video_file'),
+        device=meta.get('device'),
+        participant=meta.get('participant'),
+        duration_sec=float(times[-1] - times[0]) if len(times) else 0.0,
+        record_count=len(session),
+        mean_attention=float(measured.mean()) if len(measured) else None,
+        max_attention=float(measured.max()) if len(measured) else None,
+        peak_count=len(peaks),
+        peaks=json.dumps([[round(t, 3), value] for t, value, _ in peaks]),
+        gaze_coverage=float(np.mean((gaze_x > 0) | (gaze_y > 0))) if len(times) else 0.0,
+    )
+
+
+class SessionCatalog:
+    """Каталог сессий в файле SQLite
+
+    Каждый вызов открывает своё соединение, поэтому update() можно выполнять в
+    фоновом потоке, пока GUI читает список (журнал WAL не блокирует чтение).
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        db = sqlite3.connect(self.db_path, timeout=10)
+        db.execute("PRAGMA journal_mode=WAL")
+        if db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            columns = ", ".join(f"{field.name} {_sql_type(field.type)}"
+                                for field in fields(SessionSummary)[1:])
+            with db:
+                db.execute("DROP TABLE IF EXISTS sessions")
+                db.execute(f"CREATE TABLE sessions (path TEXT PRIMARY KEY, {columns})")
+                db.execute("CREATE INDEX sessions_created_at ON sessions (created_at)")
+                db.execute("CREATE INDEX sessions_video_id ON sessions (video_id)")
+                db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return db
+
+    def update(self, reports_dir: str) -> Tuple[int, int]:
+        """Разобрать новые и изменённые отчёты, убрать удалённые; (обновлено, удалено)"""
+        files = {}
+        if os.path.isdir(reports_dir):
+            for entry in os.scandir(reports_dir):
+                if entry.is_file() and is_report_file(entry.name):
+                    stat = entry.stat()
+                    files[os.path.abspath(entry.path)] = (stat.st_mtime, stat.st_size)
+
+        db = self._connect()
+        try:
+            known = {path: (mtime, size) for path, mtime, size
+                     in db.execute("SELECT path, mtime, size FROM sessions")}
+            removed = [path for path in known if path not in files]
+            with db:
+                db.executemany("DELETE FROM sessions WHERE path = ?", [(path,) for path in removed])
+
+            updated = 0
+            placeholders = ", ".join("?" * len(COLUMNS))
+            for path, signature in files.items():
+                if known.get(path) == signature:
+                    continue
+                try:
+                    summary = summarize_session(path, load_session(path))
+                except Exception as e:
+                    print(f"Каталог: не удалось прочитать {os.path.basename(path)}: {e}")
+                    continue
+                with db:
+                    db.execute(f"INSERT OR REPLACE INTO sessions VALUES ({placeholders})", astuple(summary))
+                updated += 1
+            return updated, len(removed)
+        finally:
+            db.close()
+
+    def search(self, text: str = "", order_by: str = 'created_at', descending: bool = True,
+               limit: Optional[int] = None) -> List[SessionSummary]:
+        """Сессии, где text встречается в имени, видео, устройстве или участнике"""
+        if order_by not in SORT_FIELDS:
+            raise ValueError(f"Неизвестное поле сортировки: {order_by}")
+        query = f"SELECT {', '.join(COLUMNS)} FROM sessions"
+        params: list = []
+        if text:
+            query += " WHERE " + " OR ".join(f"{name} LIKE ?" for name in SEARCH_FIELDS)
+            params += [f"%{text}%"] * len(SEARCH_FIELDS)
+        query += f" ORDER BY {order_by} {'DESC' if descending else 'ASC'}, name"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        db = self._connect()
+        try:
+            return [SessionSummary(*row) for row in db.execute(query, params)]
+        finally:
+            db.close()
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Каталог сессий")
+    parser.add_argument('reports', help="Папка отчётов")
+    parser.add_argument('--search', default="", help="Текст для поиска")
+    parser.add_argument('--sort', default='created_at', choices=SORT_FIELDS, help="Поле сортировки")
+    parser.add_argument('--asc', action='store_true', help="По возрастанию")
+    parser.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    catalog = SessionCatalog(os.path.join(args.reports, CATALOG_NAME))
+    started = time.perf_counter()
+    updated, removed = catalog.update(args.reports)
+    print(f"Обновлено: {updated}, удалено: {removed} за {(time.perf_counter() - started) * 1000:.0f} мс")
+
+    started = time.perf_counter()
+    sessions = catalog.search(args.search, args.sort, not args.asc, args.limit)
+    elapsed = (time.perf_counter() - started) * 1000
+    for s in sessions:
+        attention = f"{s.mean_attention:.0f}%" if s.mean_attention is not None else "—"
+        print(f"{s.name:<40}{s.video_id or '—':<10}{s.duration_sec:>8.0f} с{s.record_count:>8}"
+              f"{attention:>6}{s.peak_count:>4} пиков{s.gaze_coverage * 100:>5.0f}% взгляда")
+    print(f"Найдено: {len(sessions)} за {elapsed:.1f} мс")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Модули лежат в корне репозитория; Qt — без дисплея
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
@@ -0,0 +1,21 @@
+import json
+import os
+import threading
+
+import camera_probe
+from camera_probe import CameraProfile
+
+
+def test_save_profile_replaces_cache_file(tmp_path, monkeypatch):
+    path = tmp_path / "camera_profiles.json"
+    monkeypatch.setattr(camera_probe, 'CAMERA_PROFILES_FILE', str(path))
+    profile = CameraProfile(backend=0, backend_name="ANY", fourcc="MJPG", width=640, height=480, fps=30.0)
+
+    threads = [threading.Thread(target=camera_probe.save_profile, args=(f"cam:{i}", profile)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(json.loads(path.read_text(encoding='utf-8'))) == [f"cam:{i}" for i in range(8)]
+    assert os.listdir(tmp_path) == ["camera_profiles.json"]
@@ -0,0 +1,42 @@
+import cv2
+import numpy as np
+import pytest
+
+from eye_benchmark import SyntheticCamera, run_benchmark, run_multi_camera
+
+
+def _write_clip(path, seconds, fps=30):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), fps, (320, 240))
+    for i in range(int(seconds * fps)):
+        frame = np.full((240, 320, 3), 80, np.uint8)
+        cv2.circle(frame, (160 + int(30 * np.sin(i / 10)), 120), 40, (200, 200, 200), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def test_multi_camera_file_source_is_paced(tmp_path):
+    clip = tmp_path / "clip.avi"
+    _write_clip(clip, seconds=5)
+    report = run_multi_camera(str(clip), cameras=2, duration=3.0)
+    assert sorted(report['per_camera']) == [0, 1]
+    for camera in report['per_camera'].values():
+        # Видео читается в темпе его 30 кадров/с, а не так быстро, как успевает трекер
+        assert abs(camera['fps'] - 30) <= 3
+        # Счётчики у каждой камеры свои: общий насчитал бы кадры обеих
+        assert abs(camera['frames'] - 30 * report['duration']) <= 0.15 * 30 * report['duration']
+
+
+def test_multi_camera_rejects_short_clip(tmp_path):
+    clip = tmp_path / "clip.avi"
+    _write_clip(clip, seconds=1)
+    with pytest.raises(ValueError):
+        run_multi_camera(str(clip), cameras=1, duration=3.0)
+
+
+def test_synthetic_frames_exercise_every_stage():
+    report = run_benchmark(SyntheticCamera(), frames=30, warmup=2)
+    assert report['face_detected_ratio'] == 1.0
+    assert report['skipped_stages'] == []
+    # Оба глаза находятся почти на каждом кадре
+    assert report['stages']['find_pupil']['calls'] >= 30
+
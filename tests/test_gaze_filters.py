@@ -0,0 +1,30 @@
+import json
+
+import numpy as np
+
+from gaze_filters import OneEuroFilter, evaluate_filter, load_gaze_stream
+from report_storage import Session, save_session
+
+
+def test_evaluate_filter_without_samples():
+    empty = np.zeros(0)
+    stats = evaluate_filter(OneEuroFilter(), empty, empty, empty)
+    assert stats['fixation_samples'] == 0 and stats['saccade_samples'] == 0
+
+
+def test_gaze_stream_from_json_and_npz_match(tmp_path):
+    report = {'video_id': '42', 'records': [
+        {'elapsed_sec': i / 10, 'raw_x': 0.5 + i / 100, 'raw_y': None if i == 3 else 0.4, 'gaze_x': 0.1}
+        for i in range(10)]}
+    json_path = tmp_path / "report.json"
+    json_path.write_text(json.dumps(report), encoding='utf-8')
+    npz_path = tmp_path / "report.npz"
+    save_session(Session.from_report(report), str(npz_path))
+
+    from_json = load_gaze_stream(str(json_path))
+    from_npz = load_gaze_stream(str(npz_path))
+
+    for a, b in zip(from_json, from_npz):
+        np.testing.assert_array_equal(a, b)
+    np.testing.assert_allclose(from_json[1], [0.5 + i / 100 for i in range(10)])
+    assert from_json[2][3] == 0
@@ -0,0 +1,106 @@
+import json
+import socket
+import time
+
+import pytest
+
+import live_upload
+from live_upload import LiveUploader, LiveUploadServer
+from wire_codec import ENCODINGS, JSON
+
+
+def _record(i):
+    return {'elapsed_sec': round((i + 1) / 10, 2), 'video_ms': i * 100, 'attention': float(i % 100),
+            'gaze_h': 'center' if i % 3 else 'left', 'left_eye': i % 5 != 0}
+
+
+@pytest.fixture(autouse=True)
+def fast_reconnect(monkeypatch):
+    monkeypatch.setattr(live_upload, 'RECONNECT_DELAYS', (0.05,))
+
+
+@pytest.mark.parametrize('encodings', [ENCODINGS, (JSON,)])
+@pytest.mark.parametrize('drop_every', [2, 3])
+def test_live_upload_survives_dropped_connections(encodings, drop_every):
+    server = LiveUploadServer(drop_every=drop_every, encodings=encodings)
+    server.start()
+    try:
+        uploader = LiveUploader(server.url, "session", {'rate': 10.0}, interval=0.05)
+        uploader.start()
+        sent = [_record(i) for i in range(300)]
+        for i, record in enumerate(sent):
+            uploader.append(record)
+            if i % 20 == 0:
+                time.sleep(0.02)
+        uploader.finish()
+
+        assert uploader.wait(live_upload.FINISH_TIMEOUT + 5)
+        session = server.sessions["session"]
+        # Все записи доставлены один раз и по порядку, несмотря на обрывы
+        assert session['records'] == sent
+        assert session['ended']
+        assert uploader.stats.reconnects > 0
+        assert uploader.stats.acked_records == len(sent)
+    finally:
+        server.stop()
+
+
+def _closed_port_url():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return f"ws://127.0.0.1:{s.getsockname()[1]}/live"
+
+
+def test_backlog_is_dropped_when_server_is_unreachable():
+    uploader = LiveUploader(_closed_port_url(), "session", interval=0.01, max_backlog=100)
+    uploader.start()
+    for i in range(1000):
+        uploader.append(_record(i))
+
+    uploader.finish()
+    assert not uploader.wait(5)
+    assert uploader.stats.abandoned
+    assert uploader.stats.error
+    assert not uploader._pending and not uploader._batches
+
+
+class _SilentServer:
+    """Соединение с сервером, который не отвечает welcome"""
+
+    def send(self, message):
+        pass
+
+    def recv(self):
+        return json.dumps({'type': 'error', 'message': 'unknown'})
+
+    def close(self):
+        pass
+
+
+def test_upload_stops_when_server_does_not_speak_protocol():
+    uploader = LiveUploader("ws://unused", "session", interval=0.01, connect=lambda url: _SilentServer())
+    uploader.start()
+    uploader.append(_record(0))
+
+    assert not uploader.wait(5)
+    assert uploader.stats.abandoned
+    assert uploader.stats.error.startswith("Неожиданный ответ сервера")
+    uploader.append(_record(1))
+    assert not uploader._pending
+
+
+def test_finish_does_not_spin_while_server_is_unreachable(monkeypatch):
+    monkeypatch.setattr(live_upload, 'FINISH_TIMEOUT', 1.0)
+    monkeypatch.setattr(live_upload, 'RECONNECT_DELAYS', (0.5,))
+    uploader = LiveUploader(_closed_port_url(), "session", interval=0.01)
+    uploader.start()
+    uploader.append(_record(0))
+    time.sleep(0.1)
+
+    started, cpu = time.monotonic(), time.process_time()
+    uploader.finish()
+    assert not uploader.wait(5)
+
+    # Ожидание переподключения до конца FINISH_TIMEOUT — без нагрузки на процессор
+    assert time.monotonic() - started >= 0.9
+    assert time.process_time() - cpu < 0.3
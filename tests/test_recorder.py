@@ -0,0 +1,47 @@
+import random
+import threading
+
+import numpy as np
+
+from recorder import EventRecorder, RecordSampler
+
+
+def test_record_from_several_threads():
+    events = []
+    recorder = EventRecorder(events.append)
+    per_thread = 2000
+
+    def write(stream):
+        for i in range(per_thread):
+            recorder.record(stream, {'video_frame': i, 'frame_ms': float(i)} if stream == 'frame'
+                            else {'attention': i, 'relaxation': i})
+            recorder.snapshot(0.1)
+
+    threads = [threading.Thread(target=write, args=(stream,)) for stream in ('frame', 'mind')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert recorder.event_count == len(events) == 2 * per_thread
+    assert recorder.counts['frame'] == recorder.counts['mind'] == per_thread
+    # События каждого потока попадают в sink в порядке записи
+    assert [e['video_frame'] for e in events if e['stream'] == 'frame'] == list(range(per_thread))
+    assert [e['attention'] for e in events if e['stream'] == 'mind'] == list(range(per_thread))
+
+
+def test_sampler_lateness_stats_use_fixed_memory():
+    sampler = RecordSampler(EventRecorder(lambda event: None), rate=10.0)
+    size = sampler._lateness.nbytes
+    rnd = random.Random(0)
+    late = [rnd.expovariate(1000) for _ in range(100_000)]
+    for value in late:
+        sampler._add_lateness(min(value, 0.0999))
+
+    stats = sampler.stats()['lateness_ms']
+    assert sampler._lateness.nbytes == size
+    late = np.minimum(late, 0.0999) * 1000
+    assert stats['mean'] == round(float(late.mean()), 3)
+    assert stats['max'] == round(float(late.max()), 3)
+    for q in (50, 95, 99):
+        assert abs(stats[f'p{q}'] - np.percentile(late, q)) <= 0.01
@@ -0,0 +1,87 @@
+import json
+import random
+
+import numpy as np
+
+import report_storage
+from recorder import STREAMS, group_events, merge_streams
+from report_storage import ReportJournal, Session, finalize_journal, load_report
+
+
+def _events(count, seed=0):
+    rnd = random.Random(seed)
+    events, t, video_ms = [], 0.0, 0
+    for _ in range(count):
+        t += rnd.choice([0.0, 0.01, 0.05, 0.2])
+        stream = rnd.choice(list(STREAMS))
+        if stream == 'video':
+            video_ms += rnd.randint(0, 300)
+            events.append({'stream': stream, 't': round(t, 4), 'video_ms': video_ms,
+                           'playing': rnd.random() < 0.8})
+        else:
+            events.append({'stream': stream, 't': round(t, 4),
+                           **{field: rnd.randint(0, 100) for field in STREAMS[stream]}})
+    return events
+
+
+def test_finalize_events_journal_matches_in_memory_merge(tmp_path, monkeypatch):
+    # Маленькие пачки столбцов, чтобы проверить стыки между строками временных файлов
+    monkeypatch.setattr(report_storage, 'COLUMN_CHUNK', 7)
+    events = _events(500)
+    journal_path = tmp_path / "report_test.journal"
+    with open(journal_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'journal': 'events', 'rate': 10.0}) + '\n')
+        for event in events:
+            f.write(json.dumps(event) + '\n')
+
+    report_path, count = finalize_journal(str(journal_path))
+
+    report = load_report(report_path)
+    streams = group_events(events)
+    assert report['records'] == merge_streams(streams)
+    assert count == len(report['records'])
+    assert report['streams'] == streams
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["report_test.json"]
+
+
+def test_journal_without_events_is_removed(tmp_path):
+    journal = ReportJournal(str(tmp_path / "report_empty.journal"), {'journal': 'events'})
+    done = []
+    journal.finish(on_done=lambda *result: done.append(result))
+    journal.wait(5)
+
+    assert done == [(None, 0, "")]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_session_collects_fields_from_all_records():
+    records = [{'elapsed_sec': i / 10, 'attention': i} for i in range(150)]
+    records[120]['video_frame'] = 42
+
+    session = Session.from_report({'records': records})
+
+    assert list(session.columns) == ['elapsed_sec', 'attention', 'video_frame']
+    assert session.record(120)['video_frame'] == 42
+    assert session.record(0)['video_frame'] is None
+
+
+def test_recalibrate_report_updates_gaze_stream():
+    # Аффинная калибровка: экран = сырой взгляд, сдвинутый на 0.1 по x
+    calibration = {'type': 'affine', 'matrix': np.array([[1.0, 0.0, 0.1], [0.0, 1.0, 0.0]])}
+    report = {
+        'records': [{'raw_x': 0.2, 'raw_y': 0.5, 'gaze_x': 0.0, 'gaze_y': 0.0, 'gaze_h': '', 'gaze_v': ''},
+                    {'raw_x': None, 'raw_y': None, 'gaze_x': 0.0, 'gaze_y': 0.0, 'gaze_h': '', 'gaze_v': ''}],
+        'streams': {'gaze': {'t': [0.1, 0.2, 0.3], 'raw_x': [0.2, None, 0.7], 'raw_y': [0.5, None, 0.5],
+                             'gaze_x': [0, 0, 0], 'gaze_y': [0, 0, 0],
+                             'gaze_h': ['', '', ''], 'gaze_v': ['', '', '']}}
+    }
+
+    assert report_storage.recalibrate_report(report, calibration) == 1
+
+    assert report['records'][0]['gaze_x'] == 0.3 and report['records'][0]['gaze_h'] == 'left'
+    assert report['records'][1]['gaze_x'] == 0.0
+    gaze = report['streams']['gaze']
+    assert gaze['gaze_x'] == [0.3, 0, 0.8]
+    assert gaze['gaze_y'] == [0.5, 0, 0.5]
+    assert gaze['gaze_h'] == ['left', '', 'right']
+    assert gaze['gaze_v'] == ['center', '', 'center']
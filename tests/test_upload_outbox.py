@@ -0,0 +1,199 @@
+import json
+import os
+import socket
+import threading
+
+import pytest
+
+import upload_outbox
+from live_upload import HandshakeFailed, LiveUploadServer, upload_records
+from upload_outbox import FAILED_SUFFIX, JOB_SUFFIX, LEGACY, LIVE, UploadJob, UploadOutbox, send_report
+
+
+def _closed_port_url():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return f"ws://127.0.0.1:{s.getsockname()[1]}/live"
+
+
+def _not_found_url():
+    """Сервер, отвечающий на рукопожатие WebSocket ошибкой 404"""
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen()
+
+    def serve():
+        conn, _ = server.accept()
+        conn.recv(4096)
+        conn.sendall(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+        conn.close()
+        server.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return f"ws://127.0.0.1:{server.getsockname()[1]}/live"
+
+
+@pytest.mark.parametrize('url', [_closed_port_url, _not_found_url])
+def test_handshake_errors_are_reported_as_handshake_failed(url):
+    with pytest.raises(HandshakeFailed):
+        upload_records(url(), "session", [{'attention': 1}])
+
+
+class _LegacyConnection:
+    def __init__(self, sent):
+        self.sent = sent
+
+    def send(self, message):
+        self.sent.append(json.loads(message))
+
+    def recv(self):
+        return "ok"
+
+    def close(self):
+        pass
+
+
+def _report(tmp_path, records):
+    path = tmp_path / "report_20250101_120000.json"
+    path.write_text(json.dumps({'records': records}), encoding='utf-8')
+    return str(path)
+
+
+def test_send_report_falls_back_to_legacy_endpoint(tmp_path, monkeypatch):
+    records = [{'attention': i} for i in range(5)]
+    sent = []
+
+    def refuse(*args, **kwargs):
+        raise HandshakeFailed("Нет соединения: refused")
+
+    monkeypatch.setattr(upload_outbox, 'upload_records', refuse)
+    monkeypatch.setattr(upload_outbox.websocket, 'create_connection', lambda url, timeout: _LegacyConnection(sent))
+    job = UploadJob("job", _report(tmp_path, records), "42", 0.0)
+
+    send_report(job, lambda sent, total: None)
+
+    assert sent == [records]
+    assert job.endpoint == LEGACY
+
+
+def test_send_report_skips_live_endpoint_when_legacy_is_known(tmp_path, monkeypatch):
+    sent = []
+    monkeypatch.setattr(upload_outbox, 'upload_records', lambda *args, **kwargs: pytest.fail("live endpoint"))
+    monkeypatch.setattr(upload_outbox.websocket, 'create_connection', lambda url, timeout: _LegacyConnection(sent))
+    job = UploadJob("job", _report(tmp_path, [{'attention': 1}]), "42", 0.0, endpoint=LEGACY)
+
+    send_report(job, lambda sent, total: None)
+
+    assert sent == [[{'attention': 1}]]
+
+
+def test_job_with_missing_report_is_moved_to_failed(tmp_path):
+    outbox_dir = tmp_path / "outbox"
+    outbox = UploadOutbox(str(outbox_dir), sender=lambda job, progress: pytest.fail("sent"))
+    outbox._load()
+    outbox.add(str(tmp_path / "report_missing.json"), "42")
+    job = outbox.jobs()[0]
+    finished = []
+    outbox.job_finished.connect(lambda *args: finished.append(args))
+
+    outbox._upload(job)
+
+    assert outbox.jobs() == []
+    assert os.listdir(outbox_dir) == [job.id + FAILED_SUFFIX]
+    assert finished == [(job.id, False, job.last_error)]
+    # Отложенное задание не возвращается в очередь после перезапуска
+    restarted = UploadOutbox(str(outbox_dir))
+    restarted._load()
+    assert restarted.jobs() == []
+
+
+def test_outbox_remembers_working_endpoint(tmp_path):
+    hints = []
+
+    def sender(job, progress):
+        hints.append(job.endpoint)
+        job.endpoint = LEGACY
+
+    outbox_dir = tmp_path / "outbox"
+    outbox = UploadOutbox(str(outbox_dir), sender=sender)
+    outbox._load()
+    for _ in range(2):
+        outbox.add(_report(tmp_path, [{'attention': 1}]), "42")
+        outbox._upload(outbox.jobs()[0])
+
+    assert hints == ["", LEGACY]
+    assert not [name for name in os.listdir(outbox_dir) if name.endswith(JOB_SUFFIX)]
+    restarted = UploadOutbox(str(outbox_dir))
+    restarted._load()
+    assert restarted._endpoint_hint() == LEGACY
+
+
+def test_endpoint_hint_expires(tmp_path, monkeypatch):
+    outbox = UploadOutbox(str(tmp_path))
+    outbox._remember_endpoint(LIVE)
+    assert outbox._endpoint_hint() == LIVE
+    monkeypatch.setattr(upload_outbox, 'ENDPOINT_TTL', 0.0)
+    assert outbox._endpoint_hint() == ""
+
+
+def test_job_waits_for_report_being_finalized(tmp_path):
+    journal = tmp_path / "report_20250101_120000.journal"
+    journal.write_text("{}\n", encoding='utf-8')
+    outbox = UploadOutbox(str(tmp_path / "outbox"), sender=lambda job, progress: pytest.fail("sent"))
+    outbox._load()
+    job_id = outbox.add(str(tmp_path / "report_20250101_120000.json"), "42", journal_path=str(journal))
+
+    outbox._upload(outbox.jobs()[0])
+
+    # Журнал ещё не собран: задание отложено, а не отброшено
+    job = outbox.jobs()[0]
+    assert job.id == job_id and job.attempts == 0 and job.next_attempt > 0
+    assert os.path.exists(outbox._job_path(job_id))
+
+
+def test_held_job_is_sent_only_after_release(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_outbox, 'SCAN_INTERVAL', 0.02)
+    sent = threading.Event()
+    outbox = UploadOutbox(str(tmp_path / "outbox"), sender=lambda job, progress: sent.set())
+    outbox.start()
+    try:
+        report = _report(tmp_path, [{'attention': 1}])
+        job_id = outbox.add(report, "42", hold=True)
+        # Задание уже на диске, пока идёт потоковая отправка
+        assert os.path.exists(outbox._job_path(job_id))
+        assert outbox.add(report, "42") == job_id
+        assert not sent.wait(0.2)
+
+        outbox.release(job_id)
+        assert sent.wait(2)
+    finally:
+        outbox.stop()
+
+
+def test_cancelled_job_is_removed(tmp_path):
+    outbox = UploadOutbox(str(tmp_path / "outbox"), sender=lambda job, progress: pytest.fail("sent"))
+    outbox._load()
+    job_id = outbox.add(_report(tmp_path, [{'attention': 1}]), "42", hold=True)
+
+    outbox.cancel(job_id)
+
+    assert outbox.jobs() == []
+    assert os.listdir(tmp_path / "outbox") == []
+
+
+def test_report_replaces_partial_live_session(tmp_path, monkeypatch):
+    records = [{'attention': i} for i in range(50)]
+    server = LiveUploadServer()
+    server.start()
+    try:
+        monkeypatch.setattr(upload_outbox, 'LIVE_UPLOAD_URL', server.url)
+        # Потоковая отправка успела доставить только часть записей
+        upload_records(server.url, "report_20250101_120000", records[:20], batch_size=10)
+        job = UploadJob("job", _report(tmp_path, records), "42", 0.0)
+
+        send_report(job, lambda sent, total: None)
+
+        assert list(server.sessions) == ["report_20250101_120000:report"]
+        assert server.sessions["report_20250101_120000:report"]['records'] == records
+    finally:
+        server.stop()
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+from wire_codec import decode_records, encode_records
+
+
+def _round_trip(records):
+    decoded = decode_records(encode_records(records))
+    assert decoded == records
+    # Типы значений тоже сохраняются: 12 и 12.0 не путаются
+    for original, restored in zip(records, decoded):
+        assert [type(v) for v in original.values()] == [type(restored[k]) for k in original]
+    return decoded
+
+
+def test_missing_keys_stay_missing():
+    records = [{'attention': 10, 'gaze_x': 0.5}, {'attention': 11}, {'left_eye': True}, {'left_eye': False}]
+    decoded = _round_trip(records)
+    assert 'gaze_x' not in decoded[1]
+    assert 'attention' not in decoded[2]
+
+
+@pytest.mark.parametrize('values', [
+    [12.0, 13.0, 14.0],
+    [12, 13.5, None, 14],
+    [None, 1, 2],
+    [0.1 + 0.2, 0.3, 1e-9],
+    [float('inf'), 1.5],
+])
+def test_numbers_keep_their_type(values):
+    _round_trip([{'value': v} for v in values])
+
+
+def test_timestamps_with_timezone_offset():
+    records = [{'timestamp': '2025-01-01T12:00:00.000000+03:00'},
+               {'timestamp': '2025-01-01T12:00:00.100000+03:00'}]
+    _round_trip(records)
+
+
+@pytest.mark.parametrize('timestamps', [
+    ['2025-01-01T12:00:00Z', '2025-01-01T12:00:01Z'],
+    ['2025-01-01T12:00:00.123Z', '2025-01-01T12:00:00.124Z'],
+    ['2025-01-01T12:00:00.000000Z', '2025-01-01T12:00:00.100Z'],
+    ['2025-01-01T12:00:00.000000', '2025-01-01T12:00:00.100000'],
+    ['2025-01-01T12:00:00.000000Z', '1969-12-31T23:59:59.999999Z'],
+])
+def test_timestamps_keep_their_form(timestamps):
+    _round_trip([{'timestamp': t} for t in timestamps])
+
+
+def test_random_records_round_trip():
+    rnd = random.Random(0)
+    records = []
+    for i in range(500):
+        record = {
+            'timestamp': f'2025-01-01T12:00:{i % 60:02d}.{i:06d}Z',
+            'elapsed_sec': round(i / 10, 2),
+            'video_ms': i * 100,
+            'video_frame': None if i % 7 == 0 else i,
+            'attention': rnd.choice([float(rnd.randint(0, 100)), rnd.randint(0, 100)]),
+            'gaze_x': round(rnd.random(), 4),
+            'raw_x': None if i % 10 == 0 else rnd.random(),
+            'gaze_h': rnd.choice(['left', 'center', 'right', '']),
+            'left_eye': rnd.random() < 0.9,
+        }
+        for key in list(record):
+            if rnd.random() < 0.05:
+                del record[key]
+        records.append(record)
+    _round_trip(records)
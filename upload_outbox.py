@@ -0,0 +1,370 @@
+"""
+Очередь отправки отчётов на сервер, переживающая перезапуск
+
+Каждая отправка — файл задания в reports/outbox/. Фоновый поток берёт задания,
+срок которых наступил, и отправляет не больше MAX_CONCURRENT одновременно. При
+ошибке задание остаётся на диске, а следующая попытка откладывается с
+экспоненциально растущей паузой. После перезапуска приложения очередь
+продолжается с тех же файлов. GUI только кладёт задание в очередь и получает
+сигналы о ходе отправки.
+
+Задание пишется на диск сразу при остановке записи, ещё до сборки отчёта из
+журнала: пока журнал не собран, отправка откладывается. Пока идёт потоковая
+отправка, задание придержано (hold) и отменяется, если сервер подтвердил все
+записи; придержка живёт только в памяти, так что после перезапуска задание
+отправляется.
+
+Отчёт отправляется пакетным протоколом live_upload (с продолжением с последнего
+принятого пакета); если сессию начать не удалось (сервер не поддерживает
+протокол, ответил ошибкой вроде 404, отказал в соединении или не ответил) —
+целиком одним сообщением на прежний адрес. Сработавший адрес запоминается
+(reports/outbox/endpoint.json), и следующие отчёты ENDPOINT_TTL секунд сразу
+отправляются на него, после чего пакетный протокол пробуется снова.
+
+Отчёт уходит отдельной сессией "<имя>:report" с meta["replaces"] = "<имя>" — id
+потоковой сессии той же записи; сервер заменяет частично принятую потоковую сессию
+отчётом, и записи не дублируются.
+
+Задание, отчёт которого удалён, не повторяется: файл задания переименовывается в
+*.failed.json.
+
+Пример:
+    python upload_outbox.py reports/outbox          # показать очередь
+    python upload_outbox.py reports/outbox --drain  # отправить всё сейчас
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Optional
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+try:
+    import websocket
+except ImportError:
+    websocket = None
+
+from live_upload import LIVE_UPLOAD_URL, CONNECT_TIMEOUT, HandshakeFailed, upload_records
+from report_storage import load_report
+
+
+REPORT_UPLOAD_URL = "ws://10.128.7.6:8099/influxdbpoints/ws/login/{video_id}"
+DEFAULT_VIDEO_ID = "12345"  # Как get_video_id для видео не из библиотеки
+MAX_CONCURRENT = 2  # Одновременных отправок
+BACKOFF_BASE = 5.0  # Пауза после первой ошибки, сек; дальше удваивается
+BACKOFF_MAX = 600.0
+SCAN_INTERVAL = 1.0  # Как часто проверяются сроки заданий
+JOB_SUFFIX = ".upload.json"
+FAILED_SUFFIX = ".failed.json"  # Задания, которые не повторяются
+ENDPOINT_FILE = "endpoint.json"
+ENDPOINT_TTL = 3600.0  # Сколько доверять запомненному прежнему адресу, сек
+LIVE, LEGACY = 'live', 'legacy'  # Пакетный протокол / отчёт одним сообщением
+
+
+@dataclass
+class UploadJob:
+    """Задание на отправку отчёта"""
+    id: str
+    report_path: str
+    video_id: str
+    created_at: float
+    attempts: int = 0
+    next_attempt: float = 0.0  # time.time(), раньше которого не отправлять
+    last_error: str = ""
+    sent: int = 0
+    total: int = 0
+    endpoint: str = ""  # LIVE или LEGACY: куда отправлять / куда отправлено
+    journal_path: str = ""  # Журнал, из которого ещё собирается отчёт
+
+
+def backoff_delay(attempts: int) -> float:
+    """Пауза перед следующей попыткой: BACKOFF_BASE * 2^(n-1) с разбросом ±20%"""
+    delay = min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def send_report(job: UploadJob, progress: Callable[[int, int], None]):
+    """Отправить отчёт задания; ошибка — исключение
+
+    job.endpoint == LEGACY — сразу на прежний адрес. После успеха job.endpoint —
+    адрес, который принял отчёт.
+    """
+    if websocket is None:
+        raise RuntimeError("Библиотека websocket-client не установлена")
+    report = load_report(job.report_path)
+    records = report.get('records', [])
+    # Задания восстановленных журналов берут video_id из заголовка отчёта
+    video_id = job.video_id or str(report.get('video_id') or DEFAULT_VIDEO_ID)
+    # Имя отчёта совпадает с id потоковой сессии записи: сервер заменит её отчётом
+    live_session_id = os.path.basename(job.report_path).split('.')[0]
+    if job.endpoint != LEGACY:
+        try:
+            upload_records(LIVE_UPLOAD_URL.format(video_id=video_id), live_session_id + ":report", records,
+                           {'video_id': video_id, 'replaces': live_session_id}, progress=progress)
+            job.endpoint = LIVE
+            return
+        except HandshakeFailed as e:
+            print(f"Пакетная отправка недоступна ({e}), отчёт отправляется одним сообщением")
+
+    # Сервер без пакетного протокола: весь отчёт одним сообщением
+    progress(0, len(records))
+    ws = websocket.create_connection(REPORT_UPLOAD_URL.format(video_id=video_id), timeout=CONNECT_TIMEOUT)
+    try:
+        ws.send(json.dumps(records, ensure_ascii=False))
+        try:
+            print(f"WebSocket ответ: {ws.recv()}")
+        except Exception:
+            pass
+    finally:
+        ws.close()
+    job.endpoint = LEGACY
+    progress(len(records), len(records))
+
+
+class UploadOutbox(QObject):
+    """Дисковая очередь отправки с фоновым потоком
+
+    Сигналы приходят из фоновых потоков; слоты GUI получают их через очередь Qt.
+    """
+
+    progress = pyqtSignal(str, int, int)  # id задания, отправлено записей, всего
+    job_finished = pyqtSignal(str, bool, str)  # id задания, успех, ошибка
+    queue_changed = pyqtSignal(int)  # заданий в очереди
+
+    def __init__(self, outbox_dir: str, sender: Callable = send_report, max_concurrent: int = MAX_CONCURRENT):
+        super().__init__()
+        self.outbox_dir = outbox_dir
+        self.max_concurrent = max_concurrent
+        self._sender = sender
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, UploadJob] = {}
+        self._in_flight = set()
+        self._held = set()  # Задания, которые ждут итога потоковой отправки
+        self._endpoint = ""  # Адрес, принявший последний отчёт
+        self._endpoint_at = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        """Прочитать задания с диска и запустить фоновый поток"""
+        try:
+            self._load()
+        except OSError as e:
+            print(f"Очередь отправки недоступна: {e}")
+            return
+        self._thread.start()
+
+    def stop(self):
+        """Остановить выдачу новых отправок; начатые задания остаются на диске"""
+        self._stop.set()
+
+    def add(self, report_path: str, video_id: str = "", journal_path: str = "", hold: bool = False) -> str:
+        """Записать задание на диск (сразу, в вызывающем потоке); id задания
+
+        video_id "" — взять из заголовка отчёта. journal_path — журнал, из которого
+        отчёт ещё собирается. hold — не отправлять до release(). Если отчёт уже в
+        очереди, возвращается существующее задание.
+        """
+        report_path = os.path.abspath(report_path)
+        with self._lock:
+            for job in self._jobs.values():
+                if job.report_path == report_path:
+                    if hold:
+                        self._held.add(job.id)
+                    return job.id
+        job_id = f"{time.strftime('%Y%m%d_%H%M%S')}_{os.path.basename(report_path).split('.')[0]}"
+        job = UploadJob(job_id, report_path, video_id, time.time(),
+                        journal_path=os.path.abspath(journal_path) if journal_path else "")
+        os.makedirs(self.outbox_dir, exist_ok=True)
+        self._save(job)
+        with self._lock:
+            self._jobs[job.id] = job
+            if hold:
+                self._held.add(job.id)
+            remaining = len(self._jobs)
+        self.queue_changed.emit(remaining)
+        return job.id
+
+    def release(self, job_id: str):
+        """Разрешить отправку придержанного задания"""
+        with self._lock:
+            self._held.discard(job_id)
+
+    def cancel(self, job_id: str):
+        """Удалить задание, которое больше не нужно отправлять"""
+        with self._lock:
+            if job_id in self._in_flight:
+                return  # Уже отправляется — пусть завершится
+            self._held.discard(job_id)
+            removed = self._jobs.pop(job_id, None)
+            remaining = len(self._jobs)
+        if removed is None:
+            return
+        try:
+            os.remove(self._job_path(job_id))
+        except OSError:
+            pass
+        self.queue_changed.emit(remaining)
+
+    def jobs(self) -> List[UploadJob]:
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.created_at)
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.outbox_dir, job_id + JOB_SUFFIX)
+
+    def _remember_endpoint(self, endpoint: str):
+        with self._lock:
+            self._endpoint, self._endpoint_at = endpoint, time.time()
+        path = os.path.join(self.outbox_dir, ENDPOINT_FILE)
+        try:
+            with open(path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump({'endpoint': endpoint, 'checked_at': self._endpoint_at}, f)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"Ошибка сохранения адреса отправки: {e}")
+
+    def _endpoint_hint(self) -> str:
+        """Запомненный адрес, если он ещё не устарел"""
+        with self._lock:
+            if time.time() - self._endpoint_at < ENDPOINT_TTL:
+                return self._endpoint
+        return ""
+
+    def _save(self, job: UploadJob):
+        path = self._job_path(job.id)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(asdict(job), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def _load(self):
+        os.makedirs(self.outbox_dir, exist_ok=True)
+        try:
+            with open(os.path.join(self.outbox_dir, ENDPOINT_FILE), 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            self._endpoint, self._endpoint_at = saved['endpoint'], float(saved['checked_at'])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        for name in os.listdir(self.outbox_dir):
+            if not name.endswith(JOB_SUFFIX):
+                continue
+            try:
+                with open(os.path.join(self.outbox_dir, name), 'r', encoding='utf-8') as f:
+                    job = UploadJob(**json.load(f))
+                self._jobs[job.id] = job
+            except Exception as e:
+                print(f"Ошибка чтения задания отправки {name}: {e}")
+        self.queue_changed.emit(len(self._jobs))
+
+    def _run(self):
+        while not self._stop.wait(SCAN_INTERVAL):
+            now = time.time()
+            with self._lock:
+                due = [job for job in sorted(self._jobs.values(), key=lambda job: job.next_attempt)
+                       if job.id not in self._in_flight and job.id not in self._held
+                       and job.next_attempt <= now]
+                due = due[:max(self.max_concurrent - len(self._in_flight), 0)]
+                self._in_flight.update(job.id for job in due)
+            for job in due:
+                threading.Thread(target=self._upload, args=(job,), daemon=True).start()
+
+    def _upload(self, job: UploadJob):
+        def on_progress(sent: int, total: int):
+            job.sent, job.total = sent, total
+            self.progress.emit(job.id, sent, total)
+
+        if not os.path.exists(job.report_path):
+            if job.journal_path and os.path.exists(job.journal_path):
+                # Отчёт ещё собирается (или соберётся при восстановлении журнала)
+                job.next_attempt = time.time() + BACKOFF_BASE
+                with self._lock:
+                    self._in_flight.discard(job.id)
+                return
+            # Повтор не поможет: задание откладывается в сторону, а не крутится вечно
+            self._fail(job, f"Отчёт не найден: {job.report_path}")
+            return
+
+        hint = job.endpoint = self._endpoint_hint()
+        try:
+            self._sender(job, on_progress)
+        except Exception as e:
+            job.attempts += 1
+            job.last_error = str(e)
+            job.next_attempt = time.time() + backoff_delay(job.attempts)
+            try:
+                self._save(job)
+            except OSError as save_error:
+                print(f"Ошибка сохранения задания отправки: {save_error}")
+            with self._lock:
+                self._in_flight.discard(job.id)
+            print(f"Ошибка отправки {os.path.basename(job.report_path)} (попытка {job.attempts}): {e}")
+            self.job_finished.emit(job.id, False, job.last_error)
+            return
+
+        # Запоминается только результат проверки пакетного протокола: отправка по
+        # подсказке не продлевает её, и по истечении ENDPOINT_TTL протокол пробуется снова
+        if job.endpoint and job.endpoint != hint:
+            self._remember_endpoint(job.endpoint)
+        try:
+            os.remove(self._job_path(job.id))
+        except OSError:
+            pass
+        with self._lock:
+            self._jobs.pop(job.id, None)
+            self._in_flight.discard(job.id)
+            remaining = len(self._jobs)
+        self.job_finished.emit(job.id, True, "")
+        self.queue_changed.emit(remaining)
+
+    def _fail(self, job: UploadJob, error: str):
+        """Убрать задание из очереди, оставив файл *.failed.json для разбора"""
+        job.last_error = error
+        try:
+            self._save(job)
+            os.replace(self._job_path(job.id), os.path.join(self.outbox_dir, job.id + FAILED_SUFFIX))
+        except OSError as e:
+            print(f"Ошибка сохранения задания отправки: {e}")
+        with self._lock:
+            self._jobs.pop(job.id, None)
+            self._in_flight.discard(job.id)
+            remaining = len(self._jobs)
+        print(f"Отправка {job.id} прекращена: {error}")
+        self.job_finished.emit(job.id, False, error)
+        self.queue_changed.emit(remaining)
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Очередь отправки отчётов")
+    parser.add_argument('outbox', help="Папка очереди (reports/outbox)")
+    parser.add_argument('--drain', action='store_true', help="Отправить все задания сейчас")
+    args = parser.parse_args(argv)
+
+    outbox = UploadOutbox(args.outbox)
+    outbox._load()
+    jobs = outbox.jobs()
+    for job in jobs:
+        retry = max(job.next_attempt - time.time(), 0)
+        print(f"{job.id:<40}попыток {job.attempts:<3}через {retry:>5.0f} с  {job.last_error}")
+    if not args.drain or not jobs:
+        return 0
+
+    failed = 0
+    for job in jobs:
+        try:
+            send_report(job, lambda sent, total: print(f"\r{job.id}: {sent}/{total}", end=""))
+            os.remove(outbox._job_path(job.id))
+            print(" — отправлено")
+        except Exception as e:
+            failed += 1
+            print(f" — ошибка: {e}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
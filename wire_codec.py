@@ -0,0 +1,278 @@
+"""
+Компактное кодирование пакетов записей для отправки на сервер
+
+Пакет записей превращается в столбцы: целые и дробные с фиксированной точностью
+(взгляд округлён до 3–4 знаков) хранятся разностями соседних значений в самом
+узком целом типе, метки времени — микросекундами с разностями, направления
+взгляда — номерами категорий, флаги — битами. Небольшой JSON-заголовок описывает
+столбцы; всё вместе сжимается zlib.
+
+Декодирование возвращает те же записи: битовые маски столбца отмечают записи без
+поля и целые среди дробных (12 и 12.0 различаются), а дробные хранятся с
+фиксированной точностью, только если она воспроизводит каждое значение точно.
+
+Кодировка согласуется с сервером в приветствии (live_upload): клиент перечисляет
+поддерживаемые, сервер выбирает; если сервер не ответил — используется JSON.
+
+Пример:
+    python wire_codec.py reports/report_20251206_112937.json
+"""
+import re
+import sys
+import json
+import zlib
+import struct
+import argparse
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import numpy as np
+
+
+COLUMNAR = 'columnar'
+JSON = 'json'
+ENCODINGS = (COLUMNAR, JSON)  # В порядке предпочтения
+MAX_DECIMALS = 6  # Больше знаков — дробное хранится как float64
+COMPRESS_LEVEL = 6
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# Метки времени столбцом 'time' хранятся, только если в таком виде и записаны, иначе строками
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+_CANONICAL_TIMESTAMP = re.compile(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{6}Z')
+
+
+def _int_dtype(values: np.ndarray) -> np.dtype:
+    """Самый узкий целый тип для значений"""
+    if len(values) == 0:
+        return np.dtype(np.int8)
+    low, high = int(values.min()), int(values.max())
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _encode_ints(values: np.ndarray, spec: dict) -> bytes:
+    """Целые — разностями соседних значений (первая разность — само значение)"""
+    deltas = np.diff(values, prepend=np.int64(0))
+    dtype = _int_dtype(deltas)
+    spec['dtype'] = dtype.str
+    return deltas.astype(dtype).tobytes()
+
+
+def _decimals(values: np.ndarray) -> Optional[int]:
+    """Сколько знаков после запятой хватает, чтобы хранить значения без потерь"""
+    if not np.all(np.isfinite(values)):
+        return None
+    for decimals in range(MAX_DECIMALS + 1):
+        scaled = values * 10 ** decimals
+        if np.all(np.abs(scaled - np.round(scaled)) < 1e-6) and np.all(np.abs(scaled) < 2 ** 62):
+            # Декодирование должно вернуть ровно те же float, иначе — больше знаков
+            if np.array_equal(np.round(np.round(scaled) / 10 ** decimals, decimals), values):
+                return decimals
+    return None
+
+
+def _bits(mask: np.ndarray) -> bytes:
+    return np.packbits(mask).tobytes()
+
+
+def _read_bits(data: bytes, count: int) -> tuple:
+    """Битовая маска из начала данных и остаток данных"""
+    size = (count + 7) // 8
+    return np.unpackbits(np.frombuffer(data[:size], dtype=np.uint8), count=count).astype(bool), data[size:]
+
+
+def _parse_timestamp(value: str) -> int:
+    """Микросекунды от эпохи; ValueError, если метка не в виде TIMESTAMP_FORMAT"""
+    if not _CANONICAL_TIMESTAMP.fullmatch(value):
+        raise ValueError(value)
+    delta = datetime.strptime(value, TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc) - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _format_timestamp(micros: int) -> str:
+    seconds, micro = divmod(int(micros), 1_000_000)
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(microsecond=micro).strftime(TIMESTAMP_FORMAT)
+
+
+def _encode_column(name: str, values: list) -> tuple:
+    """Описание столбца и его байты"""
+    spec = {'name': name}
+    present = [v for v in values if v is not None]
+    sample = present[0] if present else None
+
+    if isinstance(sample, str) and name == 'timestamp' and all(isinstance(v, str) for v in values):
+        try:
+            micros = np.array([_parse_timestamp(v) for v in values], dtype=np.int64)
+        except (ValueError, TypeError):
+            # Другой вид (без Z, без микросекунд, со смещением) не восстановился бы
+            # посимвольно — хранится как строки
+            micros = None
+        if micros is not None:
+            spec['kind'] = 'time'
+            return spec, _encode_ints(micros, spec)
+
+    if isinstance(sample, bool) and all(isinstance(v, bool) for v in values):
+        spec['kind'] = 'bool'
+        return spec, np.packbits(np.array(values, dtype=bool)).tobytes()
+
+    if all(isinstance(v, str) or v is None for v in values):
+        categories = sorted(set(values), key=lambda v: (v is not None, v or ''))
+        index = {value: i for i, value in enumerate(categories)}
+        spec.update(kind='cat', categories=categories)
+        dtype = np.uint8 if len(categories) <= 256 else np.uint16
+        spec['dtype'] = np.dtype(dtype).str
+        return spec, np.array([index[v] for v in values], dtype=dtype).tobytes()
+
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) or v is None for v in values):
+        if all(isinstance(v, int) for v in values):
+            spec['kind'] = 'int'
+            return spec, _encode_ints(np.array(values, dtype=np.int64), spec)
+        array = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        missing = np.array([v is None for v in values], dtype=bool)
+        data = b''
+        if missing.any():
+            spec['missing'] = True
+            data = _bits(missing)
+        # Целые среди дробных отмечаются маской, чтобы 12 не стало 12.0 и наоборот
+        ints = np.array([isinstance(v, int) for v in values], dtype=bool)
+        if ints.any():
+            spec['ints'] = True
+            data += _bits(ints)
+        decimals = _decimals(array[~missing])
+        if decimals is None:
+            spec['kind'] = 'float'
+            return spec, data + array.tobytes()
+        spec.update(kind='fixed', decimals=decimals)
+        scaled = np.round(np.where(missing, 0, array) * 10 ** decimals).astype(np.int64)
+        return spec, data + _encode_ints(scaled, spec)
+
+    spec['kind'] = 'json'
+    return spec, json.dumps(values, ensure_ascii=False).encode('utf-8')
+
+
+def encode_records(records: List[dict]) -> bytes:
+    """Записи → сжатый столбцовый пакет"""
+    fields = dict.fromkeys(key for record in records for key in record)
+    columns, chunks = [], []
+    for name in fields:
+        # Записи без поля (а не с None) отмечаются маской перед данными столбца,
+        # а сам столбец хранит значения только остальных записей
+        absent = np.array([name not in record for record in records], dtype=bool)
+        spec, data = _encode_column(name, [record[name] for record in records if name in record])
+        if absent.any():
+            spec['absent'] = True
+            data = _bits(absent) + data
+        spec['size'] = len(data)
+        columns.append(spec)
+        chunks.append(data)
+    header = json.dumps({'n': len(records), 'columns': columns}, ensure_ascii=False,
+                        separators=(',', ':')).encode('utf-8')
+    return zlib.compress(struct.pack('>I', len(header)) + header + b''.join(chunks), COMPRESS_LEVEL)
+
+
+def _decode_ints(data: bytes, spec: dict) -> np.ndarray:
+    return np.cumsum(np.frombuffer(data, dtype=np.dtype(spec['dtype'])).astype(np.int64))
+
+
+def decode_records(payload: bytes) -> List[dict]:
+    """Столбцовый пакет → записи"""
+    raw = zlib.decompress(payload)
+    header_size = struct.unpack('>I', raw[:4])[0]
+    header = json.loads(raw[4:4 + header_size].decode('utf-8'))
+    count = header['n']
+    offset = 4 + header_size
+    columns = {}
+    for spec in header['columns']:
+        data = raw[offset:offset + spec['size']]
+        offset += spec['size']
+        absent = None
+        if spec.get('absent'):
+            absent, data = _read_bits(data, count)
+        size = count if absent is None else count - int(absent.sum())  # Значений в столбце
+        kind = spec['kind']
+        if kind == 'time':
+            values = [_format_timestamp(v) for v in _decode_ints(data, spec).tolist()]
+        elif kind == 'bool':
+            values = np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=size).astype(bool).tolist()
+        elif kind == 'cat':
+            categories = spec['categories']
+            values = [categories[i] for i in np.frombuffer(data, dtype=np.dtype(spec['dtype'])).tolist()]
+        elif kind == 'int':
+            values = _decode_ints(data, spec).tolist()
+        elif kind in ('fixed', 'float'):
+            missing = ints = None
+            if spec.get('missing'):
+                missing, data = _read_bits(data, size)
+            if spec.get('ints'):
+                ints, data = _read_bits(data, size)
+            if kind == 'fixed':
+                array = _decode_ints(data, spec)
+                decimals = spec['decimals']
+                array = array.astype(np.float64) if decimals == 0 else np.round(array / 10 ** decimals, decimals)
+            else:
+                array = np.frombuffer(data, dtype=np.float64)
+            values = array.tolist()
+            if ints is not None:
+                values = [int(v) if i else v for v, i in zip(values, ints.tolist())]
+            if missing is not None:
+                values = [None if m else v for v, m in zip(values, missing.tolist())]
+        else:
+            values = json.loads(data.decode('utf-8'))
+        columns[spec['name']] = (values, absent)
+    records = [{} for _ in range(count)]
+    for name, (values, absent) in columns.items():
+        targets = records if absent is None else [records[i] for i in np.flatnonzero(~absent).tolist()]
+        for record, value in zip(targets, values):
+            record[name] = value
+    return records
+
+
+def choose_encoding(offered) -> str:
+    """Выбор сервера: первая из предложенных клиентом, которую он знает"""
+    for encoding in offered or ():
+        if encoding in ENCODINGS:
+            return encoding
+    return JSON
+
+
+def measure(records: List[dict], batch_size: int = 500) -> dict:
+    """Байт на запись в JSON и в столбцовой кодировке при отправке пакетами"""
+    json_bytes = columnar_bytes = 0
+    for start in range(0, len(records), batch_size):
+        batch = records[start:start + batch_size]
+        json_bytes += len(json.dumps(batch, ensure_ascii=False).encode('utf-8'))
+        columnar_bytes += len(encode_records(batch))
+    count = max(len(records), 1)
+    return {
+        'records': len(records),
+        'json_per_record': json_bytes / count,
+        'columnar_per_record': columnar_bytes / count,
+        'reduction': json_bytes / columnar_bytes if columnar_bytes else 0.0,
+    }
+
+
+def main(argv: Optional[list] = None):
+    from report_storage import load_report
+
+    parser = argparse.ArgumentParser(description="Размер записей в JSON и в столбцовой кодировке")
+    parser.add_argument('report', help="Файл отчёта")
+    parser.add_argument('--batch', type=int, default=500, help="Записей в пакете")
+    args = parser.parse_args(argv)
+
+    records = load_report(args.report).get('records', [])
+    sample = records[:args.batch]
+    if decode_records(encode_records(sample)) != sample:
+        print("Предупреждение: декодированные записи отличаются от исходных", file=sys.stderr)
+    result = measure(records, args.batch)
+    print(f"Записей: {result['records']}, пакет: {args.batch}")
+    print(f"JSON:        {result['json_per_record']:.1f} байт на запись")
+    print(f"Столбцовая:  {result['columnar_per_record']:.1f} байт на запись")
+    print(f"Уменьшение:  в {result['reduction']:.1f} раза")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())